@@ -27,14 +27,15 @@ async def ingest_document(title, body, url, date, law_name):
 
     chunks = chunk_document(body)
     logger.info(f"Chunked document into {len(chunks)} chunks")
-    for index, chunk_text in enumerate(chunks):
+    embeddings = await llm_client.bulk_embed(chunks)
+    for index, (chunk_text, embedding) in enumerate(zip(chunks, embeddings)):
         chunk = Chunk(
             document_id=legal_document.meta.id,
             chunk_index=index,
             chunk_text=chunk_text,
             law_name=law_name,
+            embedding=embedding,
         )
-        chunk.embedding = await llm_client.get_embedding(chunk_text)
         await chunk.save()
 
 
@@ -79,7 +79,7 @@ class Chunk(AsyncDocument):
 
     document_id = Keyword(index=True)
     chunk_index = Integer(index=False)
-    chunk_text = Text(index=False)
+    chunk_text = Text(index=False, fields={"dutch": Text(analyzer="dutch")})
     embedding = DenseVector(dims=VECTOR_DIMS, similarity="cosine")
     law_name = Text(index=True)
 
@@ -97,7 +97,7 @@ class CaseLawChunk(AsyncDocument):
 
     document_id = Keyword(index=True)
     chunk_index = Integer(index=False)
-    chunk_text = Text(index=False)
+    chunk_text = Text(index=False, fields={"dutch": Text(analyzer="dutch")})
     embedding = DenseVector(dims=VECTOR_DIMS, similarity="cosine")
     title = Text(analyzer="dutch")
 
@@ -115,7 +115,7 @@ class WerkInstructieChunk(AsyncDocument):
 
     document_id = Keyword(index=True)
     chunk_index = Integer(index=False)
-    chunk_text = Text(index=False)
+    chunk_text = Text(index=False, fields={"dutch": Text(analyzer="dutch")})
     embedding = DenseVector(dims=VECTOR_DIMS, similarity="cosine")
     title = Text(analyzer="dutch")
 
@@ -1,9 +1,11 @@
+import asyncio
 from typing import Union
 from sqlalchemy.orm import Session
 from sqlalchemy.sql import text
 from stopwordsiso import stopwords
 import re
 
+from ir.db.database import SessionLocal
 from ir.db.models.models import ChatMessage, Law
 from api.models import ChatQuery
 from utils.logging.logger import logger
@@ -26,9 +28,28 @@ def clean_word(word):
     return re.sub(r"\W+", "", word)
 
 
+def _fetch_selectielijsten(sql_query, params: dict, timeout: float | None) -> list:
+    """Run the selectielijsten query on a session of its own, bounded by a statement timeout."""
+    with SessionLocal() as db:
+        if timeout:
+            # Transaction-local, so the pooled connection keeps its default
+            db.execute(
+                text("SELECT set_config('statement_timeout', :timeout, true)"),
+                {"timeout": str(int(timeout * 1000))},
+            )
+        return db.execute(sql_query, params=params).fetchall()
+
+
 async def search_selectielijsten(
-    input: str, db: Session
+    input: str, timeout: float | None = None
 ) -> Union[list[dict[str, str]], str]:
+    """
+    Search the selectielijsten rows matching the words of input.
+
+    The query runs in a worker thread on a session of its own, since the
+    caller may stop waiting for it; the database cancels it after timeout
+    seconds.
+    """
     try:
         logger.info("Searching for matching words from input in selectielijsten")
         # Load Dutch stopwords
@@ -77,9 +98,7 @@ async def search_selectielijsten(
             f"SELECT * FROM selectielijsten WHERE {' OR '.join(search_conditions)}"
         )
 
-        # Execute the query
-        result = db.execute(sql_query, params=params)
-        rows = result.fetchall()
+        rows = await asyncio.to_thread(_fetch_selectielijsten, sql_query, params, timeout)
 
         if not rows:
             logger.warning("No matching records found in selectielijsten")
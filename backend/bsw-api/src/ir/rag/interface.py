@@ -1,7 +1,7 @@
 from utils.logging.logger import logger
 from typing import Union
 
-from ir.rag.search import search, search_case_laws, search_werk_instructies
+from ir.rag.search import search, search_case_laws, search_werk_instructies, search_sources
 from ir.rag.models.model import VectorSearchCaseLawResult, VectorSearchResult, VectorSearchWerkInstructieResult
 from api.models import ChatQuery
 
@@ -59,3 +59,32 @@ async def search_werk_instructie(chat_query: ChatQuery) -> VectorSearchWerkInstr
     except Exception as e:      
         logger.error(f"Error during search of werkinstructie: {e}")
         return False
+
+
+async def search_rag_sources(
+    chat_query: ChatQuery,
+    law_names: list | None = None,
+    case_law: bool = False,
+    werk_instructie: bool = False,
+) -> dict | bool:
+    """
+    Search law articles, case law and work instructions for the chat query in one request
+
+    Returns the merged results of the sources with relevant matches.
+    """
+    try:
+        logger.info("Searching the vector database for relevant law articles, case law and work instructions")
+
+        search_results = await search_sources(
+            chat_query.message, law_names=law_names, case_law=case_law, werk_instructie=werk_instructie
+        )
+        pipeline_data = {}
+        for source, search_result in search_results.items():
+            if search_result:
+                pipeline_data.update(search_result.model_dump())
+            else:
+                logger.info(f"No relevant {source} documents found")
+        return pipeline_data or False
+    except Exception as e:
+        logger.error(f"Error during search of law articles, case law and work instructions: {e}")
+        return False
@@ -82,7 +82,7 @@ class Chunk(AsyncDocument):
 
     document_id = Keyword(index=True)
     chunk_index = Integer(index=False)
-    chunk_text = Text(index=False)
+    chunk_text = Text(index=False, fields={"dutch": Text(analyzer="dutch")})
     embedding = DenseVector(dims=VECTOR_DIMS, similarity="cosine")
     law_name = Text(index=True)
 
@@ -100,7 +100,7 @@ class CaseLawChunk(AsyncDocument):
 
     document_id = Keyword(index=True)
     chunk_index = Integer(index=False)
-    chunk_text = Text(index=False)
+    chunk_text = Text(index=False, fields={"dutch": Text(analyzer="dutch")})
     embedding = DenseVector(dims=VECTOR_DIMS, similarity="cosine")
     title = Text(analyzer="dutch")
 
@@ -118,7 +118,7 @@ class WerkInstructieChunk(AsyncDocument):
 
     document_id = Keyword(index=True)
     chunk_index = Integer(index=False)
-    chunk_text = Text(index=False)
+    chunk_text = Text(index=False, fields={"dutch": Text(analyzer="dutch")})
     embedding = DenseVector(dims=VECTOR_DIMS, similarity="cosine")
     title = Text(analyzer="dutch")
 
@@ -132,7 +132,6 @@ class VectorSearchResult(BaseModel):
 
 
 class VectorSearchCaseLawResult(BaseModel):
-    cl_documents: list[str]
     cl_chunks: list[list[str]]
     cl_titles: list[str]
     cl_inhoudsindicaties: list[str]
@@ -142,7 +141,6 @@ class VectorSearchCaseLawResult(BaseModel):
 
 
 class VectorSearchWerkInstructieResult(BaseModel):
-    wi_documents: list[str]
     wi_chunks: list[list[str]]
     wi_titles: list[str]
     wi_urls: list[str]
@@ -0,0 +1,56 @@
+import asyncio
+import os
+import time
+import unicodedata
+from collections import OrderedDict
+
+from llm.llm_client import LLMClient
+
+QUERY_EMBEDDING_CACHE_SIZE = int(os.getenv("QUERY_EMBEDDING_CACHE_SIZE", "1024"))
+QUERY_EMBEDDING_CACHE_TTL = float(os.getenv("QUERY_EMBEDDING_CACHE_TTL", "3600"))
+
+llm_client = LLMClient()
+
+# normalized query -> (expiry time, embedding), least recently used first
+_cache: OrderedDict[str, tuple[float, list[float]]] = OrderedDict()
+# normalized query -> embedding request in flight
+_pending: dict[str, asyncio.Future] = {}
+
+
+def normalize_query(query: str) -> str:
+    return " ".join(unicodedata.normalize("NFC", query).split())
+
+
+async def get_query_embedding(query: str) -> list[float]:
+    """
+    Embed a search query, at most once per normalized text.
+
+    Embeddings are kept in a process-wide LRU cache for
+    QUERY_EMBEDDING_CACHE_TTL seconds. Concurrent searches for the same
+    message, such as the law, case law and werkinstructie searches of one
+    pipeline request, share a single embedding call.
+    """
+    key = normalize_query(query)
+    now = time.monotonic()
+    cached = _cache.get(key)
+    if cached is not None and cached[0] > now:
+        _cache.move_to_end(key)
+        return cached[1]
+
+    task = _pending.get(key)
+    if task is None:
+        # A task of its own, so a cancelled search does not cancel the others
+        task = asyncio.ensure_future(llm_client.get_embedding(key))
+        _pending[key] = task
+        task.add_done_callback(lambda done: _store(key, done))
+    return await asyncio.shield(task)
+
+
+def _store(key: str, task: asyncio.Future):
+    del _pending[key]
+    if task.cancelled() or task.exception() is not None or QUERY_EMBEDDING_CACHE_SIZE <= 0:
+        return
+    _cache[key] = (time.monotonic() + QUERY_EMBEDDING_CACHE_TTL, task.result())
+    _cache.move_to_end(key)
+    while len(_cache) > QUERY_EMBEDDING_CACHE_SIZE:
+        _cache.popitem(last=False)
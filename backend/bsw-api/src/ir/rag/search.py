@@ -1,49 +1,221 @@
+import asyncio
+import os
 from utils.logging.logger import logger
 from typing import List
-from elasticsearch_dsl import Q
+from elasticsearch_dsl import AsyncMultiSearch, AsyncSearch, Q
 
 
 from ir.rag.models.model import Chunk, LegalDocument, CaseLawChunk, CaseLawDocument, WerkInstructieChunk, WerkInstructieDocument, VectorSearchCaseLawResult, VectorSearchResult, VectorSearchWerkInstructieResult
-from llm.llm_client import LLMClient
+from ir.rag.query_embedding import get_query_embedding
 
 SIMILARITY_THRESHOLD = 0.7
 TOP_K_FINAL = 12
 TOP_K_FINAL_LESS = 8
+# Nearest neighbour candidates considered per shard for the top k
+NUM_CANDIDATES = 100
+# The chunk fields the results are built from
+CHUNK_SOURCE_FIELDS = ["document_id", "chunk_text"]
+# The document fields fetched per source. Only law bodies are rendered in the
+# prompts; case law and werk instructies are presented through their chunks,
+# so their (large) bodies are not fetched at all.
+LAW_DOCUMENT_FIELDS = ["title", "body", "law_name", "url"]
+CASE_LAW_DOCUMENT_FIELDS = ["title", "zaaknummer", "inhoudsindicatie", "datum_uitspraak", "url"]
+WERK_INSTRUCTIE_DOCUMENT_FIELDS = ["title", "url"]
 
-llm_client = LLMClient()
+# Retrieval per source: "knn" (dense only) or "hybrid" (BM25 on the chunk
+# text and titles, fused with kNN so exact article and case numbers are found)
+RETRIEVAL_MODES = {
+    "laws": os.getenv("RAG_RETRIEVAL_LAWS", "knn"),
+    "case_law": os.getenv("RAG_RETRIEVAL_CASE_LAW", "knn"),
+    "werk_instructie": os.getenv("RAG_RETRIEVAL_WERK_INSTRUCTIE", "knn"),
+}
+# Hybrid fusion: "rrf" lets Elasticsearch fuse the rankings (needs a license
+# that includes RRF), "local" fuses the two ranked lists here
+HYBRID_FUSION = os.getenv("RAG_HYBRID_FUSION", "local")
+RRF_RANK_CONSTANT = int(os.getenv("RAG_RRF_RANK_CONSTANT", "60"))
+# Dutch-analyzed fields the BM25 half of a hybrid search matches against
+TEXT_FIELDS = {
+    "laws": ["chunk_text.dutch"],
+    "case_law": ["chunk_text.dutch", "title"],
+    "werk_instructie": ["chunk_text.dutch", "title"],
+}
 
-async def search(query: str, law_names: List[str]) -> VectorSearchResult:
-    logger.info(f"Searching for: {query}")
-    logger.info(f"Law names filter: {law_names}")
-    query_embedding = await llm_client.get_embedding(query)
 
+def _knn_search(chunk_class, query_embedding: list[float], k: int, filter_query=None) -> AsyncSearch:
+    """kNN search for the top k chunks of chunk_class's index, returning only CHUNK_SOURCE_FIELDS."""
+    return (
+        chunk_class.search()
+        .knn(
+            field="embedding",
+            k=k,
+            num_candidates=NUM_CANDIDATES,
+            query_vector=query_embedding,
+            similarity=SIMILARITY_THRESHOLD,
+            filter=filter_query,
+        )
+        .source(CHUNK_SOURCE_FIELDS)
+        .extra(size=k)
+    )
+
+
+def _text_query(query: str, fields: list[str], filter_query=None):
+    text_query = Q("multi_match", query=query, fields=fields)
+    if filter_query is None:
+        return text_query
+    return Q("bool", must=[text_query], filter=[filter_query])
+
+
+def _text_search(chunk_class, query: str, fields: list[str], k: int, filter_query=None) -> AsyncSearch:
+    """BM25 search for the top k chunks of chunk_class's index, returning only CHUNK_SOURCE_FIELDS."""
+    return (
+        chunk_class.search()
+        .query(_text_query(query, fields, filter_query))
+        .source(CHUNK_SOURCE_FIELDS)
+        .extra(size=k)
+    )
+
+
+def _source_searches(
+    source: str, chunk_class, query: str, query_embedding: list[float], k: int, filter_query=None
+) -> list[AsyncSearch]:
+    """The searches retrieving a source's chunks in its configured retrieval mode; more than one are fused."""
+    knn_search = _knn_search(chunk_class, query_embedding, k, filter_query)
+    if RETRIEVAL_MODES[source] != "hybrid":
+        return [knn_search]
+    if HYBRID_FUSION == "rrf":
+        return [
+            knn_search.query(_text_query(query, TEXT_FIELDS[source], filter_query)).rank(
+                rrf={"rank_constant": RRF_RANK_CONSTANT, "window_size": NUM_CANDIDATES}
+            )
+        ]
+    return [knn_search, _text_search(chunk_class, query, TEXT_FIELDS[source], k, filter_query)]
+
+
+def fuse_rankings(rankings: list[list], k: int) -> list:
+    """
+    Reciprocal rank fusion of ranked hit lists, for clusters without RRF.
+
+    Each hit scores the sum of 1 / (RRF_RANK_CONSTANT + rank) over the
+    lists it appears in; the k best scoring hits are returned.
+    """
+    scores: dict[str, float] = {}
+    hits = {}
+    for ranking in rankings:
+        for rank, hit in enumerate(ranking, start=1):
+            scores[hit.meta.id] = scores.get(hit.meta.id, 0) + 1 / (RRF_RANK_CONSTANT + rank)
+            hits.setdefault(hit.meta.id, hit)
+    return [hits[hit_id] for hit_id in sorted(scores, key=scores.get, reverse=True)[:k]]
+
+
+def _law_filter(law_names: List[str]):
     should_queries = [Q("match", law_name=law) for law in law_names]
 
-    filter_query = Q(
+    return Q(
         "bool",
         should=should_queries,
         minimum_should_match=1
     )
 
-    relevant_chunks = [
-        chunk async for chunk in Chunk.search().knn(
-            field="embedding",
-            k=50,
-            num_candidates=100,
-            query_vector=query_embedding,
-            similarity=SIMILARITY_THRESHOLD,
-            filter=filter_query,
-        ).iterate()
-    ]
+
+async def search_sources(
+    query: str,
+    law_names: List[str] | None = None,
+    case_law: bool = False,
+    werk_instructie: bool = False,
+) -> dict:
+    """
+    Search the law, case law and werk instructie chunks in one request.
+
+    The query is embedded once and the searches of all requested sources
+    are sent as a single _msearch: a kNN search per source, plus a BM25
+    search for sources in hybrid retrieval mode (see RETRIEVAL_MODES).
+    Each source's documents are then fetched concurrently.
+
+    Args:
+        query: The user's question
+        law_names: Laws to search, or None to skip laws
+        case_law: Whether to search case law
+        werk_instructie: Whether to search werk instructies
+
+    Returns:
+        dict: Result (or False if nothing relevant was found) per searched
+            source, keyed "laws", "case_law" and "werk_instructie"
+    """
+    logger.info(f"Searching for: {query}")
+    query_embedding = await get_query_embedding(query)
+
+    searches = {}
+    if law_names is not None:
+        logger.info(f"Law names filter: {law_names}")
+        searches["laws"] = _source_searches(
+            "laws", Chunk, query, query_embedding, TOP_K_FINAL, _law_filter(law_names)
+        )
+    if case_law:
+        searches["case_law"] = _source_searches(
+            "case_law", CaseLawChunk, query, query_embedding, TOP_K_FINAL_LESS
+        )
+    if werk_instructie:
+        searches["werk_instructie"] = _source_searches(
+            "werk_instructie", WerkInstructieChunk, query, query_embedding, TOP_K_FINAL_LESS
+        )
+    if not searches:
+        return {}
+
+    multi_search = AsyncMultiSearch()
+    for source_searches in searches.values():
+        for source_search in source_searches:
+            multi_search = multi_search.add(source_search)
+    # Failed searches come back as None instead of failing the whole request
+    responses = iter(await multi_search.execute(raise_on_error=False))
+
+    chunks = {}
+    source_results = {}
+    for source, source_searches in searches.items():
+        source_responses = [next(responses) for _ in source_searches]
+        if any(response is None for response in source_responses):
+            # The other sources are still usable
+            logger.error(f"Error searching {source} chunks")
+            source_results[source] = False
+            continue
+        rankings = [list(response) for response in source_responses]
+        top_k = TOP_K_FINAL if source == "laws" else TOP_K_FINAL_LESS
+        chunks[source] = rankings[0] if len(rankings) == 1 else fuse_rankings(rankings, top_k)
+
+    builders = {"laws": _law_result, "case_law": _case_law_result, "werk_instructie": _werk_instructie_result}
+    results = await asyncio.gather(
+        *(builders[source](chunks[source]) for source in chunks),
+        return_exceptions=True,
+    )
+    for source, result in zip(chunks, results):
+        if isinstance(result, Exception):
+            # The other sources are still usable
+            logger.error(f"Error building {source} search result: {result}")
+            result = False
+        source_results[source] = result
+    return source_results
+
+
+async def search(query: str, law_names: List[str]) -> VectorSearchResult:
+    return (await search_sources(query, law_names=law_names))["laws"]
+
+
+async def search_case_laws(query: str) -> VectorSearchCaseLawResult:
+    return (await search_sources(query, case_law=True))["case_law"]
+
+
+async def search_werk_instructies(query: str) -> VectorSearchWerkInstructieResult:
+    return (await search_sources(query, werk_instructie=True))["werk_instructie"]
+
+
+async def _law_result(relevant_chunks: list) -> VectorSearchResult:
     logger.info(f"Found {len(relevant_chunks)} relevant chunks in function: {__name__}")
 
-    relevant_chunks = relevant_chunks[:TOP_K_FINAL]
     relevant_doc_ids = list({chunk.document_id for chunk in relevant_chunks})
     if not relevant_doc_ids:
         logger.info("No relevant law documents found")
         return False
 
-    relevant_docs = await LegalDocument.mget(relevant_doc_ids)
+    relevant_docs = await LegalDocument.mget(relevant_doc_ids, source_includes=LAW_DOCUMENT_FIELDS)
 
     logger.info(f"Found {len(relevant_docs)} relevant documents")
     for doc in relevant_docs:
@@ -67,32 +239,15 @@ async def search(query: str, law_names: List[str]) -> VectorSearchResult:
     )
 
 
-async def search_case_laws(query: str) -> VectorSearchCaseLawResult:
-    logger.info(f"Searching for: {query}")
-
-    query_embedding = await llm_client.get_embedding(query)
-
-    relevant_chunks = [
-        chunk
-        async for chunk in CaseLawChunk.search()
-        .knn(
-            field="embedding",
-            k=50,
-            num_candidates=100,
-            query_vector=query_embedding,
-            similarity=SIMILARITY_THRESHOLD,
-        )
-        .iterate()
-    ]
+async def _case_law_result(relevant_chunks: list) -> VectorSearchCaseLawResult:
     logger.info(f"Found {len(relevant_chunks)} relevant chunks in function: {__name__}")
 
-    relevant_chunks = relevant_chunks[:TOP_K_FINAL_LESS]
     relevant_doc_ids = list({chunk.document_id for chunk in relevant_chunks})
     if not relevant_doc_ids:
         logger.info("No relevant case law documents found")
         return False
 
-    relevant_docs = await CaseLawDocument.mget(relevant_doc_ids)
+    relevant_docs = await CaseLawDocument.mget(relevant_doc_ids, source_includes=CASE_LAW_DOCUMENT_FIELDS)
 
     logger.info(f"Found {len(relevant_docs)} relevant documents")
     for doc in relevant_docs:
@@ -101,7 +256,6 @@ async def search_case_laws(query: str) -> VectorSearchCaseLawResult:
         )
 
     return VectorSearchCaseLawResult(
-        cl_documents=[doc.uitspraak for doc in relevant_docs],
         cl_chunks=[
             [
                 str(chunk.chunk_text)
@@ -118,32 +272,15 @@ async def search_case_laws(query: str) -> VectorSearchCaseLawResult:
     )
 
 
-async def search_werk_instructies(query: str) -> VectorSearchWerkInstructieResult:
-    logger.info(f"Searching for: {query}")
-
-    query_embedding = await llm_client.get_embedding(query)
-
-    relevant_chunks = [
-        chunk
-        async for chunk in WerkInstructieChunk.search()
-        .knn(
-            field="embedding",
-            k=50,
-            num_candidates=100,
-            query_vector=query_embedding,
-            similarity=SIMILARITY_THRESHOLD,
-        )
-        .iterate()
-    ]
+async def _werk_instructie_result(relevant_chunks: list) -> VectorSearchWerkInstructieResult:
     logger.info(f"Found {len(relevant_chunks)} relevant chunks in function: {__name__}")
 
-    relevant_chunks = relevant_chunks[:TOP_K_FINAL_LESS]
     relevant_doc_ids = list({chunk.document_id for chunk in relevant_chunks})
     if not relevant_doc_ids:
         logger.info("No relevant werk instructie documents found")
         return False
 
-    relevant_docs = await WerkInstructieDocument.mget(relevant_doc_ids)
+    relevant_docs = await WerkInstructieDocument.mget(relevant_doc_ids, source_includes=WERK_INSTRUCTIE_DOCUMENT_FIELDS)
 
     logger.info(f"Found {len(relevant_docs)} relevant documents")
     for doc in relevant_docs:
@@ -152,7 +289,6 @@ async def search_werk_instructies(query: str) -> VectorSearchWerkInstructieResul
         )
 
     return VectorSearchWerkInstructieResult(
-        wi_documents=[doc.body for doc in relevant_docs],
         wi_chunks=[
             [
                 str(chunk.chunk_text)
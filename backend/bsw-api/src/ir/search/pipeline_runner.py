@@ -1,8 +1,11 @@
+import asyncio
+import os
+from typing import Any, Awaitable
 from sqlalchemy.orm import Session
 import httpx
 
 from api.models import ChatQuery
-from ir.rag.interface import search_law_article, search_case_law, search_werk_instructie
+from ir.rag.interface import search_rag_sources
 from ir.graph.interface import query_taxonomy
 from generation.interface import (
     get_answer_llm,
@@ -23,6 +26,14 @@ from utils.logging.logger import logger
 
 LAWS = ["WOO", "AVG", "AWB", "Archiefwet"]
 
+# Seconds each data source may take before the pipeline continues without it;
+# overridable per source, e.g. PIPELINE_TIMEOUT_TAXONOMY=5
+PIPELINE_SOURCE_TIMEOUT = float(os.getenv("PIPELINE_SOURCE_TIMEOUT", "30"))
+
+
+def get_source_timeout(source: str) -> float:
+    return float(os.getenv(f"PIPELINE_TIMEOUT_{source.upper()}", PIPELINE_SOURCE_TIMEOUT))
+
 
 async def get_sources_list(
     message: str, user_info: dict, dossier: dict = None
@@ -84,7 +95,7 @@ async def run_pipeline(
 
 
     data_sources = await collect_data_sources(
-        chat_query, sources_to_query, db, http_client
+        chat_query, sources_to_query, http_client
     )
 
     llm_response = await get_answer_to_query(
@@ -98,49 +109,70 @@ async def run_pipeline(
     return referenced_response
 
 
+async def collect_source(source: str, coro: Awaitable) -> Any:
+    """Await one data source under its timeout; a slow or failing source yields None instead of failing the pipeline."""
+    try:
+        return await asyncio.wait_for(coro, timeout=get_source_timeout(source))
+    except asyncio.TimeoutError:
+        logger.warning(f"Data source {source} timed out after {get_source_timeout(source)}s, continuing without it")
+    except Exception as e:
+        logger.error(f"Data source {source} failed, continuing without it: {e}")
+    return None
+
+
 async def collect_data_sources(
     chat_query: ChatQuery,
     sources_to_query: list,
-    db: Session,
     http_client: httpx.AsyncClient,
 ) -> dict[str, list[str]]:
-    """Collect data sources for the given chat query"""
+    """
+    Collect data sources for the given chat query.
+
+    The sources do not depend on each other and are queried concurrently,
+    so the latency is that of the slowest source rather than the sum.
+    """
+    tasks = {}
+    async with asyncio.TaskGroup() as group:
+        # Step 1: Perform RAG search over laws, case law and werk instructies in one request
+        matching_sources = [source for source in sources_to_query if source in LAWS]
+        case_law = "Jurisprudentie" in sources_to_query
+        werk_instructie = "WOO-Werkinstructie" in sources_to_query
+        if matching_sources or case_law or werk_instructie:
+            tasks["rag"] = group.create_task(collect_source("rag", search_rag_sources(
+                chat_query=chat_query,
+                law_names=matching_sources or None,
+                case_law=case_law,
+                werk_instructie=werk_instructie,
+            )))
+
+        # Step 2: Perform KG search to find relevant taxonomy terms
+        tasks["taxonomy"] = group.create_task(collect_source(
+            "taxonomy", query_taxonomy(chat_query.message, http_client)
+        ))
+
+        # Step 3: Perform DB search to find relevant rows of selectielijsten based on user query.
+        # The query runs in a worker thread on its own session and is cancelled
+        # by the database once the source timeout has passed.
+        if "Selectielijsten" in sources_to_query:
+            tasks["selectielijsten"] = group.create_task(collect_source(
+                "selectielijsten",
+                search_selectielijsten(chat_query.message, timeout=get_source_timeout("selectielijsten")),
+            ))
 
     pipeline_data = {}
-
-    # Step 1: Perform RAG search
-    matching_sources = [source for source in sources_to_query if source in LAWS]
-    if matching_sources:
-        vector_search_result = await search_law_article(
-            chat_query=chat_query, law_names=matching_sources
-        )
-        if vector_search_result:
-            pipeline_data.update(vector_search_result)
-            # law_uris, law_lido, law_jas = await query_graphs(pipeline_data.get("law_urls", []), http_client)
-            # pipeline_data["law_uris"] = law_uris
-            # pipeline_data["lido_results"] = law_lido
-            # pipeline_data["jas_results"] = law_jas
-
-    if "Jurisprudentie" in sources_to_query:
-        case_law_search_result = await search_case_law(chat_query=chat_query)
-        if case_law_search_result:
-            pipeline_data.update(case_law_search_result)
-
-    if "WOO-Werkinstructie" in sources_to_query:
-        werk_instructie_search_result = await search_werk_instructie(
-            chat_query=chat_query
-        )
-        if werk_instructie_search_result:
-            pipeline_data.update(werk_instructie_search_result)
-
-    # Step 2: Perform DB search to find relevant rows of selectielijsten based on user query
-    if "Selectielijsten" in sources_to_query:
-        selectielijsten_result = await search_selectielijsten(chat_query.message, db)
-        if selectielijsten_result:
-            pipeline_data["selectielijsten"] = selectielijsten_result
-
-    # Step 3: Perform KG search to find relevant taxonomy terms
-    taxonomy_result = await query_taxonomy(chat_query.message, http_client)
+    rag_result = tasks["rag"].result() if "rag" in tasks else None
+    if rag_result:
+        pipeline_data.update(rag_result)
+    # law_uris, law_lido, law_jas = await query_graphs(pipeline_data.get("law_urls", []), http_client)
+    # pipeline_data["law_uris"] = law_uris
+    # pipeline_data["lido_results"] = law_lido
+    # pipeline_data["jas_results"] = law_jas
+
+    selectielijsten_result = tasks["selectielijsten"].result() if "selectielijsten" in tasks else None
+    if selectielijsten_result:
+        pipeline_data["selectielijsten"] = selectielijsten_result
+
+    taxonomy_result = tasks["taxonomy"].result()
     if taxonomy_result:
         pipeline_data["taxonomy"] = taxonomy_result
 
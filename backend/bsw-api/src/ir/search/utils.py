@@ -227,7 +227,7 @@ def get_sources_with_ids_list(data: dict) -> dict:
         SOURCE_TYPES = [
             ("selectielijsten", lambda d: process_selectielijst(d)),
             ("law_documents", lambda d: process_laws(d)),
-            ("cl_documents", lambda d: process_laws(d, is_caselaw=True)),
+            ("cl_titles", lambda d: process_laws(d, is_caselaw=True)),
             ("wi_titles", lambda d: process_werkinstructies(d)),
             ("taxonomy", lambda d: process_taxonomy(d)),
         ]
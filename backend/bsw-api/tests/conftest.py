@@ -0,0 +1,8 @@
+"""Shared fixtures for the bsw-api tests."""
+
+import sys
+from pathlib import Path
+
+# Same layout as the image's PYTHONPATH: the api sources and the shared package
+BACKEND = Path(__file__).resolve().parents[2]
+sys.path += [str(BACKEND / "bsw-api" / "src"), str(BACKEND / "shared" / "src")]
@@ -0,0 +1,84 @@
+"""
+Tests for collecting the pipeline's data sources.
+
+This module tests that the RAG, taxonomy and selectielijsten sources are
+queried concurrently, that a source exceeding its timeout is left out
+while the others still come back, and that the selectielijsten query runs
+on a session of its own bounded by a statement timeout.
+"""
+
+import asyncio
+import importlib
+import pytest
+from types import SimpleNamespace
+from unittest.mock import MagicMock, patch
+
+
+@pytest.fixture
+def pipeline_runner():
+    for module in ("elasticsearch_dsl", "langchain_openai", "langchain_mistralai", "transformers", "stopwordsiso"):
+        pytest.importorskip(module)
+    # The query embedding module creates its LLMClient on import
+    with patch("llm.llm_client.LLMClient"):
+        return importlib.import_module("ir.search.pipeline_runner")
+
+
+class TestCollectDataSources:
+    """Test cases for collect_data_sources."""
+
+    @pytest.mark.asyncio
+    async def test_slow_source_times_out_while_the_others_return(self, pipeline_runner, monkeypatch):
+        started = set()
+        all_started = asyncio.Event()
+
+        async def source(name, result, forever=False):
+            started.add(name)
+            if len(started) == 3:
+                all_started.set()
+            # Only returns if the other sources run at the same time
+            await all_started.wait()
+            if forever:
+                await asyncio.Event().wait()
+            return result
+
+        monkeypatch.setattr(pipeline_runner, "get_source_timeout", lambda name: 0.2)
+        monkeypatch.setattr(
+            pipeline_runner, "search_rag_sources", lambda **kwargs: source("rag", {"laws": "law results"})
+        )
+        monkeypatch.setattr(
+            pipeline_runner, "query_taxonomy", lambda message, client: source("taxonomy", ["archief"])
+        )
+        monkeypatch.setattr(
+            pipeline_runner, "search_selectielijsten",
+            lambda message, timeout: source("selectielijsten", [{"waardering": "V"}], forever=True),
+        )
+
+        data = await pipeline_runner.collect_data_sources(
+            SimpleNamespace(message="Hoe lang bewaar ik dit?"), ["WOO", "Selectielijsten"], MagicMock()
+        )
+
+        assert data == {"laws": "law results", "taxonomy": ["archief"]}
+        assert started == {"rag", "taxonomy", "selectielijsten"}
+
+
+class TestSearchSelectielijsten:
+    """Test cases for the selectielijsten database search."""
+
+    @pytest.mark.asyncio
+    async def test_query_uses_its_own_session_and_statement_timeout(self, pipeline_runner, monkeypatch):
+        interface = importlib.import_module("ir.db.interface")
+        session = MagicMock()
+        session.__enter__.return_value = session
+        row = MagicMock()
+        row._asdict.return_value = {"id": 1, "waardering": "V"}
+        session.execute.side_effect = [MagicMock(), MagicMock(fetchall=MagicMock(return_value=[row]))]
+        monkeypatch.setattr(interface, "SessionLocal", MagicMock(return_value=session))
+
+        rows = await interface.search_selectielijsten("archief bewaren", timeout=2.5)
+
+        assert rows == [{"waardering": "V"}]
+        set_timeout, query = session.execute.call_args_list
+        assert "statement_timeout" in str(set_timeout.args[0])
+        assert set_timeout.args[1] == {"timeout": "2500"}
+        assert "FROM selectielijsten" in str(query.args[0])
+        session.__exit__.assert_called_once()
@@ -0,0 +1,103 @@
+"""
+Tests for the shared query embedding.
+
+This module tests that get_query_embedding embeds a normalized query once
+for concurrent searches, keeps embeddings in an LRU cache that expires
+after QUERY_EMBEDDING_CACHE_TTL, and does not cache failed or cancelled
+embedding calls.
+"""
+
+import asyncio
+import importlib
+import pytest
+from unittest.mock import AsyncMock, MagicMock, patch
+
+
+@pytest.fixture
+def query_embedding(monkeypatch):
+    for module in ("langchain_openai", "langchain_mistralai", "transformers"):
+        pytest.importorskip(module)
+    # The module creates its LLMClient on import
+    with patch("llm.llm_client.LLMClient"):
+        module = importlib.import_module("ir.rag.query_embedding")
+
+    client = MagicMock()
+    client.get_embedding = AsyncMock(side_effect=lambda query: [float(len(query))])
+    monkeypatch.setattr(module, "llm_client", client)
+    monkeypatch.setattr(module, "_cache", type(module._cache)())
+    monkeypatch.setattr(module, "_pending", {})
+    return module
+
+
+class TestQueryEmbedding:
+    """Test cases for get_query_embedding."""
+
+    @pytest.mark.asyncio
+    async def test_concurrent_searches_share_one_call(self, query_embedding):
+        release = asyncio.Event()
+
+        async def get_embedding(query):
+            await release.wait()
+            return [1.0]
+
+        query_embedding.llm_client.get_embedding.side_effect = get_embedding
+        searches = [
+            asyncio.create_task(query_embedding.get_query_embedding(query))
+            for query in ("Wat is de Woo?", " Wat  is de Woo? ", "Wat is de Woo?")
+        ]
+        await asyncio.sleep(0)
+        release.set()
+
+        assert await asyncio.gather(*searches) == [[1.0]] * 3
+        query_embedding.llm_client.get_embedding.assert_awaited_once_with("Wat is de Woo?")
+
+    @pytest.mark.asyncio
+    async def test_cancelled_search_does_not_cancel_the_others(self, query_embedding):
+        release = asyncio.Event()
+
+        async def get_embedding(query):
+            await release.wait()
+            return [1.0]
+
+        query_embedding.llm_client.get_embedding.side_effect = get_embedding
+        first = asyncio.create_task(query_embedding.get_query_embedding("woo"))
+        second = asyncio.create_task(query_embedding.get_query_embedding("woo"))
+        await asyncio.sleep(0)
+        first.cancel()
+        release.set()
+
+        assert await second == [1.0]
+        assert first.cancelled()
+
+    @pytest.mark.asyncio
+    async def test_cached_embedding_is_reused_until_it_expires(self, query_embedding, monkeypatch):
+        now = [1000.0]
+        monkeypatch.setattr(query_embedding.time, "monotonic", lambda: now[0])
+        monkeypatch.setattr(query_embedding, "QUERY_EMBEDDING_CACHE_TTL", 60)
+
+        await query_embedding.get_query_embedding("woo")
+        now[0] += 59
+        await query_embedding.get_query_embedding("woo")
+        assert query_embedding.llm_client.get_embedding.await_count == 1
+
+        now[0] += 2
+        await query_embedding.get_query_embedding("woo")
+        assert query_embedding.llm_client.get_embedding.await_count == 2
+
+    @pytest.mark.asyncio
+    async def test_least_recently_used_query_is_evicted(self, query_embedding, monkeypatch):
+        monkeypatch.setattr(query_embedding, "QUERY_EMBEDDING_CACHE_SIZE", 2)
+
+        for query in ("a", "b", "a", "c"):
+            await query_embedding.get_query_embedding(query)
+
+        assert list(query_embedding._cache) == ["a", "c"]
+
+    @pytest.mark.asyncio
+    async def test_failed_embedding_is_not_cached(self, query_embedding):
+        query_embedding.llm_client.get_embedding.side_effect = [RuntimeError("throttled"), [1.0]]
+
+        with pytest.raises(RuntimeError):
+            await query_embedding.get_query_embedding("woo")
+        assert await query_embedding.get_query_embedding("woo") == [1.0]
+        assert query_embedding._pending == {}
@@ -0,0 +1,137 @@
+"""
+Tests for the RAG chunk search.
+
+This module tests that fuse_rankings merges ranked hit lists by
+reciprocal rank fusion: hits found by several retrievers rank first,
+ties keep the order in which hits were first seen, and only the top k
+are returned. It also tests that a source whose search fails within the
+_msearch yields False without failing the other sources, and that the
+documents of each source are fetched with only the fields its result uses.
+"""
+
+import datetime
+import importlib
+import pytest
+from types import SimpleNamespace
+from unittest.mock import AsyncMock, MagicMock, patch
+
+
+@pytest.fixture
+def search():
+    for module in ("elasticsearch_dsl", "langchain_openai", "langchain_mistralai", "transformers"):
+        pytest.importorskip(module)
+    # The query embedding module creates its LLMClient on import
+    with patch("llm.llm_client.LLMClient"):
+        return importlib.import_module("ir.rag.search")
+
+
+def _hits(*ids: str) -> list:
+    return [SimpleNamespace(meta=SimpleNamespace(id=hit_id)) for hit_id in ids]
+
+
+def _ids(hits: list) -> list[str]:
+    return [hit.meta.id for hit in hits]
+
+
+class TestFuseRankings:
+    """Test cases for fuse_rankings."""
+
+    def test_hits_in_both_rankings_rank_first(self, search):
+        knn = _hits("a", "b", "c")
+        bm25 = _hits("d", "c", "b")
+
+        assert _ids(search.fuse_rankings([knn, bm25], 4)) == ["b", "c", "a", "d"]
+
+    def test_scores_follow_the_rank_constant(self, search, monkeypatch):
+        knn = _hits("a", "b")
+        bm25 = _hits("c", "d", "e", "f", "g", "b")
+
+        # With a large constant, appearing in both lists outweighs the ranks
+        monkeypatch.setattr(search, "RRF_RANK_CONSTANT", 60)
+        assert _ids(search.fuse_rankings([knn, bm25], 2))[0] == "b"
+        # With a small one, the top ranks win: a and c score 1/2, b 1/3 + 1/7
+        monkeypatch.setattr(search, "RRF_RANK_CONSTANT", 1)
+        assert _ids(search.fuse_rankings([knn, bm25], 2)) == ["a", "c"]
+
+    def test_ties_keep_first_seen_order(self, search):
+        assert _ids(search.fuse_rankings([_hits("a", "b"), _hits("c", "d")], 4)) == ["a", "c", "b", "d"]
+
+    def test_only_top_k_are_returned_once(self, search):
+        knn = _hits("a", "b", "c")
+        fused = search.fuse_rankings([knn, _hits("a", "b", "c")], 2)
+
+        assert _ids(fused) == ["a", "b"]
+        assert fused[0] is knn[0]
+
+    def test_single_and_empty_rankings(self, search):
+        assert _ids(search.fuse_rankings([_hits("a", "b")], 5)) == ["a", "b"]
+        assert search.fuse_rankings([[], []], 5) == []
+
+
+class TestSearchSources:
+    """Test cases for search_sources."""
+
+    @pytest.mark.asyncio
+    async def test_failed_search_fails_only_its_source(self, search, monkeypatch):
+        multi_search = MagicMock()
+        multi_search.add.return_value = multi_search
+        # Failed searches of an _msearch come back as None
+        multi_search.execute = AsyncMock(return_value=[None, _hits("w1")])
+        monkeypatch.setattr(search, "AsyncMultiSearch", lambda: multi_search)
+        monkeypatch.setattr(search, "get_query_embedding", AsyncMock(return_value=[0.1]))
+        monkeypatch.setattr(search, "_case_law_result", AsyncMock())
+        monkeypatch.setattr(search, "_werk_instructie_result", AsyncMock(return_value="werk instructies"))
+
+        results = await search.search_sources("vraag", case_law=True, werk_instructie=True)
+
+        assert results == {"case_law": False, "werk_instructie": "werk instructies"}
+        multi_search.execute.assert_awaited_once_with(raise_on_error=False)
+        search._case_law_result.assert_not_awaited()
+        assert _ids(search._werk_instructie_result.await_args.args[0]) == ["w1"]
+
+
+def _chunks(*document_ids: str) -> list:
+    return [SimpleNamespace(document_id=doc_id, chunk_text=f"chunk of {doc_id}") for doc_id in document_ids]
+
+
+class TestDocumentProjections:
+    """Test that mget fetches only the projected fields and results carry no unused bodies."""
+
+    @pytest.mark.asyncio
+    async def test_law_documents_include_their_body(self, search, monkeypatch):
+        doc = SimpleNamespace(title="Artikel 1", body="tekst", law_name="Woo", url="https://wetten.nl/1")
+        mget = AsyncMock(return_value=[doc])
+        monkeypatch.setattr(search.LegalDocument, "mget", mget)
+
+        result = await search._law_result(_chunks("l1"))
+
+        mget.assert_awaited_once_with(["l1"], source_includes=["title", "body", "law_name", "url"])
+        assert result.law_documents == ["tekst"]
+
+    @pytest.mark.asyncio
+    async def test_case_law_is_fetched_without_the_ruling(self, search, monkeypatch):
+        doc = SimpleNamespace(
+            title="ECLI:NL:RVS:2024:1", zaaknummer="2024/1", inhoudsindicatie="samenvatting",
+            datum_uitspraak=datetime.date(2024, 1, 1), url="https://uitspraken.nl/1",
+        )
+        mget = AsyncMock(return_value=[doc])
+        monkeypatch.setattr(search.CaseLawDocument, "mget", mget)
+
+        result = await search._case_law_result(_chunks("c1"))
+
+        mget.assert_awaited_once_with(
+            ["c1"], source_includes=["title", "zaaknummer", "inhoudsindicatie", "datum_uitspraak", "url"]
+        )
+        assert "cl_documents" not in result.model_dump()
+        assert result.cl_chunks == [["chunk of c1"]]
+
+    @pytest.mark.asyncio
+    async def test_werk_instructies_are_fetched_without_their_body(self, search, monkeypatch):
+        mget = AsyncMock(return_value=[SimpleNamespace(title="Werkinstructie", url="https://woo.nl/1")])
+        monkeypatch.setattr(search.WerkInstructieDocument, "mget", mget)
+
+        result = await search._werk_instructie_result(_chunks("w1"))
+
+        mget.assert_awaited_once_with(["w1"], source_includes=["title", "url"])
+        assert "wi_documents" not in result.model_dump()
+        assert result.wi_titles == ["Werkinstructie"]
@@ -0,0 +1,39 @@
+"""
+Tests for the search source helpers.
+
+This module tests that get_sources_with_ids_list turns the merged RAG
+results into source lists, with case law recognised by its titles now
+that case-law results no longer carry document bodies.
+"""
+
+import datetime
+from ir.search.utils import get_sources_with_ids_list
+
+
+class TestGetSourcesWithIdsList:
+    """Test cases for get_sources_with_ids_list."""
+
+    def test_case_laws_are_listed_without_documents(self):
+        data = {
+            "cl_chunks": [["chunk"]],
+            "cl_titles": ["ECLI:NL:RVS:2024:1"],
+            "cl_inhoudsindicaties": ["samenvatting"],
+            "cl_date_uitspraken": [datetime.date(2024, 1, 1)],
+            "cl_case_numbers": ["2024/1"],
+            "cl_urls": ["https://uitspraken.nl/1"],
+        }
+
+        sources = get_sources_with_ids_list(data)
+
+        (case_law,) = sources["case_laws"]
+        assert case_law["type"] == "case_law"
+        assert case_law["value"]["title"] == "ECLI:NL:RVS:2024:1"
+        assert case_law["value"]["date_uitspraak"] == "2024-01-01"
+
+    def test_werkinstructies_are_listed_without_documents(self):
+        data = {"wi_chunks": [["chunk"]], "wi_titles": ["Werkinstructie"], "wi_urls": ["https://woo.nl/1"]}
+
+        sources = get_sources_with_ids_list(data)
+
+        assert list(sources) == ["werkinstructies"]
+        assert sources["werkinstructies"][0]["value"]["title"] == "Werkinstructie"
@@ -20,6 +20,37 @@ class Config:
     # Tika server configuration
     tika_server_url: str = "http://localhost:9998"
     dry_run: bool = False
+    # Concurrency limits per full-ingest pipeline stage
+    list_concurrency: int = 4
+    fetch_concurrency: int = 8
+    extract_concurrency: int = 4
+    enrich_concurrency: int = 8
+    index_concurrency: int = 1
+    # Flush built documents to Elasticsearch once either limit is reached
+    index_batch_size: int = 200
+    index_batch_bytes: int = 50 * 1024 * 1024
+    # Skip files whose etag matches the indexed document on full ingest
+    skip_unchanged: bool = True
+    # Activities fetched and checkpointed per batch on incremental ingest
+    activity_page_size: int = 500
+    # Sharded full ingest: dossiers per worker at a time and work item leases
+    worker_concurrency: int = 4
+    work_item_max_attempts: int = 3
+    work_item_heartbeat_seconds: int = 30
+    work_item_stale_seconds: int = 300
+    worker_poll_seconds: int = 10
+    # Incremental daemon: poll interval bounds, backoff while idle and how
+    # long resolved shares and group memberships are reused
+    daemon_min_interval_seconds: float = 2.0
+    daemon_max_interval_seconds: float = 60.0
+    daemon_backoff_factor: float = 2.0
+    daemon_cache_ttl_seconds: int = 600
+    # Paragraph chunk index: chunks of up to chunk_size characters, embedded
+    # embed_batch_size at a time with at most embed_concurrency requests
+    chunk_index: bool = False
+    chunk_size: int = 1500
+    embed_batch_size: int = 64
+    embed_concurrency: int = 2
 
     @staticmethod
     def from_env(envfile: str = None) -> "Config":
@@ -48,5 +79,27 @@ class Config:
             postgres_user=env("POSTGRES_USER", "ingestor"),
             postgres_password=env("POSTGRES_PASSWORD", "ingestor_password"),
             tika_server_url=env("TIKA_SERVER_URL", "http://localhost:9998"),
-            dry_run=env("DRY_RUN", "false").lower() == "true"
+            dry_run=env("DRY_RUN", "false").lower() == "true",
+            list_concurrency=int(env("INGEST_LIST_CONCURRENCY", "4")),
+            fetch_concurrency=int(env("INGEST_FETCH_CONCURRENCY", "8")),
+            extract_concurrency=int(env("INGEST_EXTRACT_CONCURRENCY", "4")),
+            enrich_concurrency=int(env("INGEST_ENRICH_CONCURRENCY", "8")),
+            index_concurrency=int(env("INGEST_INDEX_CONCURRENCY", "1")),
+            index_batch_size=int(env("INGEST_INDEX_BATCH_SIZE", "200")),
+            index_batch_bytes=int(env("INGEST_INDEX_BATCH_BYTES", str(50 * 1024 * 1024))),
+            skip_unchanged=env("INGEST_SKIP_UNCHANGED", "true").lower() == "true",
+            activity_page_size=int(env("INGEST_ACTIVITY_PAGE_SIZE", "500")),
+            worker_concurrency=int(env("INGEST_WORKER_CONCURRENCY", "4")),
+            work_item_max_attempts=int(env("INGEST_WORK_ITEM_MAX_ATTEMPTS", "3")),
+            work_item_heartbeat_seconds=int(env("INGEST_WORK_ITEM_HEARTBEAT_SECONDS", "30")),
+            work_item_stale_seconds=int(env("INGEST_WORK_ITEM_STALE_SECONDS", "300")),
+            worker_poll_seconds=int(env("INGEST_WORKER_POLL_SECONDS", "10")),
+            daemon_min_interval_seconds=float(env("INGEST_DAEMON_MIN_INTERVAL_SECONDS", "2")),
+            daemon_max_interval_seconds=float(env("INGEST_DAEMON_MAX_INTERVAL_SECONDS", "60")),
+            daemon_backoff_factor=float(env("INGEST_DAEMON_BACKOFF_FACTOR", "2")),
+            daemon_cache_ttl_seconds=int(env("INGEST_DAEMON_CACHE_TTL_SECONDS", "600")),
+            chunk_index=env("INGEST_CHUNK_INDEX", "false").lower() == "true",
+            chunk_size=int(env("INGEST_CHUNK_SIZE", "1500")),
+            embed_batch_size=int(env("INGEST_EMBED_BATCH_SIZE", "64")),
+            embed_concurrency=int(env("INGEST_EMBED_CONCURRENCY", "2")),
         )
@@ -1,8 +1,13 @@
 import os
 import io
-import contextlib
-from tika import parser as tika_parser  # type: ignore
-from utils import logger
+import time
+import threading
+import multiprocessing
+from multiprocessing.connection import Connection
+from multiprocessing.process import BaseProcess
+from typing import BinaryIO
+import requests
+from ingest_utils import logger
 import dotenv
 
 SUPPORTED_EXTENSIONS = {
@@ -19,43 +24,223 @@ dotenv.load_dotenv()
 # Set Tika server endpoint from environment variable, default to localhost
 os.environ['TIKA_SERVER_URL'] = dotenv.get_key(dotenv.find_dotenv(), 'TIKA_SERVER_URL') or 'http://localhost:9998'
 
+# Concurrent Tika requests per extractor and PyMuPDF fallback processes
+TIKA_MAX_CONCURRENCY = int(os.getenv("TIKA_MAX_CONCURRENCY", "4"))
+TIKA_CONNECT_TIMEOUT = float(os.getenv("TIKA_CONNECT_TIMEOUT", "5"))
+PDF_FALLBACK_WORKERS = int(os.getenv("PDF_FALLBACK_WORKERS", "2"))
+# PyMuPDF fallbacks are forked from a small fork server instead of the
+# ingestor: forking its threads could deadlock the child on inherited locks
+# and would copy the ingestor's memory for every PDF
+_PDF_CONTEXT = multiprocessing.get_context("forkserver")
+_PDF_CONTEXT.set_forkserver_preload([__name__, "fitz"])
+
+MB = 1024 * 1024
+# Per-extension (timeout in seconds, max size in bytes). Override with
+# EXTRACT_TIMEOUT_<EXT> / EXTRACT_MAX_BYTES_<EXT>, e.g. EXTRACT_TIMEOUT_PPTX=600.
+DEFAULT_LIMITS = {
+    ".pdf": (120, 200 * MB),
+    ".docx": (60, 100 * MB),
+    ".doc": (60, 100 * MB),
+    ".ppt": (120, 200 * MB),
+    ".pptx": (120, 200 * MB),
+    ".xls": (120, 100 * MB),
+    ".xlsx": (120, 100 * MB),
+    ".txt": (30, 50 * MB),
+    ".md": (30, 50 * MB),
+}
+EXTRACT_LIMITS = {
+    ext: (
+        float(os.getenv(f"EXTRACT_TIMEOUT_{ext[1:].upper()}", timeout)),
+        int(os.getenv(f"EXTRACT_MAX_BYTES_{ext[1:].upper()}", max_bytes)),
+    )
+    for ext, (timeout, max_bytes) in DEFAULT_LIMITS.items()
+}
+
+# Extracted locally, a Tika round-trip adds nothing for these
+PLAIN_TEXT_EXTENSIONS = {".txt", ".md"}
+
+
+class _SizedReader:
+    """
+    Request body that streams a file with a known length.
+
+    requests would call fileno() on a SpooledTemporaryFile to find its size,
+    forcing small in-memory files to roll over to disk.
+    """
+
+    def __init__(self, stream: BinaryIO):
+        self.stream = stream
+        self._len = ContentExtractor._size(stream) - stream.tell()
+
+    def __len__(self) -> int:
+        return self._len
+
+    def read(self, size: int = -1) -> bytes:
+        return self.stream.read(size)
+
+
+def _pdf_worker(content: bytes, conn: Connection):
+    """Entry point of a PyMuPDF fallback process; sends (ok, text or error) back."""
+    try:
+        conn.send((True, ContentExtractor._extract_pdf(content)))
+    except Exception as e:
+        conn.send((False, repr(e)))
+    finally:
+        conn.close()
+
 
 class ContentExtractor:
-    def __init__(self):
-        self.tika_available = "tika_parser" in globals()
-        self.tika_server_url = os.environ['TIKA_SERVER_URL']
+    def __init__(self, tika_server_url: str | None = None):
+        self.tika_server_url = (tika_server_url or os.environ['TIKA_SERVER_URL']).rstrip("/")
+        self.tika_available = bool(self.tika_server_url)
+        self._session = requests.Session()
+        adapter = requests.adapters.HTTPAdapter(pool_maxsize=TIKA_MAX_CONCURRENCY)
+        self._session.mount("http://", adapter)
+        self._session.mount("https://", adapter)
+        self._tika_slots = threading.BoundedSemaphore(TIKA_MAX_CONCURRENCY)
+        # PyMuPDF fallbacks run in their own process, killed when they time out
+        self._pdf_slots = threading.BoundedSemaphore(PDF_FALLBACK_WORKERS)
+        self._pdf_processes: set[BaseProcess] = set()
+        self._pdf_lock = threading.Lock()
+        self._metrics: dict[str, dict[str, float]] = {}
+        self._metrics_lock = threading.Lock()
 
 
     def can_extract(self, ext: str) -> bool:
         return ext.lower() in SUPPORTED_EXTENSIONS
 
-    def extract(self, path: str, content: bytes) -> str:
+    def extract(self, path: str, content: bytes | BinaryIO) -> str:
+        """
+        Extract text from a file's content.
+
+        Content may be bytes or a seekable binary file object, which is
+        streamed to Tika instead of being read into memory. Files above the
+        extension's max size are skipped and every step is bounded by the
+        extension's timeout.
+        """
         ext = os.path.splitext(path)[1].lower()
         if not self.can_extract(ext):
             logger.warning(f"Unsupported file extension for extraction: {ext}")
             raise NotSupportedError(f"Unsupported file extension: {ext}")
-        # Prefer Tika for broad coverage, if available
-        if self.tika_available:
-            with contextlib.suppress(Exception):
-                parsed = tika_parser.from_buffer(content, f"{self.tika_server_url}/tika")
-                text = parsed.get("content")
+
+        timeout, max_bytes = EXTRACT_LIMITS[ext]
+        stream = io.BytesIO(content) if isinstance(content, (bytes, bytearray)) else content
+        size = self._size(stream)
+        self._count(ext, "files")
+        self._count(ext, "bytes", size)
+        if size > max_bytes:
+            logger.warning(f"Skipping extraction of {path}: {size} bytes exceeds the {max_bytes} byte limit for {ext}")
+            self._count(ext, "too_large")
+            return ""
+
+        started = time.monotonic()
+        try:
+            if ext in PLAIN_TEXT_EXTENSIONS:
+                return self._extract_txt(stream.read())
+
+            if self.tika_available:
+                text = self._extract_tika(path, ext, stream, timeout)
                 if text:
-                    return text.strip()
-        # Fallbacks per type
-        if ext == ".pdf" and "fitz":
-            import fitz
-            return self._extract_pdf(content)
-        if ext == ".txt" or ext == ".md":
-            print("Extracting as \".txt\" or \".md\"")
-            return self._extract_txt(content)
+                    return text
+
+            # Fallbacks per type
+            if ext == ".pdf":
+                stream.seek(0)
+                self._count(ext, "fallback")
+                return self._extract_pdf_isolated(path, stream.read(), timeout)
+            return ""
+        finally:
+            self._count(ext, "seconds", time.monotonic() - started)
+
+    def metrics(self) -> dict[str, dict[str, float]]:
+        """Per-extension counters: files, bytes, seconds, too_large, tika_errors, timeouts, fallback, errors."""
+        with self._metrics_lock:
+            return {ext: dict(counters) for ext, counters in self._metrics.items()}
+
+    def close(self):
+        """Close the Tika session and kill PyMuPDF fallbacks that are still running."""
+        self._session.close()
+        with self._pdf_lock:
+            processes = list(self._pdf_processes)
+        for process in processes:
+            process.kill()
+
+    def _extract_tika(self, path: str, ext: str, stream: BinaryIO, timeout: float) -> str:
+        with self._tika_slots:
+            try:
+                resp = self._session.put(
+                    f"{self.tika_server_url}/tika",
+                    data=_SizedReader(stream),
+                    headers={"Accept": "text/plain; charset=utf-8"},
+                    timeout=(TIKA_CONNECT_TIMEOUT, timeout),
+                )
+                resp.raise_for_status()
+                resp.encoding = "utf-8"
+                return resp.text.strip()
+            except requests.Timeout:
+                logger.warning(f"Tika extraction of {path} timed out after {timeout}s")
+                self._count(ext, "timeouts")
+            except Exception as e:
+                logger.warning(f"Tika extraction of {path} failed: {e}")
+                self._count(ext, "tika_errors")
         return ""
 
+    def _extract_pdf_isolated(self, path: str, content: bytes, timeout: float) -> str:
+        """
+        Run PyMuPDF in a separate process so a pathological PDF cannot stall the ingestor.
+
+        At most PDF_FALLBACK_WORKERS processes run at a time. A process that
+        does not answer within the timeout is killed, so a hung PyMuPDF call
+        never holds on to a fallback slot.
+        """
+        with self._pdf_slots:
+            receiver, sender = _PDF_CONTEXT.Pipe(duplex=False)
+            process = _PDF_CONTEXT.Process(target=_pdf_worker, args=(content, sender), daemon=True)
+            with self._pdf_lock:
+                self._pdf_processes.add(process)
+            try:
+                process.start()
+                sender.close()
+                if not receiver.poll(timeout):
+                    logger.warning(f"PyMuPDF extraction of {path} timed out after {timeout}s")
+                    self._count(".pdf", "timeouts")
+                    return ""
+                ok, result = receiver.recv()
+                if ok:
+                    return result
+                logger.warning(f"PyMuPDF extraction of {path} failed: {result}")
+            except Exception as e:
+                logger.warning(f"PyMuPDF extraction of {path} failed: {e}")
+            finally:
+                sender.close()
+                receiver.close()
+                if process.pid is not None:
+                    process.kill()
+                    process.join()
+                with self._pdf_lock:
+                    self._pdf_processes.discard(process)
+            self._count(".pdf", "errors")
+        return ""
+
+    def _count(self, ext: str, counter: str, amount: float = 1):
+        with self._metrics_lock:
+            counters = self._metrics.setdefault(ext, {})
+            counters[counter] = counters.get(counter, 0) + amount
+
+    @staticmethod
+    def _size(stream: BinaryIO) -> int:
+        pos = stream.tell()
+        size = stream.seek(0, os.SEEK_END)
+        stream.seek(pos)
+        return size
+
     @staticmethod
     def _extract_txt(content: bytes) -> str:
         return content.decode("utf-8", errors="replace")
 
     @staticmethod
     def _extract_pdf(content: bytes) -> str:
+        import fitz
         bio = io.BytesIO(content)
         doc = fitz.open(stream=bio, filetype="pdf")
         texts = []
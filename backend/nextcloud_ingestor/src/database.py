@@ -3,7 +3,7 @@ SQLAlchemy models for the nextcloud-ingestor state management.
 """
 
 from datetime import datetime
-from sqlalchemy import create_engine, Column, Integer, DateTime, func
+from sqlalchemy import create_engine, Column, Integer, String, Text, DateTime, ForeignKey, Index, func
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
 
@@ -26,6 +26,87 @@ class ActivityState(Base):
         return f"<ActivityState(id={self.id}, last_activity_id={self.last_activity_id}, last_check={self.last_check_timestamp})>"
 
 
+class IngestRun(Base):
+    """
+    A full ingest run and its progress; its dossiers are tracked as work items.
+    """
+    __tablename__ = 'ingest_runs'
+
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    mode = Column(String(16), nullable=False, default='sharded')  # full | sharded
+    status = Column(String(32), nullable=False, default='running')  # running | completed | completed_with_errors
+    documents_indexed = Column(Integer, nullable=False, default=0)
+    documents_failed = Column(Integer, nullable=False, default=0)
+    index_suffix = Column(String(32), nullable=True)  # versioned indices of a blue/green reindex
+    activity_id = Column(Integer, nullable=True)  # latest activity ID when the run started
+    created_at = Column(DateTime(timezone=True), nullable=False, default=func.now())
+    finished_at = Column(DateTime(timezone=True), nullable=True)
+
+    def __repr__(self):
+        return f"<IngestRun(id={self.id}, status={self.status})>"
+
+
+class IngestRunModifier(Base):
+    """
+    The last modifying user of a file, scanned from the activity stream once
+    per run; resumed runs and workers look up the files of each dossier.
+
+    Only the user is kept: the document's modification time comes from the
+    file's own WebDAV getlastmodified.
+    """
+    __tablename__ = 'ingest_run_modifiers'
+
+    run_id = Column(Integer, ForeignKey('ingest_runs.id', ondelete='CASCADE'), primary_key=True)
+    file_id = Column(String(64), primary_key=True)
+    user = Column(String(255), nullable=False)
+
+    def __repr__(self):
+        return f"<IngestRunModifier(run_id={self.run_id}, file_id={self.file_id}, user={self.user})>"
+
+
+class WorkItem(Base):
+    """
+    One dossier of a full ingest run; the checkpoint for resuming and the unit
+    sharded workers claim with SELECT ... FOR UPDATE SKIP LOCKED.
+    """
+    __tablename__ = 'ingest_work_items'
+    __table_args__ = (Index('ix_ingest_work_items_run_status', 'run_id', 'status'),)
+
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    run_id = Column(Integer, ForeignKey('ingest_runs.id', ondelete='CASCADE'), nullable=False)
+    user = Column(String(255), nullable=False)
+    parent_path = Column(Text, nullable=False)
+    dossier_name = Column(Text, nullable=False)
+    status = Column(String(16), nullable=False, default='pending')  # pending | claimed | done | failed
+    attempts = Column(Integer, nullable=False, default=0)
+    worker_id = Column(String(255), nullable=True)
+    heartbeat_at = Column(DateTime(timezone=True), nullable=True)
+    last_error = Column(Text, nullable=True)
+    created_at = Column(DateTime(timezone=True), nullable=False, default=func.now())
+    updated_at = Column(DateTime(timezone=True), nullable=False, default=func.now(), onupdate=func.now())
+
+    def __repr__(self):
+        return f"<WorkItem(id={self.id}, run_id={self.run_id}, dossier={self.dossier_name}, status={self.status})>"
+
+
+class DeadLetter(Base):
+    """
+    A file that could not be ingested, recorded instead of aborting the run.
+    """
+    __tablename__ = 'ingest_dead_letters'
+
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    run_id = Column(Integer, ForeignKey('ingest_runs.id', ondelete='SET NULL'), nullable=True, index=True)
+    user = Column(String(255), nullable=True)
+    path = Column(Text, nullable=False)
+    nextcloud_id = Column(String(64), nullable=True)
+    error = Column(Text, nullable=False)
+    created_at = Column(DateTime(timezone=True), nullable=False, default=func.now())
+
+    def __repr__(self):
+        return f"<DeadLetter(id={self.id}, path={self.path})>"
+
+
 def create_database_engine(config):
     """Create a SQLAlchemy engine from config."""
     database_url = f"postgresql://{config.postgres_user}:{config.postgres_password}@{config.postgres_host}:{config.postgres_port}/{config.postgres_db}"
@@ -1,7 +1,6 @@
 import os
 from elasticsearch import Elasticsearch, helpers, ApiError
-from elasticsearch.helpers import BulkIndexError
-from utils import logger, hash
+from ingest_utils import logger, hash
 from typing import Iterable
 from urllib.parse import urlparse
 import datetime
@@ -10,12 +9,25 @@ import datetime
 ES_URL = os.getenv("ES_URL", "http://localhost:9200")
 ES_INDEX_DOCUMENTS = os.getenv("ES_INDEX_DOCUMENTS", "bsw-index")
 ES_INDEX_DOSSIERS = os.getenv("ES_INDEX_DOSSIERS", "dossier-index")
+ES_INDEX_CHUNKS = os.getenv("ES_INDEX_CHUNKS", "bsw-chunks-index")
+ES_EMBEDDING_DIMS = int(os.getenv("ES_EMBEDDING_DIMS", "1024"))
 ES_USER = os.getenv("ES_USER", None)
 ES_PASSWORD = os.getenv("ES_PASSWORD", None)
 
+# Bulk request sizing
+BULK_CHUNK_SIZE = int(os.getenv("ES_BULK_CHUNK_SIZE", "200"))
+BULK_MAX_CHUNK_BYTES = int(os.getenv("ES_BULK_MAX_CHUNK_BYTES", str(20 * 1024 * 1024)))
+BULK_MAX_RETRIES = int(os.getenv("ES_BULK_MAX_RETRIES", "5"))
+
+# Search-time index settings, restored after a blue/green reindex
+ES_NUMBER_OF_REPLICAS = int(os.getenv("ES_NUMBER_OF_REPLICAS", "0"))
+ES_REFRESH_INTERVAL = os.getenv("ES_REFRESH_INTERVAL", "1s")
+ES_FORCEMERGE_SEGMENTS = int(os.getenv("ES_FORCEMERGE_SEGMENTS", "1"))
+ES_REINDEX_TIMEOUT = int(os.getenv("ES_REINDEX_TIMEOUT", "3600"))
+
 
 class ESClient:
-    def __init__(self, dry_run: bool = False):
+    def __init__(self, dry_run: bool = False, chunks: bool = False):
         if not dry_run:
             parsed = urlparse(ES_URL)
             if parsed.path not in ("", "/"):
@@ -29,6 +41,9 @@ class ESClient:
         self.dry_run = dry_run
         self.index_docs = ES_INDEX_DOCUMENTS
         self.index_dossiers = ES_INDEX_DOSSIERS
+        # Paragraph chunks with embeddings, kept next to the documents index
+        self.chunks = chunks
+        self.index_chunks = ES_INDEX_CHUNKS
 
         print(f"ESClient initialized with dry_run={self.dry_run}")
         print(f"ES_URL={ES_URL}, ES_INDEX_DOCUMENTS={ES_INDEX_DOCUMENTS}, ES_INDEX_DOSSIERS={ES_INDEX_DOSSIERS}")
@@ -39,10 +54,7 @@ class ESClient:
             logger.info("Dry run: skipping index creation")
             return
         
-        for idx, mapping in [
-            (ES_INDEX_DOCUMENTS, self._documents_mapping()),
-            (ES_INDEX_DOSSIERS, self._dossiers_mapping()),
-        ]:
+        for idx, _, mapping in self._managed_indices():
             try:
                 if self.es.indices.exists(index=idx):
                     logger.info("Index %s already exists", idx)
@@ -55,14 +67,110 @@ class ESClient:
                 logger.error(f"Elasticsearch error on index {idx}: {e}")
                 raise
 
-    def _index_docs(self, docs: Iterable[dict], index: str):
+    def begin_reindex(self, suffix: str | None = None) -> str:
+        """
+        Direct all writes to fresh versioned indices for a blue/green reindex.
+
+        The indices are named <alias>-<suffix> and created with refresh and
+        replicas disabled for bulk loading. Searches keep using the aliases
+        until finish_reindex swaps them. Passing the suffix of an earlier,
+        interrupted reindex reuses its indices.
+
+        Returns:
+            str: The suffix of the versioned indices
+        """
+        suffix = suffix or datetime.datetime.now(datetime.timezone.utc).strftime("%Y%m%d%H%M%S")
+        targets = []
+        for alias, attr, mapping in self._managed_indices():
+            setattr(self, attr, f"{alias}-{suffix}")
+            targets.append((f"{alias}-{suffix}", mapping))
+        if self.dry_run:
+            logger.info(f"Dry run: would reindex into {[idx for idx, _ in targets]}")
+            return suffix
+
+        for idx, mapping in targets:
+            if self.es.indices.exists(index=idx):
+                logger.info("Reindex target %s already exists, continuing into it", idx)
+                continue
+            mapping["settings"]["index"].update({"refresh_interval": "-1", "number_of_replicas": 0})
+            logger.info("Creating reindex target %s", idx)
+            self.es.indices.create(index=idx, body=mapping)
+        return suffix
+
+    def finish_reindex(self):
+        """
+        Make the indices of begin_reindex live.
+
+        Restores the search settings, force-merges the new indices and then
+        moves all aliases in one atomic update_aliases call. The indices the
+        aliases pointed at before, or concrete indices that still carry the
+        alias names, are deleted.
+        """
+        targets = {}
+        for alias, attr, _ in self._managed_indices():
+            targets[alias] = getattr(self, attr)
+            setattr(self, attr, alias)
+        if self.dry_run:
+            logger.info(f"Dry run: would point aliases at {list(targets.values())}")
+            return
+
+        es = self.es.options(request_timeout=ES_REINDEX_TIMEOUT)
+        for idx in targets.values():
+            es.indices.put_settings(
+                index=idx,
+                settings={"index": {"refresh_interval": ES_REFRESH_INTERVAL, "number_of_replicas": ES_NUMBER_OF_REPLICAS}},
+            )
+            es.indices.refresh(index=idx)
+            logger.info("Force-merging %s to %d segment(s)", idx, ES_FORCEMERGE_SEGMENTS)
+            es.indices.forcemerge(index=idx, max_num_segments=ES_FORCEMERGE_SEGMENTS)
+            health = es.cluster.health(index=idx, wait_for_status="green", timeout=f"{ES_REINDEX_TIMEOUT}s")
+            if health.get("timed_out"):
+                logger.warning(f"Index {idx} is not green yet ({health.get('status')}), swapping anyway")
+
+        actions: list[dict] = []
+        replaced: list[str] = []
+        for alias, idx in targets.items():
+            if self.es.indices.exists_alias(name=alias):
+                current = [i for i in self.es.indices.get_alias(name=alias) if i != idx]
+                actions += [{"remove": {"index": i, "alias": alias}} for i in current]
+                replaced += current
+            elif self.es.indices.exists(index=alias):
+                # A concrete index from before aliases were used is dropped in the same swap
+                actions.append({"remove_index": {"index": alias}})
+            actions.append({"add": {"index": idx, "alias": alias}})
+
+        self.es.indices.update_aliases(actions=actions)
+        logger.info(f"Aliases now point at {list(targets.values())}")
+        for idx in replaced:
+            logger.info("Deleting replaced index %s", idx)
+            self.es.indices.delete(index=idx, ignore_unavailable=True)
+
+    def _managed_indices(self) -> list[tuple[str, str, dict]]:
+        """(alias, attribute holding the write index, mapping) of every index the ingestor writes."""
+        indices = [
+            (ES_INDEX_DOCUMENTS, "index_docs", self._documents_mapping()),
+            (ES_INDEX_DOSSIERS, "index_dossiers", self._dossiers_mapping()),
+        ]
+        if self.chunks:
+            indices.append((ES_INDEX_CHUNKS, "index_chunks", self._chunks_mapping()))
+        return indices
+
+    def _index_docs(self, docs: Iterable[dict], index: str, id_field: str | None = None) -> tuple[int, list[dict]]:
+        """
+        Bulk index docs and return (number indexed, failed bulk items).
+
+        Failures are logged and returned instead of raised, so one bad
+        document does not abort the rest of the batch.
+        """
         def generate_actions():
             for d in docs:
                 # Ensure we have a valid document ID
                 nextcloud_id = d.get("nextcloud_id")
                 dossier_id = d.get("dossier_id", "")
                 
-                if nextcloud_id:
+                if id_field:
+                    doc_id = d[id_field]
+                elif nextcloud_id:
                     doc_id = hash(nextcloud_id)
                 elif dossier_id:
                     doc_id = dossier_id
@@ -76,31 +184,47 @@ class ESClient:
                     "_source": d
                 }
 
-        try:
-            actions = list(generate_actions())
-            logger.debug(f"Generated {len(actions)} actions for bulk indexing")
-            helpers.bulk(self.es, actions)
-            logger.info(f"Successfully indexed {len(actions)} documents to {index}")
-        except helpers.BulkIndexError as e:
-            logger.error(f"Bulk indexing failed. {len(e.errors)} document(s) failed to index.")
-            
+        # streaming_bulk sends bounded chunks as the generator is consumed and
+        # retries 429 responses with exponential backoff, so a slow cluster
+        # slows the producer down instead of piling up actions in memory.
+        indexed = 0
+        failed: list[dict] = []
+        for ok, item in helpers.streaming_bulk(
+            self.es,
+            generate_actions(),
+            chunk_size=BULK_CHUNK_SIZE,
+            max_chunk_bytes=BULK_MAX_CHUNK_BYTES,
+            max_retries=BULK_MAX_RETRIES,
+            initial_backoff=2,
+            raise_on_error=False,
+            raise_on_exception=False,
+        ):
+            if ok:
+                indexed += 1
+            else:
+                failed.append(item)
+
+        if failed:
+            logger.error(f"Bulk indexing to {index}: {len(failed)} document(s) failed to index, {indexed} succeeded.")
+
             # Log details about each failed document
-            for i, error in enumerate(e.errors[:5]):  # Show first 5 errors
+            for i, error in enumerate(failed[:5]):  # Show first 5 errors
                 logger.error(f"Error {i+1}: {error}")
-                
+
                 # Try to identify the problematic document
-                if 'index' in error and 'error' in error['index']:
-                    error_info = error['index']['error']
-                    doc_id = error['index'].get('_id', 'unknown')
+                op = error.get('index') or error.get('create') or {}
+                if 'error' in op:
+                    error_info = op['error'] if isinstance(op['error'], dict) else {"reason": str(op['error'])}
+                    doc_id = op.get('_id', 'unknown')
                     logger.error(f"Document ID {doc_id} failed: {error_info.get('type', 'unknown')} - {error_info.get('reason', 'no reason')}")
-            
-            if len(e.errors) > 5:
-                logger.error(f"... and {len(e.errors) - 5} more errors")
-            
-            # Re-raise with more context
-            raise Exception(f"Failed to index {len(e.errors)} document(s) to {index}. See logs above for details.") from e
-    
-    def do_index_documents(self, docs: Iterable[dict]):
+
+            if len(failed) > 5:
+                logger.error(f"... and {len(failed) - 5} more errors")
+        else:
+            logger.info(f"Successfully indexed {indexed} documents to {index}")
+        return indexed, failed
+
+    def do_index_documents(self, docs: Iterable[dict]) -> tuple[int, list[dict]]:
         # Convert to list to allow inspection and counting
         docs_list = list(docs)
         logger.info(f"Preparing to index {len(docs_list)} documents")
@@ -112,10 +236,10 @@ class ESClient:
             logger.debug(f"Sample document nextcloud_id: {sample_doc.get('nextcloud_id', 'NOT_SET')}")
             
         if self.dry_run:
-            logger.info("Dry run: would index %d documents into %s", len(docs_list), ES_INDEX_DOCUMENTS)
-            return
+            logger.info("Dry run: would index %d documents into %s", len(docs_list), self.index_docs)
+            return len(docs_list), []
             
-        self._index_docs(docs_list, ES_INDEX_DOCUMENTS)
+        return self._index_docs(docs_list, self.index_docs)
 
     def _update_docs(self, docs: Iterable[dict], index: str):
         actions = ({
@@ -136,15 +260,15 @@ class ESClient:
             doc['lastmodifiedtime'] = self._normalize_timestamp(doc.get("lastmodifiedtime"))
 
             id = doc.get("nextcloud_id")
-            doc_exists = self.es.exists(index=ES_INDEX_DOCUMENTS, id=id)
+            doc_exists = self.es.exists(index=self.index_docs, id=id)
             if doc_exists:
                 existing_docs.append(doc)
         new_docs = [d for d in docs if d not in existing_docs]
         logger.debug(f"Updating {len(existing_docs)} existing documents, indexing {len(new_docs)} new documents")
 
         if not self.dry_run:
-            self._index_docs(new_docs, ES_INDEX_DOCUMENTS)
-            self._update_docs(existing_docs, ES_INDEX_DOCUMENTS)
+            self._index_docs(new_docs, self.index_docs)
+            self._update_docs(existing_docs, self.index_docs)
 
     def update_dossiers(self, dossiers: Iterable[dict]):
         existing_dossiers = []
@@ -154,15 +278,15 @@ class ESClient:
             dossier['lastmodified_datetime'] = self._normalize_timestamp(dossier.get("lastmodified_datetime"))
 
             id = dossier.get("dossier_id")
-            dossier_exists = self.es.exists(index=ES_INDEX_DOSSIERS, id=id)
+            dossier_exists = self.es.exists(index=self.index_dossiers, id=id)
             if dossier_exists:
                 existing_dossiers.append(dossier)
         new_dossiers = [d for d in dossiers if d not in existing_dossiers]
         logger.debug(f"Updating {len(existing_dossiers)} existing dossiers, indexing {len(new_dossiers)} new dossiers")
 
         if not self.dry_run:
-            self._index_docs(new_dossiers, ES_INDEX_DOSSIERS)
-            self._update_docs(existing_dossiers, ES_INDEX_DOSSIERS)
+            self._index_docs(new_dossiers, self.index_dossiers)
+            self._update_docs(existing_dossiers, self.index_dossiers)
 
     def _normalize_timestamp(self, ts: str) -> str | None:
         """Normalize various timestamp formats to ISO 8601 date string (YYYY-MM-DDTHH:MM:SSZ)."""
@@ -182,7 +306,7 @@ class ESClient:
     def do_index_dossiers(self, dossiers: list[dict]):
         logger.debug(f"Indexing dossiers: {dossiers}")
         actions = ({
-            "_index": ES_INDEX_DOSSIERS,
+            "_index": self.index_dossiers,
             "_source": {
                 **d,
                 "created_datetime": self._normalize_timestamp(d["created_datetime"]),
@@ -190,7 +314,7 @@ class ESClient:
         } for d in dossiers)
         if self.dry_run:
             count = sum(1 for _ in actions)
-            logger.info("Dry run: would index %d dossiers into %s", count, ES_INDEX_DOSSIERS)
+            logger.info("Dry run: would index %d dossiers into %s", count, self.index_dossiers)
             return
             
         try:
@@ -202,136 +326,265 @@ class ESClient:
 
 
     # Incremental update methods
-    def delete_documents_by_path(self, file_paths: set[str]):
-        """Delete documents from ES based on their file paths."""
+    def delete_documents_by_path(self, file_paths: set[str], refresh: bool = True) -> int:
+        """
+        Delete documents from ES based on their file paths.
+
+        Paths are deleted with one terms query per 1000 paths. Pass refresh=False
+        when the caller refreshes once after a batch of changes.
+
+        Returns:
+            int: Number of deleted documents
+        """
         if not file_paths:
-            return
+            return 0
             
         if self.dry_run:
             logger.info("Dry run: would delete %d documents with paths: %s", 
                        len(file_paths), list(file_paths)[:5])
-            return
-            
-        # Create delete queries for each path
-        for file_path in file_paths:
+            return 0
+
+        paths = list(file_paths)
+        deleted = 0
+        for start in range(0, len(paths), 1000):
+            chunk = paths[start:start + 1000]
             try:
-                query = {
-                    "query": {
-                        "term": {
-                            "filepath.keyword": file_path
-                        }
-                    }
-                }
-                
                 result = self.es.delete_by_query(
                     index=self.index_docs,
-                    body=query,
-                    refresh=True
+                    body={"query": {"terms": {"filepath.keyword": chunk}}},
+                    refresh=False,
+                    conflicts="proceed",
                 )
-                
-                deleted_count = result.get("deleted", 0)
-                if deleted_count > 0:
-                    logger.info(f"Deleted {deleted_count} documents for path: {file_path}")
-                else:
-                    logger.debug(f"No documents found to delete for path: {file_path}")
-                    
+                deleted += result.get("deleted", 0)
             except Exception as e:
-                logger.error(f"Failed to delete documents for path {file_path}: {e}")
+                logger.error(f"Failed to delete documents for {len(chunk)} paths: {e}")
+
+        logger.info(f"Deleted {deleted} documents for {len(paths)} paths")
+        if self.chunks:
+            for start in range(0, len(paths), 1000):
+                try:
+                    self.es.delete_by_query(
+                        index=self.index_chunks,
+                        body={"query": {"terms": {"filepath.keyword": paths[start:start + 1000]}}},
+                        refresh=False,
+                        conflicts="proceed",
+                    )
+                except Exception as e:
+                    logger.error(f"Failed to delete chunks for {len(paths)} paths: {e}")
+        if refresh:
+            self.refresh()
+        return deleted
 
-    def update_dossier_stats(self, dossier_id: str, file_count_delta: int = 0, size_delta: int = 0):
-        """Update dossier statistics incrementally."""
+    def refresh(self):
+        """Refresh the documents, dossiers and chunk indices so batched changes become visible."""
         if self.dry_run:
-            logger.info("Dry run: would update dossier %s stats: count_delta=%d, size_delta=%d", 
-                       dossier_id, file_count_delta, size_delta)
             return
-            
         try:
-            # Use update by query to increment counters
-            script = {
-                "source": """
-                    if (params.file_count_delta != 0) {
-                        ctx._source.file_count = Math.max(0, (ctx._source.file_count ?: 0) + params.file_count_delta);
-                    }
-                    if (params.size_delta != 0) {
-                        ctx._source.total_size = Math.max(0, (ctx._source.total_size ?: 0) + params.size_delta);
-                    }
-                """,
-                "params": {
-                    "file_count_delta": file_count_delta,
-                    "size_delta": size_delta
-                }
-            }
-            
-            query = {
-                "script": script,
-                "query": {
-                    "term": {
-                        "dossier_id.keyword": dossier_id
-                    }
-                }
-            }
-            
-            result = self.es.update_by_query(
-                index=ES_INDEX_DOSSIERS,
-                body=query,
-                refresh=True
-            )
-            
-            updated_count = result.get("updated", 0)
-            if updated_count > 0:
-                logger.debug(f"Updated dossier {dossier_id} stats: {updated_count} records")
-            
+            self.es.indices.refresh(index=",".join(getattr(self, attr) for _, attr, _ in self._managed_indices()))
         except Exception as e:
-            logger.error(f"Failed to update dossier stats for {dossier_id}: {e}")
+            logger.error(f"Failed to refresh indices: {e}")
+
+    def apply_dossier_stats(self, deltas: dict[str, tuple[int, int]], refresh: bool = True):
+        """
+        Apply aggregated (file_count_delta, size_delta) pairs per dossier_id.
+
+        All dossiers are updated by a single update_by_query, so a batch of
+        incremental changes costs one request and at most one refresh.
+        """
+        deltas = {d: (count, size) for d, (count, size) in deltas.items() if count or size}
+        if deltas:
+            self._update_dossier_stats(deltas)
+        # Refresh even without stat changes: the batch may have deleted documents unrefreshed
+        if refresh:
+            self.refresh()
 
-    def document_exists(self, file_path: str) -> bool:
-        """Check if a document with the given file path exists in ES."""
+    def _update_dossier_stats(self, deltas: dict[str, tuple[int, int]]):
         if self.dry_run:
-            return False
-            
+            logger.info("Dry run: would update stats of %d dossiers", len(deltas))
+            return
+
+        script = {
+            "source": """
+                def delta = params.deltas[ctx._source.dossier_id];
+                if (delta == null) { ctx.op = 'noop'; return; }
+                ctx._source.file_count = Math.max(0, (ctx._source.file_count ?: 0) + delta[0]);
+                ctx._source.total_size = Math.max(0, (ctx._source.total_size ?: 0) + delta[1]);
+            """,
+            "params": {"deltas": {d: [count, size] for d, (count, size) in deltas.items()}},
+        }
         try:
-            query = {
-                "query": {
-                    "term": {
-                        "filepath.keyword": file_path
-                    }
-                },
-                "size": 0
-            }
-            
-            result = self.es.search(index=self.index_docs, body=query)
-            return result["hits"]["total"]["value"] > 0
-            
+            result = self.es.update_by_query(
+                index=self.index_dossiers,
+                body={"script": script, "query": {"terms": {"dossier_id.keyword": list(deltas)}}},
+                refresh=False,
+                conflicts="proceed",
+            )
+            logger.debug(f"Updated stats of {result.get('updated', 0)} dossier records")
         except Exception as e:
-            logger.error(f"Failed to check document existence for {file_path}: {e}")
-            return False
+            logger.error(f"Failed to update stats for {len(deltas)} dossiers: {e}")
+
+    def get_documents_info(self, file_paths: Iterable[str]) -> dict[str, dict]:
+        """
+        Get basic info for many documents by file path.
 
-    def get_document_info(self, file_path: str) -> dict | None:
-        """Get basic info about a document (dossier_id, file_size) for cleanup purposes."""
+        Resolves existence and the previously indexed size and etag with one
+        terms query per 1000 paths instead of searches per file.
+
+        Returns:
+            dict: filepath -> {"filepath", "nextcloud_id", "dossier_id", "size", "etag"} for documents that exist
+        """
         if self.dry_run:
-            return None
-            
-        try:
-            query = {
-                "query": {
-                    "term": {
-                        "filepath.keyword": file_path
-                    }
-                },
-                "_source": ["dossier_id", "size"],
-                "size": 1
-            }
-            
-            result = self.es.search(index=self.index_docs, body=query)
-            hits = result["hits"]["hits"]
-            
-            if hits:
-                return hits[0]["_source"]
-            return None
-            
-        except Exception as e:
-            logger.error(f"Failed to get document info for {file_path}: {e}")
-            return None
+            return {}
+
+        paths = list(file_paths)
+        info: dict[str, dict] = {}
+        for start in range(0, len(paths), 1000):
+            chunk = paths[start:start + 1000]
+            try:
+                result = self.es.search(
+                    index=self.index_docs,
+                    body={
+                        "query": {"terms": {"filepath.keyword": chunk}},
+                        "_source": ["filepath", "nextcloud_id", "dossier_id", "size", "etag"],
+                        "size": len(chunk),
+                    },
+                )
+            except Exception as e:
+                logger.error(f"Failed to get document info for {len(chunk)} paths: {e}")
+                continue
+            for hit in result["hits"]["hits"]:
+                info[hit["_source"]["filepath"]] = hit["_source"]
+        return info
+
+    def get_fingerprints(self, nextcloud_ids: Iterable[str]) -> dict[str, dict]:
+        """
+        Get the stored etag and ACL of already indexed documents.
+
+        Uses one mget per 1000 ids on the deterministic document id, so a whole
+        dossier is checked without a search per file.
+
+        Returns:
+            dict: nextcloud_id -> {"etag", "content_sha256", "accessible_to_users"} for documents that exist
+        """
+        if self.dry_run:
+            return {}
+
+        ids = [nid for nid in nextcloud_ids if nid]
+        fingerprints: dict[str, dict] = {}
+        for start in range(0, len(ids), 1000):
+            chunk = ids[start:start + 1000]
+            try:
+                result = self.es.mget(
+                    index=self.index_docs,
+                    ids=[hash(nid) for nid in chunk],
+                    source=["nextcloud_id", "etag", "content_sha256", "accessible_to_users"],
+                )
+            except Exception as e:
+                logger.error(f"Failed to get fingerprints for {len(chunk)} documents: {e}")
+                continue
+            for nid, hit in zip(chunk, result["docs"]):
+                if hit.get("found"):
+                    fingerprints[nid] = hit["_source"]
+        return fingerprints
+
+    def get_unchunked_documents(self, nextcloud_ids: Iterable[str]) -> list[dict]:
+        """
+        Get the stored paragraphs of indexed documents that have no chunks yet.
+
+        Lets documents skipped as unchanged get their chunks after the chunk
+        index is enabled, without downloading the files again. Uses one terms
+        aggregation on the chunk index and one mget per 1000 ids.
+
+        Returns:
+            list: stored documents with paragraphs whose nextcloud_id has no chunks
+        """
+        if self.dry_run or not self.chunks:
+            return []
+
+        ids = [nid for nid in nextcloud_ids if nid]
+        docs: list[dict] = []
+        for start in range(0, len(ids), 1000):
+            chunk = ids[start:start + 1000]
+            try:
+                result = self.es.search(
+                    index=self.index_chunks,
+                    body={
+                        "size": 0,
+                        "query": {"terms": {"nextcloud_id": chunk}},
+                        "aggs": {"chunked": {"terms": {"field": "nextcloud_id", "size": len(chunk)}}},
+                    },
+                )
+                chunked = {b["key"] for b in result["aggregations"]["chunked"]["buckets"]}
+                missing = [nid for nid in chunk if nid not in chunked]
+                if not missing:
+                    continue
+                result = self.es.mget(
+                    index=self.index_docs,
+                    ids=[hash(nid) for nid in missing],
+                    source=[
+                        "nextcloud_id", "title", "filepath", "filetype", "dossier_id", "dossier_name",
+                        "accessible_to_users", "lastmodifiedtime", "paragraphs",
+                    ],
+                )
+            except Exception as e:
+                logger.error(f"Failed to look up chunks of {len(chunk)} documents: {e}")
+                continue
+            docs.extend(
+                hit["_source"] for hit in result["docs"]
+                if hit.get("found") and hit["_source"].get("paragraphs")
+            )
+        return docs
+
+    def update_document_fields(self, docs: list[dict]):
+        """Partially update already indexed documents; each dict needs a nextcloud_id."""
+        if not docs:
+            return
+        if self.dry_run:
+            logger.info("Dry run: would update fields of %d documents", len(docs))
+            return
+        self._update_docs(docs, self.index_docs)
+
+        acl = {d["nextcloud_id"]: d["accessible_to_users"] for d in docs if "accessible_to_users" in d}
+        if self.chunks and acl:
+            # Chunks carry a copy of their document's access list
+            try:
+                self.es.update_by_query(
+                    index=self.index_chunks,
+                    body={
+                        "script": {
+                            "source": "ctx._source.accessible_to_users = params.acl[ctx._source.nextcloud_id];",
+                            "params": {"acl": acl},
+                        },
+                        "query": {"terms": {"nextcloud_id": list(acl)}},
+                    },
+                    conflicts="proceed",
+                )
+            except Exception as e:
+                logger.error(f"Failed to update access lists of chunks of {len(acl)} documents: {e}")
+
+    def do_index_chunks(self, nextcloud_ids: list[str], chunks: list[dict]) -> tuple[int, list[dict]]:
+        """
+        Replace the chunks of the given documents.
+
+        Existing chunks of the documents are deleted first, so a document that
+        shrank or lost its text leaves no stale chunks behind.
+
+        Returns:
+            tuple: (number of chunks indexed, failed bulk items)
+        """
+        if self.dry_run:
+            logger.info("Dry run: would index %d chunks of %d documents", len(chunks), len(nextcloud_ids))
+            return len(chunks), []
+
+        for start in range(0, len(nextcloud_ids), 1000):
+            self.es.delete_by_query(
+                index=self.index_chunks,
+                body={"query": {"terms": {"nextcloud_id": nextcloud_ids[start:start + 1000]}}},
+                conflicts="proceed",
+            )
+        if not chunks:
+            return 0, []
+        return self._index_docs(chunks, self.index_chunks, id_field="chunk_id")
 
     def dossier_exists(self, dossier_id: str) -> bool:
         """Check if a dossier with the given dossier_id exists in ES."""
@@ -381,7 +634,7 @@ class ESClient:
             "settings": {
                 "index": {
                     "number_of_shards": 1,
-                    "number_of_replicas": 0,
+                    "number_of_replicas": ES_NUMBER_OF_REPLICAS,
                 }
             },
             "mappings": {
@@ -417,6 +670,8 @@ class ESClient:
                     "last_annotated": {"type": "date"},
                     "lastmodified_user_id": {"type": "text", "fields": {"keyword": {"type": "keyword", "ignore_above": 256}}},
                     "needs_download": {"type": "keyword"},
+                    "etag": {"type": "keyword"},
+                    "content_sha256": {"type": "keyword"},
                     "needs_annotation": {"type": "keyword"},
                     "number_pages": {"type": "integer"},
                     "size": {"type": "long", "fields": {"keyword": {"type": "keyword"}}},
@@ -431,7 +686,7 @@ class ESClient:
             "settings": {
                 "index": {
                     "number_of_shards": 1,
-                    "number_of_replicas": 0,
+                    "number_of_replicas": ES_NUMBER_OF_REPLICAS,
                 }
             },
             "mappings": {
@@ -451,3 +706,31 @@ class ESClient:
                 }
             },
         }
+
+    @staticmethod
+    def _chunks_mapping() -> dict:
+        return {
+            "settings": {
+                "index": {
+                    "number_of_shards": 1,
+                    "number_of_replicas": ES_NUMBER_OF_REPLICAS,
+                }
+            },
+            "mappings": {
+                "properties": {
+                    "chunk_id": {"type": "keyword"},
+                    "document_id": {"type": "keyword"},  # _id of the document in the documents index
+                    "nextcloud_id": {"type": "keyword"},
+                    "chunk_index": {"type": "integer"},
+                    "chunk_text": {"type": "text"},
+                    "title": {"type": "text", "fields": {"keyword": {"type": "keyword", "ignore_above": 256}}},
+                    "filepath": {"type": "text", "fields": {"keyword": {"type": "keyword", "ignore_above": 256}}},
+                    "filetype": {"type": "text", "fields": {"keyword": {"type": "keyword"}}},
+                    "dossier_id": {"type": "keyword"},
+                    "dossier_name": {"type": "text", "fields": {"keyword": {"type": "keyword", "ignore_above": 256}}},
+                    "accessible_to_users": {"type": "text", "fields": {"keyword": {"type": "keyword", "ignore_above": 256}}},
+                    "lastmodifiedtime": {"type": "date"},
+                    "embedding": {"type": "dense_vector", "dims": ES_EMBEDDING_DIMS, "index": True, "similarity": "cosine"},
+                }
+            },
+        }
@@ -1,14 +1,20 @@
+import asyncio
 import dataclasses
+import datetime
+import functools
+import inspect
 import os
+import time
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
+from typing import Any
 from config import Config
 from nextcloud import NextCloudConnector
 from state_manager import StateManager
 import hashlib
 from content import ContentExtractor
 from elastic import ESClient
-from utils import logger, hash, SUPPORTED_EXTENSIONS
-from typing import Iterator
+from ingest_utils import logger, hash, SUPPORTED_EXTENSIONS
 
 
 @dataclasses.dataclass
@@ -18,149 +24,212 @@ class Ingestor:
     es: ESClient | None = None
     extractor: ContentExtractor | None = None
     state_manager: StateManager | None = None
+    # Anything with an async bulk_embed(texts), e.g. the shared LLMClient
+    embedder: Any = None
 
     def __post_init__(self):
         if self.nc is None:
             self.nc = NextCloudConnector()
         if self.es is None:
-            self.es = ESClient(self.config.dry_run)
+            self.es = ESClient(self.config.dry_run, chunks=self.config.chunk_index)
         if self.extractor is None:
-            self.extractor = ContentExtractor()
+            self.extractor = ContentExtractor(self.config.tika_server_url)
         if self.state_manager is None:
             self.state_manager = StateManager(self.config)
+        if self.embedder is None and self.config.chunk_index:
+            # Only needed for the chunk index; requires backend/shared/src on PYTHONPATH
+            from llm.llm_client import LLMClient
+            self.embedder = LLMClient()
+
+        # Per-stage concurrency limits for the document build pipeline
+        self._stage_limits = {
+            "list": asyncio.Semaphore(self.config.list_concurrency),
+            "fetch": asyncio.Semaphore(self.config.fetch_concurrency),
+            "extract": asyncio.Semaphore(self.config.extract_concurrency),
+            "enrich": asyncio.Semaphore(self.config.enrich_concurrency),
+            "index": asyncio.Semaphore(self.config.index_concurrency),
+            "embed": asyncio.Semaphore(self.config.embed_concurrency),
+        }
+        self._reset_index_buffer()
+        self._reset_progress()
+        self._dossier_deltas: dict[str, tuple[int, int]] = {}
+        self._last_modifiers: dict[str, str] = {}
+        # Loads of the last modifying users stored with sharded runs, per run ID
+        # Full ingest run whose progress and dead letters are recorded
+        self._run_id: int | None = None
+        # Single-flight guard and wakeup signal of the incremental daemon
+        self._incremental_lock = asyncio.Lock()
+        self._wakeup = asyncio.Event()
+        # Bounds how many files hold downloaded content at the same time
+        self._in_flight = asyncio.Semaphore(
+            self.config.fetch_concurrency + self.config.extract_concurrency
+        )
+        # Thread pool for blocking calls, created on first use and shut down by aclose()
+        self._executor: ThreadPoolExecutor | None = None
 
     # ------------- Public API -------------
-    async def run_full_ingest(self, dry_run: bool = False) -> None:
+    async def run_full_ingest(
+        self, dry_run: bool = False, resume: bool = False, reindex: bool = False, force: bool = False
+    ) -> None:
+        """
+        Ingest all dossiers of all users, checkpointing each finished dossier.
+
+        Every run records its dossiers as work items in the state database and
+        marks each one done once its documents are indexed. With resume=True
+        the most recent unfinished run is continued instead of starting over.
+        Files that fail are recorded as dead letters and do not abort the run.
+
+        With reindex=True the run builds fresh versioned indices and swaps the
+        search aliases to them once it completes; documents of files that no
+        longer exist are dropped with the old indices. A run that completes
+        with failed dossiers or dead letters is only swapped with force=True,
+        since their documents would disappear from search. Activities after
+        the run started are replayed into the new indices after the swap.
+        """
         logger.info("Starting full ingest")
-        logger.info(f"{dry_run=}")
-        assert self.nc and self.es and self.extractor
+        logger.info(f"{dry_run=} {resume=} {reindex=} {force=}")
+        assert self.nc and self.es and self.extractor and self.state_manager
 
         if dry_run:
             logger.info("Dry run mode enabled")
             self.es.dry_run = True
 
+        try:
+            await self._full_ingest(dry_run, resume, reindex, force)
+        finally:
+            await self.aclose()
+
+        logger.info("Ingest complete")
+
+    async def _full_ingest(self, dry_run: bool, resume: bool, reindex: bool, force: bool) -> None:
         logger.info("Creating indices if they do not exist")
-        self.es.create_indices()
-
-        logger.info("Listing users")
-        users = await self.nc.list_users()
-        logger.info(f"Found {len(users)} users")
-
-        dossiers_to_index: list[dict] = []
-        docs_to_index: list[dict] = []
-
-        for user in users:
-            logger.debug("Processing user %s", user)
-            user_root = Path("/") / user
-            parent = user_root / self.config.dossier_parent_path
-            parent_str = str(parent)
-            logger.debug(f"User {user}: checking parent path: {parent_str}")
-            if not self.nc.is_dir(parent_str):
-                logger.warning(
-                    "User %s: parent path not found: %s",
-                    user,
-                    parent_str,
-                )
-                continue
-            else:
-                logger.debug(f"User {user}: found parent path: {parent_str}")
-            dossier_names = [
-                d for d in self.nc.listdir(parent_str)
-                if self.nc.is_dir(str(parent / d))
+        await self._in_stage("index", self.es.create_indices)
+        await self._in_state_db(self.state_manager.initialize_schema)
+        self._reset_index_buffer()
+        self._reset_progress()
+
+        run = None
+        skip_unchanged = self.config.skip_unchanged
+        # Run whose stored last modifiers are looked up per dossier, when
+        # they were not scanned by this process
+        modifiers_run_id = None
+        if resume:
+            run = await self._in_state_db(self.state_manager.get_resumable_run)
+            if run is None:
+                logger.info("No unfinished full ingest to resume, starting a new one")
+
+        if run is None:
+            # Activities from here on may be missing from the rebuilt documents
+            start_activity_id = await self.nc.get_latest_activity_id()
+
+            logger.info("Listing users")
+            users = await self.nc.list_users()
+            logger.info(f"Found {len(users)} users")
+
+            # Last modifying users come from one pass over the activity stream
+            # instead of an activity lookup per file
+            listings, self._last_modifiers = await asyncio.gather(
+                asyncio.gather(*(self._list_dossiers(user) for user in users)),
+                self._scan_last_modifiers(rebuild=reindex or not skip_unchanged),
+            )
+            items = [
+                (user, str(parent), dossier_name)
+                for user, parent, dossier_names in listings
+                for dossier_name in dossier_names
             ]
-            logger.debug(f"User {user}: found {len(dossier_names)} dossiers: {dossier_names}")
+            index_suffix = await self._in_stage("index", self.es.begin_reindex) if reindex else None
+            run_id = await self._in_state_db(
+                self.state_manager.create_ingest_run, items, "full", index_suffix, self._last_modifiers,
+                start_activity_id,
+            )
+        else:
+            run_id, index_suffix, start_activity_id = run["id"], run["index_suffix"], run["activity_id"]
+            logger.info(f"Resuming full ingest run {run_id}")
+            if run["status"] == "completed_with_errors":
+                requeued = await self._in_state_db(self.state_manager.reopen_ingest_run, run_id)
+                logger.info(f"Retrying {requeued} dossiers with failures of ingest run {run_id}")
+            if index_suffix:
+                await self._in_stage("index", self.es.begin_reindex, index_suffix)
+            self._last_modifiers = {}
+            modifiers_run_id = run_id
+            # Files indexed before the interruption have stored etags and are skipped
+            skip_unchanged = True
 
-            for dossier_name in dossier_names:
-                dossier_path = parent / dossier_name
-                dossier_path_str = str(dossier_path)
-                dossier_id = self._dossier_id(user, dossier_name)
-                # Dossier metadata
-                file_count, total_size, first_created = self._collect_tree_stats(
-                    dossier_path_str
+        self._run_id = run_id
+        work_items = await self._in_state_db(self.state_manager.get_open_work_items, run_id)
+        logger.info(f"Ingest run {run_id}: {len(work_items)} dossiers to ingest")
+        self._track("dossiers_total", len(work_items))
+
+        # Dossiers of all users run concurrently; the stage limits keep the
+        # number of in-flight WebDAV, Tika and OCS requests bounded.
+        async with asyncio.TaskGroup() as tg:
+            for item in work_items:
+                tg.create_task(self._checkpoint_dossier(item, skip_unchanged, modifiers_run_id))
+
+        finished = await self._in_state_db(self.state_manager.finish_ingest_runs)
+        swapped = False
+        if run_id in finished:
+            logger.info(f"Ingest run {run_id} {finished[run_id]}")
+            if finished[run_id] == "completed_with_errors":
+                logger.warning(f"Ingest run {run_id} has failed dossiers or dead letters, rerun with --resume to retry")
+            if index_suffix and (finished[run_id] == "completed" or force):
+                await self._in_stage("index", self.es.finish_reindex)
+                swapped = True
+            elif index_suffix:
+                logger.warning(
+                    f"Not swapping the aliases to the indices of ingest run {run_id}: documents of its failed "
+                    "dossiers and dead letters would be dropped from search. Resume it to retry them, "
+                    "or pass force to swap anyway"
                 )
-                sharees = await self.nc.get_sharees(dossier_path)
-                sharees.add(user)  # owner always has access
-                
-                file_id = await self._get_file_id(dossier_path_str, dossier_name)
-                dossier_doc = {
-                    "dossier_id": dossier_id,
-                    "dossier_name": dossier_name,
-                    "webURL": dossier_path_str,
-                    "file_id": file_id,
-                    "owner_userid": user,
-                    "members": list(sharees),
-                    "created_datetime": first_created,
-                    "lastmodified_datetime": None,  # TODO: most recent file mod?
-                    "type": "dossier",
-                    "unopened": True,  # TODO:
-                    "description": "",  # TODO:
-                }
-                
-                logger.info(f"Creating dossier document for {dossier_name}: file_id={file_id}, webURL={dossier_path_str}")
-                dossiers_to_index.append(dossier_doc)
-
-                # Walk files
-                for file_path in self._iter_files(dossier_path_str):
-                    try:
-                        doc = await self._build_document(
-                            user=user,
-                            dossier=dossier_doc,
-                            path=file_path,
-                        )
-                        logger.debug(f"Built document: {doc}")
-                        docs_to_index.append(doc)
-                    except Exception as e:
-                        logger.exception(
-                            "Failed to process file %s: %s",
-                            file_path,
-                            e,
-                        )
-                        raise e
-
-        logger.info(f"Final summary: Found {len(dossiers_to_index)} dossiers to index")
-        logger.debug(f"Dossiers to index: {dossiers_to_index}")
-        if dossiers_to_index:
-            logger.info("Starting indexing of %d dossiers", len(dossiers_to_index))
-            try:
-                self.es.do_index_dossiers(dossiers_to_index)
-                logger.info("Successfully indexed %d dossiers", len(dossiers_to_index))
-            except Exception as e:
-                logger.error(f"Failed to index dossiers: {e}")
-                raise
         else:
-            logger.warning("No dossiers found to index!")
-        logger.debug(f"Documents to index: {docs_to_index}")
-        if docs_to_index:
-            logger.info("Indexing %d documents", len(docs_to_index))
-            self.es.do_index_documents(docs_to_index)
-            logger.info("Indexed %d documents", len(docs_to_index))
+            progress = await self._in_state_db(self.state_manager.get_run_progress, run_id)
+            logger.warning(f"Ingest run {run_id} is unfinished ({progress}), rerun with --resume to retry")
+        logger.info(
+            "Indexed %d documents, %d failed, %d unchanged and skipped",
+            self._index_stats["indexed"],
+            self._index_stats["failed"],
+            self._index_stats["skipped"],
+        )
+        logger.info(f"Extraction metrics per file type: {self.extractor.metrics()}")
 
-        # Update activity state to latest activity ID after full ingestion
-        # This ensures incremental ingestion starts from the right point
+        # Incremental ingest continues from the activities of before the run started
         try:
             logger.info("Updating activity state after full ingestion")
-            self.state_manager.initialize_schema()
-            
-            # Get the latest activity ID from NextCloud efficiently
-            latest_activity_id = await self.nc.get_latest_activity_id()
-            
-            if latest_activity_id > 0:
-                self.state_manager.update_activity_state(latest_activity_id)
-                logger.info(f"Updated activity state to latest ID: {latest_activity_id}")
-            else:
-                logger.info("No activities found, keeping activity state at 0")
-                
+            await self._checkpoint_activity(start_activity_id or 0, replay=swapped, dry_run=dry_run)
         except Exception as e:
             logger.error(f"Failed to update activity state after full ingestion: {e}")
             # Don't fail the entire ingestion for this
-        finally:
-            if self.state_manager:
-                self.state_manager.close()
 
-        logger.info("Ingest complete")
+    async def _checkpoint_activity(self, start_activity_id: int, replay: bool, dry_run: bool):
+        """
+        Move the activity cursor to the snapshot taken before a full ingest started.
 
-    async def run_incremental_ingest(self, dry_run: bool = False, fallback_to_full: bool = True) -> None:
-        """Run incremental ingest based on NextCloud activity API."""
+        The cursor only moves forward, unless replay is set: after an alias
+        swap, incremental passes that ran during the rebuild wrote to the
+        replaced indices, so the activities after the snapshot are replayed
+        into the new ones right away.
+        """
+        current_activity_id, _ = await self._in_state_db(self.state_manager.get_last_activity_state)
+        if replay and start_activity_id > 0:
+            await self._in_state_db(self.state_manager.update_activity_state, start_activity_id)
+            logger.info(f"Replaying activities after ID {start_activity_id} into the new indices")
+            await self.run_incremental_ingest(dry_run=dry_run, fallback_to_full=False, close_connections=False)
+        elif start_activity_id > current_activity_id:
+            await self._in_state_db(self.state_manager.update_activity_state, start_activity_id)
+            logger.info(f"Updated activity state to ID {start_activity_id}")
+        else:
+            logger.info(f"Keeping activity state at ID {current_activity_id}")
+
+    async def run_incremental_ingest(
+        self, dry_run: bool = False, fallback_to_full: bool = True, close_connections: bool = True
+    ) -> int | None:
+        """
+        Run incremental ingest based on NextCloud activity API.
+
+        Returns the number of file activities processed. Pass
+        close_connections=False to keep the database and HTTP connections of
+        a long-lived ingestor open.
+        """
         logger.info("Starting incremental ingest")
         assert self.nc and self.es and self.extractor and self.state_manager
 
@@ -170,16 +239,16 @@ class Ingestor:
 
         try:
             # Initialize state tracking
-            self.state_manager.initialize_schema()
+            await self._in_state_db(self.state_manager.initialize_schema)
             
             # Get last processed activity ID
-            last_activity_id, last_check_time = self.state_manager.get_last_activity_state()
+            last_activity_id, last_check_time = await self._in_state_db(self.state_manager.get_last_activity_state)
             logger.info(f"Last processed activity ID: {last_activity_id}, last check: {last_check_time}")
             
-            # Get activities since last check
+            # Page through activities since last check, checkpointing after each batch
+            pages = self.nc.iter_activity_pages(last_activity_id, page_size=self.config.activity_page_size)
             try:
-                activity_data = await self.nc.get_activities_since(last_activity_id)
-                activities = activity_data.get("ocs", {}).get("data", [])
+                page = await anext(pages, None)
             except Exception as e:
                 logger.error(f"Failed to get activities: {e}")
                 if fallback_to_full:
@@ -188,67 +257,27 @@ class Ingestor:
                 else:
                     raise
 
-            if not activities:
+            if page is None:
                 logger.info("No new activities to process")
-                return
-
-            # Filter out activities with IDs <= last_activity_id to ensure we only process newer ones
-            newer_activities = []
-            filtered_count = 0
-            for activity in activities:
-                activity_id = activity.get("activity_id", 0)
-                if activity_id > last_activity_id:
-                    newer_activities.append(activity)
-                else:
-                    filtered_count += 1
-                    logger.debug(f"Filtered out activity ID {activity_id} (<= {last_activity_id})")
-            
-            if filtered_count > 0:
-                logger.info(f"Filtered out {filtered_count} activities with IDs <= {last_activity_id}")
-            
-            if not newer_activities:
-                logger.info("No newer activities to process after filtering")
-                # Still update the activity ID to the latest one we saw
-                if activities:
-                    latest_activity_id = max(a.get("activity_id", 0) for a in activities)
-                    self.state_manager.update_activity_state(latest_activity_id)
-                return
-
-            # Process new dossiers first (from all activities, not just file activities)
-            await self._process_new_dossiers(newer_activities)
-
-            # Filter to file-related activities
-            file_activities = await self.nc.filter_file_activities(newer_activities)
-            if not file_activities:
-                logger.info("No file-related activities to process")
-                # Still update the activity ID to the latest one we saw
-                if newer_activities:
-                    latest_activity_id = max(a.get("activity_id", 0) for a in newer_activities)
-                    self.state_manager.update_activity_state(latest_activity_id)
-                return
-
-            # Extract file paths by action type
-            file_paths = await self.nc.extract_file_paths_from_activities(file_activities)
-            created_files = file_paths["created"]
-            updated_files = file_paths["updated"] 
-            deleted_files = file_paths["deleted"]
-
-            # Process deletions first
-            if deleted_files:
-                logger.info(f"Processing {len(deleted_files)} deleted files")
-                await self._process_deleted_files(deleted_files)
-
-            # Process created and updated files
-            files_to_process = created_files | updated_files
-            if files_to_process:
-                logger.info(f"Processing {len(files_to_process)} created/updated files")
-                await self._process_changed_files(files_to_process)
-
-            # Update the last processed activity ID (using all newer activities, not just file activities)
-            latest_activity_id = max(a.get("activity_id", 0) for a in newer_activities)
-            self.state_manager.update_activity_state(latest_activity_id)
-            
-            logger.info(f"Incremental ingest complete. Processed {len(file_activities)} activities (latest ID: {latest_activity_id})")
+                return 0
+
+            processed = 0
+            batches = 0
+            while page is not None:
+                activities, cursor = page
+                processed += await self._process_activity_batch(activities, last_activity_id)
+                batches += 1
+
+                # The batch is committed: resume after it if a later batch fails
+                last_activity_id = max(last_activity_id, cursor)
+                await self._in_state_db(self.state_manager.update_activity_state, last_activity_id)
+                page = await anext(pages, None)
+
+            logger.info(
+                f"Incremental ingest complete. Processed {processed} activities "
+                f"in {batches} batches (latest ID: {last_activity_id})"
+            )
+            return processed
 
         except Exception as e:
             logger.error(f"Incremental ingest failed: {e}")
@@ -258,10 +287,692 @@ class Ingestor:
             else:
                 raise
         finally:
+            if close_connections:
+                await self.aclose()
+
+    async def run_incremental_once(self, dry_run: bool = False) -> int | None:
+        """
+        Run one incremental pass on this ingestor's warm connections and caches.
+
+        Single-flight: if a pass is already running the call returns None
+        right away instead of starting an overlapping one.
+        """
+        if self._incremental_lock.locked():
+            logger.info("Incremental ingest already running, skipping trigger")
+            return None
+        async with self._incremental_lock:
+            return await self.run_incremental_ingest(
+                dry_run=dry_run, fallback_to_full=False, close_connections=False
+            ) or 0
+
+    async def run_daemon(self, dry_run: bool = False) -> None:
+        """
+        Poll the Activity API until cancelled, keeping connections and caches warm.
+
+        The poll interval drops to config.daemon_min_interval_seconds whenever
+        a pass finds activity and grows by config.daemon_backoff_factor up to
+        config.daemon_max_interval_seconds while idle or failing. wake()
+        starts the next pass immediately; wakes during a pass are coalesced
+        into one follow-up pass.
+        """
+        logger.info("Starting incremental ingest daemon")
+        loop = asyncio.get_running_loop()
+        interval = self.config.daemon_min_interval_seconds
+        caches_reset_at = loop.time()
+        try:
+            while True:
+                if loop.time() - caches_reset_at >= self.config.daemon_cache_ttl_seconds:
+                    # Shares and group memberships change without file activity
+                    self.nc.reset_caches()
+                    self._last_modifiers = {}
+                    caches_reset_at = loop.time()
+
+                self._wakeup.clear()
+                try:
+                    processed = await self.run_incremental_once(dry_run=dry_run)
+                except Exception as e:
+                    logger.error(f"Incremental pass failed: {e}")
+                    processed = None
+                interval = self._next_poll_interval(interval, processed)
+                logger.debug(f"Next incremental pass in {interval:.1f}s")
+
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), timeout=interval)
+                except TimeoutError:
+                    pass
+        finally:
+            await self.aclose()
+            logger.info("Incremental ingest daemon stopped")
+
+    async def aclose(self):
+        """
+        Release the thread pool, HTTP connections, extractor and database engine.
+
+        Every run calls this when it ends, also on errors and cancellation.
+        The ingestor stays usable; the next run reopens what it needs.
+        """
+        try:
+            await self.nc.aclose()
+        finally:
+            if self.extractor:
+                self.extractor.close()
             if self.state_manager:
                 self.state_manager.close()
+            if self._executor is not None:
+                self._executor.shutdown(wait=False, cancel_futures=True)
+                self._executor = None
+
+    def wake(self):
+        """Ask a running daemon for an incremental pass now, e.g. after an upload webhook."""
+        self._wakeup.set()
+
+    def _next_poll_interval(self, interval: float, processed: int | None) -> float:
+        if processed:
+            return self.config.daemon_min_interval_seconds
+        return min(interval * self.config.daemon_backoff_factor, self.config.daemon_max_interval_seconds)
 
 
+    async def run_coordinator(self, dry_run: bool = False) -> int:
+        """
+        Enqueue one work item per dossier for a sharded full ingest.
+
+        The coordinator only lists dossiers; workers started with run_worker
+        claim and ingest them. Returns the ingest run ID.
+        """
+        logger.info("Starting sharded full ingest coordinator")
+        assert self.nc and self.es and self.state_manager
+
+        if dry_run:
+            logger.info("Dry run mode enabled")
+            self.es.dry_run = True
+
+        try:
+            await self._in_state_db(self.state_manager.initialize_schema)
+            await self._in_stage("index", self.es.create_indices)
+
+            # Activities from here on are picked up by incremental ingest,
+            # so the snapshot is taken before any dossier is read
+            latest_activity_id = await self.nc.get_latest_activity_id()
+
+            users = await self.nc.list_users()
+            # Scanned once here and shared with the workers through the run record
+            listings, last_modifiers = await asyncio.gather(
+                asyncio.gather(*(self._list_dossiers(user) for user in users)),
+                self._scan_last_modifiers(rebuild=not self.config.skip_unchanged),
+            )
+            items = [
+                (user, str(parent), dossier_name)
+                for user, parent, dossier_names in listings
+                for dossier_name in dossier_names
+            ]
+            run_id = await self._in_state_db(
+                self.state_manager.create_ingest_run, items, "sharded", None, last_modifiers
+            )
+
+            if latest_activity_id > 0:
+                await self._in_state_db(self.state_manager.update_activity_state, latest_activity_id)
+            logger.info(f"Ingest run {run_id}: enqueued {len(items)} dossiers of {len(users)} users")
+            return run_id
+        finally:
+            await self.aclose()
+
+    async def run_worker(self, worker_id: str, dry_run: bool = False) -> None:
+        """
+        Ingest dossier work items of sharded full ingests until none are left.
+
+        Any number of worker processes or pods can run this against the same
+        state database; each processes config.worker_concurrency dossiers at
+        a time, heartbeats its claims and releases failed items for retry.
+        """
+        logger.info(f"Starting ingest worker {worker_id}")
+        assert self.nc and self.es and self.extractor and self.state_manager
+
+        if dry_run:
+            logger.info("Dry run mode enabled")
+            self.es.dry_run = True
+
+        try:
+            await self._in_state_db(self.state_manager.initialize_schema)
+            self._reset_index_buffer()
+            self._reset_progress()
+            self._last_modifiers = {}
+
+            async with asyncio.TaskGroup() as tg:
+                for _ in range(self.config.worker_concurrency):
+                    tg.create_task(self._work_loop(worker_id))
+
+            finished = await self._in_state_db(self.state_manager.finish_ingest_runs)
+            for run_id, status in finished.items():
+                logger.info(f"Ingest run {run_id} {status}")
+            logger.info(
+                "Worker %s: indexed %d documents, %d failed, %d unchanged and skipped",
+                worker_id,
+                self._index_stats["indexed"],
+                self._index_stats["failed"],
+                self._index_stats["skipped"],
+            )
+        finally:
+            await self.aclose()
+
+    async def _work_loop(self, worker_id: str):
+        stale_after = datetime.timedelta(seconds=self.config.work_item_stale_seconds)
+        while True:
+            item = await self._in_state_db(
+                self.state_manager.claim_work_item, worker_id, stale_after, self.config.work_item_max_attempts
+            )
+            if item is None:
+                progress = await self._in_state_db(self.state_manager.get_run_progress)
+                if not progress["pending"] and not progress["claimed"]:
+                    return
+                # Items claimed elsewhere may still be released for retry
+                await asyncio.sleep(self.config.worker_poll_seconds)
+                continue
+            await self._process_work_item(worker_id, item)
+
+    async def _process_work_item(self, worker_id: str, item: dict):
+        logger.info(
+            f"Worker {worker_id}: ingesting dossier {item['dossier_name']} of {item['user']} "
+            f"(run {item['run_id']}, attempt {item['attempts']})"
+        )
+        heartbeat = asyncio.create_task(self._heartbeat(worker_id, item["id"]))
+        try:
+            dossier_doc = await self._ingest_dossier(
+                item["user"], Path(item["parent_path"]), item["dossier_name"],
+                skip_unchanged=self.config.skip_unchanged, modifiers_run_id=item["run_id"],
+            )
+            # The item only counts as done once its documents are indexed
+            await self._drain_index_buffer()
+            await self._in_stage("index", self.es.index_new_dossier, dossier_doc)
+        except Exception as e:
+            logger.error(f"Worker {worker_id}: dossier {item['dossier_name']} failed: {e}")
+            await self._in_state_db(
+                self.state_manager.fail_work_item, item["id"], str(e), self.config.work_item_max_attempts
+            )
+        else:
+            await self._in_state_db(self.state_manager.complete_work_item, item["id"])
+            self._track("dossiers_done")
+        finally:
+            heartbeat.cancel()
+
+    async def _checkpoint_dossier(self, item: dict, skip_unchanged: bool, modifiers_run_id: int | None = None):
+        """Ingest one dossier of a full ingest run and record it as done or failed."""
+        try:
+            dossier_doc = await self._ingest_dossier(
+                item["user"], Path(item["parent_path"]), item["dossier_name"],
+                skip_unchanged=skip_unchanged, modifiers_run_id=modifiers_run_id,
+            )
+            await self._drain_index_buffer()
+            await self._in_stage("index", self.es.index_new_dossier, dossier_doc)
+        except Exception as e:
+            logger.error(f"Dossier {item['dossier_name']} of {item['user']} failed: {e}")
+            await self._in_state_db(
+                self.state_manager.fail_work_item, item["id"], str(e), self.config.work_item_max_attempts
+            )
+        else:
+            await self._in_state_db(self.state_manager.complete_work_item, item["id"])
+            self._track("dossiers_done")
+
+    async def _heartbeat(self, worker_id: str, item_id: int):
+        while True:
+            await asyncio.sleep(self.config.work_item_heartbeat_seconds)
+            try:
+                if not await self._in_state_db(self.state_manager.heartbeat_work_item, item_id, worker_id):
+                    logger.warning(f"Worker {worker_id}: lost claim on work item {item_id}")
+                    return
+            except Exception as e:
+                logger.warning(f"Worker {worker_id}: heartbeat for work item {item_id} failed: {e}")
+
+    async def _in_state_db(self, func, *args):
+        """Run a blocking StateManager call in the thread pool."""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._pool(), functools.partial(func, *args))
+
+    async def _process_activity_batch(self, activities: list[dict], last_activity_id: int) -> int:
+        """Apply one page of activities and return the number of file activities processed."""
+        # Filter out activities with IDs <= last_activity_id to ensure we only process newer ones
+        newer_activities = []
+        filtered_count = 0
+        for activity in activities:
+            activity_id = activity.get("activity_id", 0)
+            if activity_id > last_activity_id:
+                newer_activities.append(activity)
+            else:
+                filtered_count += 1
+                logger.debug(f"Filtered out activity ID {activity_id} (<= {last_activity_id})")
+
+        if filtered_count > 0:
+            logger.info(f"Filtered out {filtered_count} activities with IDs <= {last_activity_id}")
+
+        if not newer_activities:
+            logger.info("No newer activities to process after filtering")
+            return 0
+
+        # Process new dossiers first (from all activities, not just file activities)
+        await self._process_new_dossiers(newer_activities)
+
+        # Changed files take their last modifying user from this batch
+        self.nc.collect_last_modifiers(newer_activities, self._last_modifiers)
+
+        # Filter to file-related activities
+        file_activities = await self.nc.filter_file_activities(newer_activities)
+        if not file_activities:
+            logger.info("No file-related activities to process")
+            return 0
+
+        # Extract file paths by action type
+        file_paths = await self.nc.extract_file_paths_from_activities(file_activities)
+        created_files = file_paths["created"]
+        updated_files = file_paths["updated"]
+        deleted_files = file_paths["deleted"]
+
+        # Process deletions first
+        if deleted_files:
+            logger.info(f"Processing {len(deleted_files)} deleted files")
+            await self._process_deleted_files(deleted_files)
+
+        # Process created and updated files
+        files_to_process = created_files | updated_files
+        if files_to_process:
+            logger.info(f"Processing {len(files_to_process)} created/updated files")
+            await self._process_changed_files(files_to_process)
+
+        # Apply stats once per dossier and make the batch visible before it is checkpointed
+        deltas, self._dossier_deltas = self._dossier_deltas, {}
+        await self._in_stage("index", self.es.apply_dossier_stats, deltas)
+
+        return len(file_activities)
+
+    def _add_dossier_delta(self, dossier_id: str, file_count_delta: int, size_delta: int):
+        count, size = self._dossier_deltas.get(dossier_id, (0, 0))
+        self._dossier_deltas[dossier_id] = (count + file_count_delta, size + size_delta)
+
+    async def _scan_last_modifiers(self, rebuild: bool) -> dict[str, str]:
+        """
+        Map file IDs to their last modifying user with one pass over the activity stream.
+
+        Unless the run rebuilds every document, only activities after the
+        stored activity cursor are scanned: files changed before it were
+        indexed since, so they are skipped by etag and keep their stored user.
+        """
+        try:
+            since = 0
+            if not rebuild:
+                since, _ = await self._in_state_db(self.state_manager.get_last_activity_state)
+            return await self.nc.get_last_modifiers(since, page_size=self.config.activity_page_size)
+        except Exception as e:
+            logger.warning(f"Failed to scan activities for last modifying users, using file owners: {e}")
+            return {}
+
+    async def _load_run_modifiers(self, run_id: int, file_ids: list[str]):
+        """Add the last modifying users stored with a run for the given files to the map."""
+        try:
+            self._last_modifiers.update(
+                await self._in_state_db(self.state_manager.get_run_last_modifiers, run_id, file_ids)
+            )
+        except Exception as e:
+            logger.warning(f"Failed to load last modifying users of ingest run {run_id}, using file owners: {e}")
+
+    async def _list_dossiers(self, user: str) -> tuple[str, Path, list[str]]:
+        """Return (user, dossier parent path, dossier folder names) for a user."""
+        logger.debug("Processing user %s", user)
+        user_root = Path("/") / user
+        parent = user_root / self.config.dossier_parent_path
+        parent_str = str(parent)
+        logger.debug(f"User {user}: checking parent path: {parent_str}")
+        try:
+            parent_nodes = await self._in_stage("list", self.nc.walk_tree, parent_str, "1")
+        except Exception as e:
+            logger.warning(
+                "User %s: parent path not found: %s (%s)",
+                user,
+                parent_str,
+                e,
+            )
+            return user, parent, []
+        if not parent_nodes or not parent_nodes[0]["is_dir"]:
+            logger.warning(
+                "User %s: parent path not found: %s",
+                user,
+                parent_str,
+            )
+            return user, parent, []
+        logger.debug(f"User {user}: found parent path: {parent_str}")
+        dossier_names = [
+            Path(n["path"]).name for n in parent_nodes[1:] if n["is_dir"]
+        ]
+        logger.debug(f"User {user}: found {len(dossier_names)} dossiers: {dossier_names}")
+        return user, parent, dossier_names
+
+    async def _ingest_dossier(
+        self, user: str, parent: Path, dossier_name: str, skip_unchanged: bool = False,
+        modifiers_run_id: int | None = None,
+    ) -> dict:
+        """
+        Build the dossier document and queue the documents of all files in it for indexing.
+
+        With skip_unchanged, files whose etag matches the indexed document are
+        not downloaded again; only their access list is checked. With
+        modifiers_run_id, the last modifying users of the dossier's files are
+        read from that run's stored scan. With the
+        chunk index enabled, skipped documents without chunks are chunked
+        from their stored paragraphs.
+        """
+        dossier_path = parent / dossier_name
+        dossier_path_str = str(dossier_path)
+        dossier_id = self._dossier_id(user, dossier_name)
+        # Dossier metadata, all from one PROPFIND over the dossier tree
+        tree = await self._in_stage("list", self.nc.walk_tree, dossier_path_str)
+        files = [n for n in tree if not n["is_dir"]]
+        self._track("discovered", len(files))
+        if modifiers_run_id is not None:
+            await self._load_run_modifiers(modifiers_run_id, [n["fileid"] for n in files])
+        file_count, total_size, first_created = self._collect_tree_stats(files)
+        sharees = await self._in_stage("enrich", self.nc.get_sharees, dossier_path)
+        sharees.add(user)  # owner always has access
+
+        file_id = tree[0]["fileid"] if tree else None
+        if not file_id:
+            file_id = await self._get_file_id(dossier_path_str, dossier_name)
+        dossier_doc = {
+            "dossier_id": dossier_id,
+            "dossier_name": dossier_name,
+            "webURL": dossier_path_str,
+            "file_id": file_id,
+            "owner_userid": user,
+            "members": list(sharees),
+            "created_datetime": first_created,
+            "lastmodified_datetime": None,  # TODO: most recent file mod?
+            "type": "dossier",
+            "unopened": True,  # TODO:
+            "description": "",  # TODO:
+        }
+
+        logger.info(f"Creating dossier document for {dossier_name}: file_id={file_id}, webURL={dossier_path_str}")
+
+        # Stored etags of the files already in the index, in one lookup
+        fingerprints: dict[str, dict] = {}
+        if skip_unchanged:
+            fingerprints = await self._in_stage(
+                "list", self.es.get_fingerprints, [n["fileid"] for n in files]
+            )
+        acl_updates: list[dict] = []
+        unchanged: list[str] = []
+
+        async def build(node: dict) -> None:
+            file_path = node["path"]
+            try:
+                fingerprint = fingerprints.get(node["fileid"])
+                if fingerprint and node["etag"] and fingerprint.get("etag") == node["etag"]:
+                    # Content unchanged: skip download, extraction and reindexing.
+                    # Shares are not part of the etag, so the ACL is still checked.
+                    sharees = await self._in_stage("enrich", self.nc.get_sharees, file_path)
+                    sharees.add(user)
+                    if sharees != set(fingerprint.get("accessible_to_users") or []):
+                        acl_updates.append({
+                            "nextcloud_id": node["fileid"],
+                            "accessible_to_users": list(sharees),
+                        })
+                    unchanged.append(node["fileid"])
+                    self._index_stats["skipped"] += 1
+                    self._track("skipped")
+                    logger.debug(f"Unchanged (etag {node['etag']}), skipping: {file_path}")
+                    return
+
+                # The slot is held until the document is queued, so a stalled
+                # index stage also stalls fetching new files.
+                async with self._in_flight:
+                    doc = await self._build_document(
+                        user=user,
+                        dossier=dossier_doc,
+                        path=file_path,
+                        stat=node,
+                    )
+                    logger.debug(f"Built document: {doc['filepath']} ({doc['size']} bytes)")
+                    await self._queue_for_index(doc)
+            except Exception as e:
+                logger.exception(
+                    "Failed to process file %s: %s",
+                    file_path,
+                    e,
+                )
+                # Recorded for a later retry instead of aborting the dossier
+                self._index_stats["failed"] += 1
+                self._track("failed")
+                await self._in_state_db(self.state_manager.add_dead_letters, self._run_id, [{
+                    "user": user,
+                    "path": file_path,
+                    "nextcloud_id": node["fileid"],
+                    "error": repr(e),
+                }])
+
+        async with asyncio.TaskGroup() as tg:
+            for node in files:
+                tg.create_task(build(node))
+
+        if acl_updates:
+            logger.info(f"Updating access lists of {len(acl_updates)} unchanged documents in {dossier_name}")
+            await self._in_stage("index", self.es.update_document_fields, acl_updates)
+        if self.config.chunk_index and unchanged:
+            # Documents indexed before the chunk index was enabled
+            await self._index_chunks(await self._in_stage("list", self.es.get_unchunked_documents, unchanged))
+        return dossier_doc
+
+    def progress(self) -> dict:
+        """
+        Counters of the current run with per-stage rates and an ETA.
+
+        Rates are per second since the run started. The ETA extrapolates the
+        rate at which files are finished (indexed, skipped or failed) to the
+        files discovered so far, so it grows while dossiers are still listed.
+        """
+        counters = dict(self._progress)
+        elapsed = max(time.monotonic() - self._progress_started, 1e-6)
+        finished = counters["indexed"] + counters["skipped"] + counters["failed"]
+        remaining = max(counters["discovered"] - finished, 0)
+        return {
+            **counters,
+            "elapsed_seconds": round(elapsed, 1),
+            "rates": {
+                stage: round(counters[stage] / elapsed, 2)
+                for stage in ("discovered", "fetched", "extracted", "indexed", "bytes")
+            },
+            "eta_seconds": round(remaining / (finished / elapsed), 1) if finished else None,
+        }
+
+    def _reset_progress(self):
+        self._progress = dict.fromkeys(
+            ("dossiers_total", "dossiers_done", "discovered", "fetched", "extracted",
+             "indexed", "skipped", "failed", "bytes", "chunks"),
+            0,
+        )
+        self._progress_started = time.monotonic()
+
+    def _track(self, counter: str, amount: int = 1):
+        self._progress[counter] += amount
+
+    def _reset_index_buffer(self):
+        self._index_buffer: list[dict] = []
+        self._index_buffer_bytes = 0
+        self._index_stats = {"indexed": 0, "failed": 0, "skipped": 0}
+        self._flushing: set[asyncio.Future] = set()
+
+    async def _queue_for_index(self, doc: dict):
+        """
+        Add a built document to the index buffer, flushing once it is full.
+
+        The flush is awaited by the producer, so when Elasticsearch is slow
+        (or the index stage is saturated) document building waits instead of
+        accumulating documents in memory.
+        """
+        self._index_buffer.append(doc)
+        # Rough payload size: full_text is stored twice (as paragraphs too)
+        self._index_buffer_bytes += 2 * len(doc.get("full_text") or "") + 1024
+        if (
+            len(self._index_buffer) >= self.config.index_batch_size
+            or self._index_buffer_bytes >= self.config.index_batch_bytes
+        ):
+            await self._flush_index_buffer()
+
+    async def _flush_index_buffer(self):
+        batch = self._index_buffer
+        if not batch:
+            return
+        self._index_buffer = []
+        self._index_buffer_bytes = 0
+
+        task = asyncio.ensure_future(self._index_batch(batch))
+        self._flushing.add(task)
+        task.add_done_callback(self._flushing.discard)
+        await task
+
+    async def _drain_index_buffer(self):
+        """Flush the buffer and wait for batches other tasks are still indexing."""
+        await self._flush_index_buffer()
+        if self._flushing:
+            await asyncio.wait(set(self._flushing))
+
+    async def _index_batch(self, batch: list[dict]):
+        logger.info("Indexing batch of %d documents", len(batch))
+        try:
+            indexed, failed = await self._in_stage("index", self.es.do_index_documents, batch)
+            errors = {}
+            for item in failed:
+                op = item.get("index") or item.get("create") or {}
+                errors[op.get("_id")] = op.get("error")
+            dead = [
+                (doc, errors[hash(doc["nextcloud_id"])])
+                for doc in batch
+                if doc.get("nextcloud_id") and hash(doc["nextcloud_id"]) in errors
+            ]
+        except Exception as e:
+            logger.error(f"Failed to index batch of {len(batch)} documents: {e}")
+            indexed, failed = 0, batch
+            dead = [(doc, e) for doc in batch]
+        self._index_stats["indexed"] += indexed
+        self._index_stats["failed"] += len(failed)
+        self._track("indexed", indexed)
+        self._track("failed", len(failed))
+        failed_ids = {doc.get("nextcloud_id") for doc, _ in dead}
+        await self._index_chunks([doc for doc in batch if doc.get("nextcloud_id") not in failed_ids])
+
+        await self._in_state_db(self.state_manager.add_dead_letters, self._run_id, [
+            {"user": doc.get("author_id"), "path": doc.get("filepath"),
+             "nextcloud_id": doc.get("nextcloud_id"), "error": repr(error)}
+            for doc, error in dead
+        ])
+        if self._run_id is not None:
+            # Per-batch progress of the run, kept when the run is interrupted
+            try:
+                await self._in_state_db(self.state_manager.add_run_progress, self._run_id, indexed, len(failed))
+            except Exception as e:
+                logger.warning(f"Failed to record progress of ingest run {self._run_id}: {e}")
+
+    async def _index_chunks(self, docs: list[dict]):
+        """
+        Split indexed documents into paragraph chunks, embed and index them.
+
+        Chunks carry the document's dossier and access list, so retrieval
+        is a single filtered kNN query on the chunk index. Failures are
+        logged; the documents themselves stay indexed.
+        """
+        docs = [doc for doc in docs if doc.get("nextcloud_id")]
+        if not self.config.chunk_index or not docs:
+            return
+        chunks = [chunk for doc in docs for chunk in self._build_chunks(doc)]
+        batch_size = self.config.embed_batch_size
+        try:
+            embeddings = await asyncio.gather(*(
+                self._in_stage("embed", self.embedder.bulk_embed, [c["chunk_text"] for c in chunks[start:start + batch_size]])
+                for start in range(0, len(chunks), batch_size)
+            ))
+            for chunk, embedding in zip(chunks, (e for batch in embeddings for e in batch)):
+                chunk["embedding"] = embedding
+            indexed, failed = await self._in_stage(
+                "index", self.es.do_index_chunks, [doc["nextcloud_id"] for doc in docs], chunks
+            )
+            self._track("chunks", indexed)
+            if failed:
+                logger.error(f"Failed to index {len(failed)} of {len(chunks)} chunks")
+        except Exception as e:
+            logger.error(f"Failed to index chunks of {len(docs)} documents: {e}")
+
+    def _build_chunks(self, doc: dict) -> list[dict]:
+        """Pack consecutive paragraphs into chunks of at most config.chunk_size characters."""
+        size = self.config.chunk_size
+        texts: list[str] = []
+        current = ""
+        for paragraph in doc.get("paragraphs") or []:
+            text = paragraph["text"]
+            # Paragraphs longer than a chunk are split on whitespace
+            pieces = [text] if len(text) <= size else self._split_text(text, size)
+            for piece in pieces:
+                if current and len(current) + 2 + len(piece) > size:
+                    texts.append(current)
+                    current = ""
+                current = f"{current}\n\n{piece}" if current else piece
+        if current:
+            texts.append(current)
+
+        document_id = hash(doc["nextcloud_id"])
+        return [
+            {
+                "chunk_id": f"{document_id}-{i}",
+                "document_id": document_id,
+                "nextcloud_id": doc["nextcloud_id"],
+                "chunk_index": i,
+                "chunk_text": text,
+                "title": doc.get("title"),
+                "filepath": doc.get("filepath"),
+                "filetype": doc.get("filetype"),
+                "dossier_id": doc.get("dossier_id"),
+                "dossier_name": doc.get("dossier_name"),
+                "accessible_to_users": doc.get("accessible_to_users"),
+                "lastmodifiedtime": doc.get("lastmodifiedtime"),
+            }
+            for i, text in enumerate(texts)
+        ]
+
+    @staticmethod
+    def _split_text(text: str, size: int) -> list[str]:
+        pieces: list[str] = []
+        while len(text) > size:
+            cut = text.rfind(" ", 0, size)
+            if cut <= 0:
+                cut = size
+            pieces.append(text[:cut].strip())
+            text = text[cut:].strip()
+        if text:
+            pieces.append(text)
+        return pieces
+
+    async def _in_stage(self, stage: str, func, *args):
+        """
+        Run func under the concurrency limit of a pipeline stage.
+
+        Coroutine functions are awaited directly; blocking callables (WebDAV,
+        Tika, Elasticsearch) run in the ingestor's thread pool so they do not
+        stall the event loop.
+        """
+        async with self._stage_limits[stage]:
+            if inspect.iscoroutinefunction(func):
+                return await func(*args)
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(self._pool(), functools.partial(func, *args))
+
+    def _pool(self) -> ThreadPoolExecutor:
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(
+                max_workers=(
+                    self.config.list_concurrency
+                    + self.config.fetch_concurrency
+                    + self.config.extract_concurrency
+                    + self.config.enrich_concurrency
+                    + self.config.index_concurrency
+                ),
+                thread_name_prefix="ingest",
+            )
+        return self._executor
+
     async def _get_file_id(self, dossier_path: str, dossier_name: str) -> str | None:
         assert self.nc
 
@@ -280,7 +991,7 @@ class Ingestor:
         # Method 2: Try original WebDAV metadata method
         if not file_id:
             try:
-                dossier_metadata = self.nc.get_metadata(dossier_path)
+                dossier_metadata = await self._in_stage("fetch", self.nc.get_metadata, dossier_path)
                 file_id = dossier_metadata.get("fileid")
                 if file_id:
                     logger.info(f"Retrieved file_id {file_id} for dossier {dossier_name} using metadata method")
@@ -364,7 +1075,7 @@ class Ingestor:
                 processed_dossiers.add(dossier_id)
                 
                 # Check if dossier already exists in ES
-                if self.es.dossier_exists(dossier_id):
+                if await self._in_stage("list", self.es.dossier_exists, dossier_id):
                     logger.debug(f"Dossier {dossier_id} already exists, skipping")
                     continue
                 
@@ -375,7 +1086,7 @@ class Ingestor:
                     full_dossier_path = folder_path if folder_path.startswith("/") else f"/{folder_path}"
                 
                 # Verify the folder still exists
-                if not self.nc.is_dir(full_dossier_path):
+                if not await self._in_stage("list", self.nc.is_dir, full_dossier_path):
                     logger.debug(f"Dossier folder no longer exists: {full_dossier_path}")
                     continue
                 
@@ -383,7 +1094,9 @@ class Ingestor:
                     logger.info(f"Processing new dossier: {dossier_name} at {full_dossier_path}")
                     
                     # Collect statistics
-                    file_count, total_size, first_created = self._collect_tree_stats(full_dossier_path)
+                    file_count, total_size, first_created = self._collect_tree_stats(
+                        await self._in_stage("list", self._list_files, full_dossier_path)
+                    )
                     
                     # Get sharees
                     sharees = await self.nc.get_sharees(full_dossier_path)
@@ -416,7 +1129,7 @@ class Ingestor:
         if dossiers_to_index:
             logger.info(f"Indexing {len(dossiers_to_index)} new dossiers")
             for dossier in dossiers_to_index:
-                self.es.index_new_dossier(dossier)
+                await self._in_stage("index", self.es.index_new_dossier, dossier)
 
 
     def _is_dossier_folder_path(self, folder_path: str) -> bool:
@@ -439,29 +1152,25 @@ class Ingestor:
             return False
 
     async def _process_deleted_files(self, deleted_files: set[str]):
-        """Process file deletions by removing from ES and updating dossier stats."""
-        for file_path in deleted_files:
-            try:
-                # Get document info before deletion for dossier stat updates
-                doc_info = self.es.get_document_info(file_path)
-                
-                # Delete the document from ES
-                self.es.delete_documents_by_path({file_path})
-                
-                # Update dossier stats if we had document info
-                if doc_info:
-                    dossier_id = doc_info.get("dossier_id")
-                    file_size = int(doc_info.get("size", 0))
-                    if dossier_id:
-                        self.es.update_dossier_stats(dossier_id, file_count_delta=-1, size_delta=-file_size)
-                        logger.debug(f"Updated dossier {dossier_id} stats after deleting {file_path}")
-                        
-            except Exception as e:
-                logger.error(f"Failed to process deletion of {file_path}: {e}")
+        """Process file deletions by removing from ES and recording dossier stat deltas."""
+        try:
+            # Get document info before deletion for dossier stat updates
+            docs_info = await self._in_stage("list", self.es.get_documents_info, deleted_files)
+
+            # Delete all documents at once; the batch is refreshed after stats are applied
+            await self._in_stage("index", functools.partial(self.es.delete_documents_by_path, refresh=False), deleted_files)
+        except Exception as e:
+            logger.error(f"Failed to process deletion of {len(deleted_files)} files: {e}")
+            return
+
+        for doc_info in docs_info.values():
+            dossier_id = doc_info.get("dossier_id")
+            if dossier_id:
+                self._add_dossier_delta(dossier_id, -1, -int(doc_info.get("size", 0)))
 
     async def _process_changed_files(self, changed_files: set[str]):
         """Process created/updated files by re-indexing them."""
-        docs_to_index = []
+        candidates = []
         
         for file_path in changed_files:
             try:
@@ -478,7 +1187,10 @@ class Ingestor:
                     
                 # Check parent directory and file existence
                 parent_path = str(Path(full_file_path).parent)
-                if not self.nc.is_dir(parent_path) or not self._file_exists(file_path):
+                if (
+                    not await self._in_stage("list", self.nc.is_dir, parent_path)
+                    or not await self._in_stage("fetch", self._file_exists, file_path)
+                ):
                     logger.debug(f"File no longer exists, skipping: {file_path}")
                     continue
                 
@@ -494,36 +1206,49 @@ class Ingestor:
                     logger.debug(f"Could not extract dossier name from path: {file_path}")
                     continue
                     
-                dossier_id = self._dossier_id(user, dossier_name)
-                
-                # Check if document already exists (for stat updates)
-                was_existing = self.es.document_exists(file_path)
-                existing_doc_info = None
-                if was_existing:
-                    existing_doc_info = self.es.get_document_info(file_path)
-                
+                candidates.append((file_path, user, self._dossier_id(user, dossier_name), full_file_path))
+                    
+            except Exception as e:
+                logger.error(f"Failed to process changed file {file_path}: {e}")
+
+        self._track("discovered", len(candidates))
+
+        # Look up all previously indexed documents at once (for stat updates)
+        existing = await self._in_stage(
+            "list",
+            self.es.get_documents_info,
+            [self._stored_path(user, full_file_path) for _, user, _, full_file_path in candidates],
+        )
+
+        docs_to_index = []
+        for file_path, user, dossier_id, full_file_path in candidates:
+            try:
+                existing_doc_info = existing.get(self._stored_path(user, full_file_path))
+
                 # Build the document (use full path for WebDAV operations)
                 doc = await self._build_document_incremental(user, dossier_id, full_file_path)
                 docs_to_index.append(doc)
                 
-                # Update dossier stats
+                # Record dossier stat deltas
                 new_file_size = int(doc.get("size", 0))
-                if was_existing and existing_doc_info:
+                if existing_doc_info:
                     # File updated - only update size delta
                     old_file_size = int(existing_doc_info.get("size", 0))
                     size_delta = new_file_size - old_file_size
-                    if size_delta != 0:
-                        self.es.update_dossier_stats(dossier_id, file_count_delta=0, size_delta=size_delta)
+                    self._add_dossier_delta(dossier_id, 0, size_delta)
                 else:
                     # New file - increment count and add size
-                    self.es.update_dossier_stats(dossier_id, file_count_delta=1, size_delta=new_file_size)
+                    self._add_dossier_delta(dossier_id, 1, new_file_size)
                     
             except Exception as e:
                 logger.error(f"Failed to process changed file {file_path}: {e}")
+                self._track("failed")
                 
         # Index all processed documents
         if docs_to_index:
-            self.es.do_index_documents(docs_to_index)
+            await self._in_stage("index", self.es.do_index_documents, docs_to_index)
+            self._track("indexed", len(docs_to_index))
+            await self._index_chunks(docs_to_index)
             logger.info(f"Indexed {len(docs_to_index)} changed documents")
 
     def _is_file_in_dossier_structure(self, file_path: str) -> bool:
@@ -570,34 +1295,21 @@ class Ingestor:
         raw = f"{user}:{dossier_name}".encode("utf-8")
         return hashlib.sha1(raw).hexdigest()  # stable, short id
 
-    def _iter_files(self, root: str) -> Iterator[str]:
-        queue = [Path(root)]
-        while queue:
-            current = queue.pop(0)
-            current_str = str(current)
-            entries = self.nc.listdir(current_str)
-            for name in entries:
-                path = current / name
-                path_str = str(path)
-                if self.nc.is_dir(path_str):
-                    queue.append(path)
-                else:
-                    logger.debug(f"Found file: {path_str}, yielding")
-                    yield path_str
+    def _list_files(self, root: str) -> list[dict]:
+        """All file nodes below root, with metadata, from a single tree walk."""
+        return [n for n in self.nc.walk_tree(root) if not n["is_dir"]]
 
-    def _collect_tree_stats(self, root: str) -> tuple[int, int, str | None]:
+    def _collect_tree_stats(self, files: list[dict]) -> tuple[int, int, str | None]:
         count = 0
         total = 0
         created_candidates: list[str] = []
-        for path in self._iter_files(root):
-            meta = self.nc.get_metadata(path)
-            logger.debug(f"File {path} metadata: {meta}")
+        for meta in files:
             count += 1
             try:
                 total += int(meta.get("size", 0))
             except Exception:
                 pass
-            created = meta.get("created") or meta.get("modified") or ""
+            created = self._normalize_date(meta.get("created")) or self._normalize_date(meta.get("modified"))
             if created:
                 created_candidates.append(created)
         created_str = min(created_candidates) if created_candidates else None
@@ -620,12 +1332,10 @@ class Ingestor:
         logger.warning(f"Unrecognized date format: {date_str}")
         return None
 
-    async def _build_document(self, user: str, dossier: dict, path: str) -> dict:
-        # Fetch file content (for hashing and extraction)
-        content = self.nc.read_file(path)
-
-        # Basic metadata
-        stat = self.nc.get_metadata(path)
+    async def _build_document(self, user: str, dossier: dict, path: str, stat: dict | None = None) -> dict:
+        # Basic metadata, unless the tree walk already provided it
+        if stat is None:
+            stat = await self._in_stage("fetch", self.nc.get_metadata, path)
         nextcloud_id = stat.get("fileid", None)
         size = int(stat.get("size", 0))
         modified = stat.get("modified", None)
@@ -641,18 +1351,26 @@ class Ingestor:
         modified = self._normalize_date(modified)
         
         filetype = stat.get("type", None)
-        sharees = await self.nc.get_sharees(path)
+        etag = stat.get("etag", None)
+        sharees = await self._in_stage("enrich", self.nc.get_sharees, path)
         sharees.add(user)
 
-        last_modified_user = await self.nc.get_last_modified_user_async(nextcloud_id)
+        last_modified_user = self._last_modifiers.get(str(nextcloud_id))
 
         # MIME & extension
         ext = os.path.splitext(path)[1].lower()
 
-        # Extraction
+        # Stream file content to a spooled temp file, hashing it on the way, and extract
+        content, content_sha256 = await self._in_stage("fetch", self.nc.download, path)
+        self._track("fetched")
+        self._track("bytes", size)
         full_text = ""
-        if ext in SUPPORTED_EXTENSIONS:
-            full_text = self.extractor.extract(path, content)
+        try:
+            if ext in SUPPORTED_EXTENSIONS:
+                full_text = await self._in_stage("extract", self.extractor.extract, path, content)
+                self._track("extracted")
+        finally:
+            content.close()
         paragraphs = self.parse(full_text)
 
         # Build schema-compliant doc
@@ -688,38 +1406,48 @@ class Ingestor:
             "paragraphs": paragraphs,
             "size": size,
             "summary": None,
+            "etag": etag,
+            "content_sha256": content_sha256,
             
         }
         return doc
 
+    def _stored_path(self, user: str, full_path: str) -> str:
+        """Return the filepath an incrementally built document is indexed under."""
+        if full_path.startswith(f"/{user}/"):
+            return full_path[len(f"/{user}/"):]
+        return full_path.lstrip("/")  # Remove leading slash if no user prefix
+
     async def _build_document_incremental(self, user: str, dossier_id: str, full_path: str) -> dict:
         """Build document for incremental processing when we only have dossier_id."""
         # Extract the original path without user prefix for document storage
-        if full_path.startswith(f"/{user}/"):
-            original_path = full_path[len(f"/{user}/"):]
-        else:
-            original_path = full_path.lstrip("/")  # Remove leading slash if no user prefix
+        original_path = self._stored_path(user, full_path)
             
-        # Fetch file content (for hashing and extraction) using full path
-        content = self.nc.read_file(full_path)
-
         # Basic metadata using full path
-        stat = self.nc.get_metadata(full_path)
+        stat = await self._in_stage("fetch", self.nc.get_metadata, full_path)
         nextcloud_id = stat.get("fileid", None)
         size = int(stat.get("size", 0))
         modified = self._normalize_date(stat.get("modified", None))
         created = self._normalize_date(stat.get("created", modified))
         filetype = stat.get("type", None)
-        sharees = await self.nc.get_sharees(full_path)
+        etag = stat.get("etag", None)
+        sharees = await self._in_stage("enrich", self.nc.get_sharees, full_path)
         sharees.add(user)
 
         # MIME & extension using original path
         ext = os.path.splitext(original_path)[1].lower()
 
-        # Extraction using full path for file access, but original path for reference
+        # Stream file content (for hashing and extraction) using full path, but original path for reference
+        content, content_sha256 = await self._in_stage("fetch", self.nc.download, full_path)
+        self._track("fetched")
+        self._track("bytes", size)
         full_text = ""
-        if ext in SUPPORTED_EXTENSIONS:
-            full_text = self.extractor.extract(full_path, content)
+        try:
+            if ext in SUPPORTED_EXTENSIONS:
+                full_text = await self._in_stage("extract", self.extractor.extract, full_path, content)
+                self._track("extracted")
+        finally:
+            content.close()
         paragraphs = self.parse(full_text)
 
         # Extract dossier name from original path (reverse of _dossier_id)
@@ -751,13 +1479,15 @@ class Ingestor:
             "full_text": full_text,
             "keywords": [],
             "last_annotated": None,
-            "lastmodified_user_id": user,
+            "lastmodified_user_id": self._last_modifiers.get(str(nextcloud_id)) or user,
             "needs_download": "no",
             "needs_annotation": "no",
             "number_pages": None,
             "paragraphs": paragraphs,
             "size": size,
             "summary": None,
+            "etag": etag,
+            "content_sha256": content_sha256,
             
         }
         return doc
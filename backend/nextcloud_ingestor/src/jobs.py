@@ -0,0 +1,107 @@
+import asyncio
+import dataclasses
+import datetime
+import uuid
+from typing import Any, Awaitable, Callable
+from ingest_utils import logger
+
+
+class JobConflictError(Exception):
+    """Raised when a job of the same type is already running."""
+    pass
+
+
+@dataclasses.dataclass
+class Job:
+    id: str
+    type: str
+    ingestor: Any
+    task: asyncio.Task
+    status: str = "running"  # running | completed | failed | cancelled
+    started_at: datetime.datetime = dataclasses.field(
+        default_factory=lambda: datetime.datetime.now(datetime.timezone.utc)
+    )
+    finished_at: datetime.datetime | None = None
+    error: str | None = None
+
+    def to_dict(self) -> dict:
+        return {
+            "id": self.id,
+            "type": self.type,
+            "status": self.status,
+            "started_at": self.started_at.isoformat(),
+            "finished_at": self.finished_at.isoformat() if self.finished_at else None,
+            "error": self.error,
+            "progress": self.ingestor.progress(),
+        }
+
+
+class JobRegistry:
+    """
+    Ingest jobs started by this process, with at most one running job per type.
+
+    Finished jobs are kept (up to keep_finished) so their final progress can
+    still be queried.
+    """
+
+    def __init__(self, keep_finished: int = 50):
+        self.keep_finished = keep_finished
+        self._jobs: dict[str, Job] = {}
+
+    def start(self, job_type: str, ingestor, run: Callable[[], Awaitable]) -> Job:
+        """
+        Start run() as a background job of job_type.
+
+        Args:
+            job_type: Job type, e.g. "full" or "incremental"
+            ingestor: The Ingestor doing the work, queried for progress
+            run: Coroutine function starting the ingest
+
+        Raises:
+            JobConflictError: If a job of this type is still running
+        """
+        running = self.running(job_type)
+        if running is not None:
+            raise JobConflictError(f"A {job_type} ingest is already running (job {running.id})")
+
+        job_id = uuid.uuid4().hex
+        job = Job(id=job_id, type=job_type, ingestor=ingestor, task=asyncio.create_task(run()))
+        job.task.add_done_callback(lambda task: self._finished(job, task))
+        self._jobs[job_id] = job
+        self._prune()
+        logger.info(f"Started {job_type} ingest job {job_id}")
+        return job
+
+    def get(self, job_id: str) -> Job | None:
+        return self._jobs.get(job_id)
+
+    def list(self) -> list[Job]:
+        return sorted(self._jobs.values(), key=lambda job: job.started_at, reverse=True)
+
+    def running(self, job_type: str) -> Job | None:
+        return next((job for job in self._jobs.values() if job.type == job_type and job.status == "running"), None)
+
+    def cancel(self, job_id: str) -> bool:
+        """Request cancellation of a running job; returns False if it is unknown or already finished."""
+        job = self._jobs.get(job_id)
+        if job is None or job.status != "running":
+            return False
+        logger.info(f"Cancelling {job.type} ingest job {job_id}")
+        return job.task.cancel()
+
+    def _finished(self, job: Job, task: asyncio.Task):
+        job.finished_at = datetime.datetime.now(datetime.timezone.utc)
+        if task.cancelled():
+            job.status = "cancelled"
+        elif task.exception() is not None:
+            job.status = "failed"
+            job.error = str(task.exception())
+            logger.error(f"{job.type} ingest job {job.id} failed: {job.error}")
+        else:
+            job.status = "completed"
+        logger.info(f"{job.type} ingest job {job.id} {job.status}")
+
+    def _prune(self):
+        finished = [job for job in self.list() if job.status != "running"]
+        for job in finished[self.keep_finished:]:
+            del self._jobs[job.id]
@@ -2,12 +2,14 @@ from __future__ import annotations
 
 import os
 import asyncio
+import socket
 import sys
 from fastapi import FastAPI, HTTPException, Query
 from fastapi.responses import JSONResponse
 import uvicorn
 from config import Config
 from ingestor import Ingestor
+from jobs import Job, JobConflictError, JobRegistry
 
 DRY_RUN = os.getenv('DRY_RUN', 'false').lower() == 'true'
 
@@ -21,6 +23,24 @@ app = FastAPI(
 # Global config and ingestor instance
 config = Config.from_env(envfile='.env')
 
+# Resident ingestor of daemon mode; the incremental endpoint wakes it
+daemon_ingestor: Ingestor | None = None
+
+# Ingest jobs started through the API, one running job per type
+jobs = JobRegistry()
+
+
+def start_job(job_type: str, run) -> Job:
+    """Start run(ingestor) on a new Ingestor as a registered job, or fail with 409 if one is running."""
+    running = jobs.running(job_type)
+    if running is not None:
+        raise HTTPException(status_code=409, detail=f"A {job_type} ingest is already running (job {running.id})")
+    ingestor = Ingestor(config)
+    try:
+        return jobs.start(job_type, ingestor, lambda: run(ingestor))
+    except JobConflictError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+
 
 @app.get("/")
 def root():
@@ -28,27 +48,37 @@ def root():
 
 
 @app.post("/ingest/full")
-async def run_full_ingest_endpoint(dry_run: bool = None):
+async def run_full_ingest_endpoint(
+    dry_run: bool = None, resume: bool = False, reindex: bool = False, force: bool = False
+):
     """Run full ingest (recreates indices). Traverses all files and reindexes everything."""
     try:
         # Use provided dry_run parameter or fall back to environment variable
         effective_dry_run = DRY_RUN if dry_run is None else dry_run
         
-        ingestor = Ingestor(config)
-        
         # Run in background task
-        asyncio.create_task(ingestor.run_full_ingest(dry_run=effective_dry_run))
+        job = start_job(
+            "full",
+            lambda ingestor: ingestor.run_full_ingest(
+                dry_run=effective_dry_run, resume=resume, reindex=reindex, force=force
+            ),
+        )
         
         return {
             "status": "Full ingestion started",
+            "job_id": job.id,
             "dry_run": effective_dry_run,
             "message": "Recreating indices and processing all files"
         }
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to start full ingestion: {str(e)}")
 
 
-async def run_full_ingest_direct(dry_run: bool = None):
+async def run_full_ingest_direct(
+    dry_run: bool = None, resume: bool = False, reindex: bool = False, force: bool = False
+):
     """Direct execution of full ingest for command line usage."""
     try:
         # Use provided dry_run parameter or fall back to environment variable
@@ -57,7 +87,7 @@ async def run_full_ingest_direct(dry_run: bool = None):
         ingestor = Ingestor(config)
         
         # Run directly and await completion
-        await ingestor.run_full_ingest(dry_run=effective_dry_run)
+        await ingestor.run_full_ingest(dry_run=effective_dry_run, resume=resume, reindex=reindex, force=force)
         
         print(f"Full ingestion completed successfully (dry_run={effective_dry_run})")
         
@@ -72,17 +102,30 @@ async def run_incremental_ingest_endpoint(dry_run: bool = Query(default=None, de
     try:
         # Use provided dry_run parameter or fall back to environment variable
         effective_dry_run = DRY_RUN if dry_run is None else dry_run
-        
-        ingestor = Ingestor(config)
-        
+
+        if daemon_ingestor is not None:
+            # The daemon's next pass runs now, on its warm connections
+            daemon_ingestor.wake()
+            return {
+                "status": "Incremental ingestion triggered",
+                "dry_run": effective_dry_run,
+                "message": "Woke the resident ingest daemon"
+            }
+
         # Run incremental ingest without fallback functionality (as requested)
-        asyncio.create_task(ingestor.run_incremental_ingest(dry_run=effective_dry_run, fallback_to_full=False))
+        job = start_job(
+            "incremental",
+            lambda ingestor: ingestor.run_incremental_ingest(dry_run=effective_dry_run, fallback_to_full=False),
+        )
         
         return {
             "status": "Incremental ingestion started",
+            "job_id": job.id,
             "dry_run": effective_dry_run,
             "message": "Processing activities since last run"
         }
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to start incremental ingestion: {str(e)}")
 
@@ -105,6 +148,65 @@ async def run_incremental_ingest_direct(dry_run: bool = None):
         raise
 
 
+async def run_daemon_direct(dry_run: bool = None):
+    """Serve the API and run incremental ingest continuously on one resident ingestor."""
+    global daemon_ingestor
+    effective_dry_run = DRY_RUN if dry_run is None else dry_run
+    daemon_ingestor = Ingestor(config)
+    # Registered as a job so its throughput shows up under /ingest/jobs
+    daemon = jobs.start("daemon", daemon_ingestor, lambda: daemon_ingestor.run_daemon(dry_run=effective_dry_run))
+    server = uvicorn.Server(uvicorn.Config(app, host="0.0.0.0", port=8000))
+    try:
+        await server.serve()
+    finally:
+        jobs.cancel(daemon.id)
+        await asyncio.gather(daemon.task, return_exceptions=True)
+        daemon_ingestor = None
+
+
+async def run_coordinator_direct(dry_run: bool = None):
+    """Enqueue dossier work items for a sharded full ingest."""
+    effective_dry_run = DRY_RUN if dry_run is None else dry_run
+    ingestor = Ingestor(config)
+    run_id = await ingestor.run_coordinator(dry_run=effective_dry_run)
+    print(f"Sharded full ingestion {run_id} enqueued (dry_run={effective_dry_run})")
+
+
+async def run_worker_direct(worker_id: str | None = None, dry_run: bool = None):
+    """Process dossier work items until the queue is drained."""
+    effective_dry_run = DRY_RUN if dry_run is None else dry_run
+    worker_id = worker_id or f"{socket.gethostname()}-{os.getpid()}"
+    ingestor = Ingestor(config)
+    await ingestor.run_worker(worker_id, dry_run=effective_dry_run)
+    print(f"Worker {worker_id} finished (dry_run={effective_dry_run})")
+
+
+@app.get("/ingest/jobs")
+def list_jobs():
+    """List running and recently finished ingest jobs, newest first."""
+    return [job.to_dict() for job in jobs.list()]
+
+
+@app.get("/ingest/jobs/{job_id}")
+def get_job(job_id: str):
+    """Status and progress of an ingest job: files discovered, fetched, extracted and indexed, bytes, rates and ETA."""
+    job = jobs.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"Unknown job: {job_id}")
+    return job.to_dict()
+
+
+@app.post("/ingest/jobs/{job_id}/cancel")
+def cancel_job(job_id: str):
+    """Cancel a running ingest job. A cancelled full ingest can be continued with resume=true."""
+    job = jobs.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"Unknown job: {job_id}")
+    if not jobs.cancel(job_id):
+        raise HTTPException(status_code=409, detail=f"Job {job_id} is not running ({job.status})")
+    return {"status": "Cancelling", "job_id": job_id}
+
+
 @app.get("/run")
 async def run_ingestor(dry_run: bool = Query(default=None, description="Override DRY_RUN environment variable")):
     """Legacy endpoint - runs full ingest for backwards compatibility."""
@@ -112,14 +214,16 @@ async def run_ingestor(dry_run: bool = Query(default=None, description="Override
         # Use provided dry_run parameter or fall back to environment variable
         effective_dry_run = DRY_RUN if dry_run is None else dry_run
         
-        ingestor = Ingestor(config)
-        asyncio.create_task(ingestor.run_full_ingest(dry_run=effective_dry_run))
+        job = start_job("full", lambda ingestor: ingestor.run_full_ingest(dry_run=effective_dry_run))
         
         return {
             "status": "Running ingestion (full)",
+            "job_id": job.id,
             "dry_run": effective_dry_run,
             "message": "Using legacy endpoint - running full ingest"
         }
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to start ingestion: {str(e)}")
 
@@ -130,12 +234,25 @@ if __name__ == "__main__":
         # Start API server
         uvicorn.run("main:app", host="0.0.0.0", port=8000, reload=True)
     elif len(args) > 0 and args[0] == "full":
-        asyncio.run(run_full_ingest_direct())
+        asyncio.run(run_full_ingest_direct(
+            resume="--resume" in args[1:], reindex="--reindex" in args[1:], force="--force" in args[1:]
+        ))
     elif len(args) > 0 and args[0] == "incremental":
         asyncio.run(run_incremental_ingest_direct())
+    elif len(args) > 0 and args[0] == "daemon":
+        asyncio.run(run_daemon_direct())
+    elif len(args) > 0 and args[0] == "coordinate":
+        asyncio.run(run_coordinator_direct())
+    elif len(args) > 0 and args[0] == "worker":
+        asyncio.run(run_worker_direct(args[1] if len(args) > 1 else None))
     else:
-        print("Usage: python main.py [api|full|incremental]")
+        print("Usage: python main.py [api|full [--resume] [--reindex] [--force]|incremental|daemon|coordinate|worker [id]]")
         print("  api         - Start the FastAPI server")
-        print("  full        - Run full ingestion (recreates indices)")
+        print("  full        - Run full ingestion (recreates indices); --resume continues the last unfinished run,")
+        print("                --reindex builds new indices and swaps the search aliases when done,")
+        print("                --force swaps them even if dossiers or files failed")
         print("  incremental - Run incremental ingestion (processes changes since last run)")
+        print("  daemon      - Serve the API and run incremental ingestion continuously with adaptive polling")
+        print("  coordinate  - Enqueue one work item per dossier for a sharded full ingestion")
+        print("  worker      - Claim and ingest dossier work items until none are left")
         sys.exit(1)
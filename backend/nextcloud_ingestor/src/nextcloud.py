@@ -1,9 +1,16 @@
 import os
+import asyncio
+import datetime
+import hashlib
+import tempfile
 from pathlib import Path
+from typing import BinaryIO
+from urllib.parse import unquote, urlparse
 import httpx
+import requests
 import webdav3
 from webdav3.client import Client as WebDAVClient
-from utils import logger
+from ingest_utils import logger
 import xml.etree.ElementTree as ET
 
 # Load environment variables from .env file
@@ -18,6 +25,17 @@ NC_URL = os.getenv("NC_URL") or os.getenv("NEXTCLOUD_URL", "http://localhost:808
 NC_USER = os.getenv("NC_USER") or os.getenv("NEXTCLOUD_ADMIN_USERNAME", "admin")
 NC_PASSWORD = os.getenv("NC_PASSWORD") or os.getenv("NEXTCLOUD_ADMIN_PASSWORD", "adminpassword")
 
+# Shared HTTP connection pool
+NC_HTTP_MAX_CONNECTIONS = int(os.getenv("NC_HTTP_MAX_CONNECTIONS", "32"))
+NC_HTTP_MAX_KEEPALIVE = int(os.getenv("NC_HTTP_MAX_KEEPALIVE", "16"))
+NC_HTTP_TIMEOUT = float(os.getenv("NC_HTTP_TIMEOUT", "30"))
+NC_HTTP_CONNECT_TIMEOUT = float(os.getenv("NC_HTTP_CONNECT_TIMEOUT", "10"))
+NC_HTTP2 = os.getenv("NC_HTTP2", "false").lower() in ("1", "true", "yes")
+
+# Downloads larger than this are spooled to a temporary file instead of memory
+NC_SPOOL_MAX_MEMORY = int(os.getenv("NC_SPOOL_MAX_MEMORY", str(8 * 1024 * 1024)))
+NC_DOWNLOAD_CHUNK_SIZE = int(os.getenv("NC_DOWNLOAD_CHUNK_SIZE", str(1024 * 1024)))
+
 
 class NextCloudConnector:
     def __init__(self):
@@ -30,6 +48,7 @@ class NextCloudConnector:
         # webdavclient
         self.base_url = NC_URL.rstrip("/")
         self.files_root = self.base_url + "/remote.php/dav/files/"
+        self.files_root_path = urlparse(self.files_root).path
         options = {
             "webdav_hostname": str(self.files_root),
             "webdav_login": NC_USER,
@@ -37,8 +56,15 @@ class NextCloudConnector:
             "disable_check": True,  # avoid HEAD check on init
         }
         self.webdavclient = WebDAVClient(options)
+        # Keep WebDAV connections alive across the ingest worker threads
+        adapter = requests.adapters.HTTPAdapter(
+            pool_connections=NC_HTTP_MAX_KEEPALIVE, pool_maxsize=NC_HTTP_MAX_CONNECTIONS
+        )
+        self.webdavclient.session.mount("http://", adapter)
+        self.webdavclient.session.mount("https://", adapter)
 
         self.nc_auth = (NC_USER, NC_PASSWORD)
+        self._http: httpx.AsyncClient | None = None
 
         # for direct API calls
         self.api_headers = {
@@ -51,22 +77,36 @@ class NextCloudConnector:
             "Content-Type": "application/xml",
             "Depth": "0"
         }
+        self.dav_ns = {"d": "DAV:", "oc": "http://owncloud.org/ns", "nc": "http://nextcloud.org/ns"}
 
         self.usergroups: dict[str, list[str]] | None = None
+        self.reset_caches()
 
-    def listdir(self, path: str) -> list[str]:
-        raw = self.webdavclient.list(path) or []
-        items = []
-        for p in raw[1:]:
-            if p.endswith("/"):
-                p = p[:-1]
-            name = p.rsplit("/", 1)[-1] if "/" in p else p
-            if name in (".", ".."):
-                continue
-            if name == "":
-                continue
-            items.append(name)
-        return items
+    @property
+    def http(self) -> httpx.AsyncClient:
+        """Pooled client shared by all OCS and WebDAV calls, created on first use."""
+        if self._http is None or self._http.is_closed:
+            self._http = httpx.AsyncClient(
+                auth=self.nc_auth,
+                limits=httpx.Limits(
+                    max_connections=NC_HTTP_MAX_CONNECTIONS,
+                    max_keepalive_connections=NC_HTTP_MAX_KEEPALIVE,
+                ),
+                timeout=httpx.Timeout(NC_HTTP_TIMEOUT, connect=NC_HTTP_CONNECT_TIMEOUT),
+                http2=NC_HTTP2,
+            )
+        return self._http
+
+    async def aclose(self) -> None:
+        if self._http is not None:
+            await self._http.aclose()
+            self._http = None
+
+    async def __aenter__(self) -> "NextCloudConnector":
+        return self
+
+    async def __aexit__(self, *exc_info) -> None:
+        await self.aclose()
 
     def is_dir(self, path: str) -> bool:
         try:
@@ -74,15 +114,30 @@ class NextCloudConnector:
         except webdav3.exceptions.RemoteResourceNotFound:
             return False
 
-    def read_file(self, path: str) -> bytes:
+    def download(self, path: str) -> tuple[BinaryIO, str]:
+        """
+        Stream a file into a spooled temporary file, hashing it on the fly.
+
+        Files up to NC_SPOOL_MAX_MEMORY stay in memory and larger ones roll
+        over to disk, so memory use does not grow with the file size.
+
+        Returns:
+            tuple: (file object positioned at the start, sha256 hex digest); the caller closes the file
+        """
         url = self.webdavclient.get_url(path)
-        resp = self.webdavclient.session.get(
-            url,
-            auth=self.nc_auth,
-            stream=True
-        )
-        resp.raise_for_status()
-        return resp.content
+        digest = hashlib.sha256()
+        spool = tempfile.SpooledTemporaryFile(max_size=NC_SPOOL_MAX_MEMORY)
+        try:
+            with self.webdavclient.session.get(url, auth=self.nc_auth, stream=True) as resp:
+                resp.raise_for_status()
+                for chunk in resp.iter_content(chunk_size=NC_DOWNLOAD_CHUNK_SIZE):
+                    digest.update(chunk)
+                    spool.write(chunk)
+        except Exception:
+            spool.close()
+            raise
+        spool.seek(0)
+        return spool, digest.hexdigest()
 
     def get_metadata(self, path: str) -> dict[str, str]:
         info = self.webdavclient.info(path)
@@ -138,28 +193,137 @@ class NextCloudConnector:
             logger.error(f"Error fetching file ID for {path}: {e}")
             return None
 
+    def walk_tree(self, path: str, depth: str = "infinity") -> list[dict]:
+        """
+        List a folder and everything below it with a single PROPFIND.
+
+        Every node carries the same keys as `get_metadata` plus `path` and
+        `is_dir`, so callers can use a node wherever they would otherwise have
+        fetched metadata per file. The root folder itself is the first node.
+        Servers that refuse `Depth: infinity` are walked level by level with
+        `Depth: 1` requests instead (one request per folder, not per file).
+
+        Args:
+            path: Folder path relative to the WebDAV files root (e.g. "/user/Dossiers/X")
+            depth: "infinity" for the whole subtree, "1" for direct children only
+
+        Returns:
+            list[dict]: Nodes in server order, root first
+        """
+        try:
+            return self._propfind_tree(path, depth)
+        except requests.HTTPError as e:
+            status = e.response.status_code if e.response is not None else None
+            if depth != "infinity" or status not in (400, 403, 501):
+                raise
+            logger.info(f"Depth: infinity PROPFIND refused for {path} ({status}), walking per folder")
+
+        nodes = self._propfind_tree(path, "1")
+        queue = [n["path"] for n in nodes[1:] if n["is_dir"]]
+        while queue:
+            children = self._propfind_tree(queue.pop(0), "1")[1:]
+            nodes.extend(children)
+            queue.extend(n["path"] for n in children if n["is_dir"])
+        return nodes
+
+    def _propfind_tree(self, path: str, depth: str) -> list[dict]:
+        xml_body = """<?xml version="1.0"?>
+        <d:propfind xmlns:d="DAV:" xmlns:oc="http://owncloud.org/ns" xmlns:nc="http://nextcloud.org/ns">
+        <d:prop>
+            <d:resourcetype/>
+            <d:getcontentlength/>
+            <d:getcontenttype/>
+            <d:getetag/>
+            <d:getlastmodified/>
+            <d:creationdate/>
+            <oc:fileid/>
+            <oc:size/>
+            <nc:creation_time/>
+        </d:prop>
+        </d:propfind>
+        """
+
+        url = self.webdavclient.get_url(path)
+        resp = self.webdavclient.session.request(
+            "PROPFIND",
+            url,
+            auth=self.nc_auth,
+            headers={**self.xml_header, "Depth": depth},
+            data=xml_body
+        )
+        resp.raise_for_status()
+
+        root = ET.fromstring(resp.content)
+        nodes = [self._parse_propfind_response(r) for r in root.findall("d:response", self.dav_ns)]
+        logger.debug(f"PROPFIND Depth: {depth} on {path} returned {len(nodes)} nodes")
+        return nodes
+
+    def _parse_propfind_response(self, response: ET.Element) -> dict:
+        """Turn one <d:response> element into a node dict (see `walk_tree`)."""
+        ns = self.dav_ns
+        href = unquote(response.findtext("d:href", default="", namespaces=ns))
+        if href.startswith(self.files_root_path):
+            href = href[len(self.files_root_path):]
+        node_path = "/" + href.strip("/")
+
+        # Merge the props of all 200 propstats; missing props come back as 404
+        props: dict[str, ET.Element] = {}
+        for propstat in response.findall("d:propstat", ns):
+            status = propstat.findtext("d:status", default="", namespaces=ns)
+            prop_elem = propstat.find("d:prop", ns)
+            if "200" not in status.split() or prop_elem is None:
+                continue
+            for prop in prop_elem:
+                props[prop.tag] = prop
+
+        def text(tag: str) -> str:
+            elem = props.get(tag)
+            return (elem.text or "").strip() if elem is not None else ""
+
+        resourcetype = props.get(f"{{{ns['d']}}}resourcetype")
+        is_dir = resourcetype is not None and resourcetype.find("d:collection", ns) is not None
+
+        # Folders have no getcontentlength, oc:size holds their recursive size
+        size = text(f"{{{ns['d']}}}getcontentlength") or text(f"{{{ns['oc']}}}size") or "0"
+
+        # nc:creation_time is 0 when the storage does not track creation
+        created = text(f"{{{ns['d']}}}creationdate")
+        creation_time = text(f"{{{ns['nc']}}}creation_time")
+        if creation_time.isdigit() and int(creation_time) > 0:
+            created = datetime.datetime.fromtimestamp(
+                int(creation_time), tz=datetime.timezone.utc
+            ).strftime("%Y-%m-%dT%H:%M:%SZ")
+
+        return {
+            "path": node_path,
+            "is_dir": is_dir,
+            "size": str(int(size)) if size.isdigit() else "0",
+            "modified": text(f"{{{ns['d']}}}getlastmodified"),
+            "created": created,
+            "type": text(f"{{{ns['d']}}}getcontenttype"),
+            "fileid": text(f"{{{ns['oc']}}}fileid") or None,
+            "etag": text(f"{{{ns['d']}}}getetag").strip('"') or None,
+        }
+
     async def list_users(self) -> list[str]:
         logger.info("Listing users from NextCloud")
         try:
-            # Add timeout to prevent hanging
-            timeout = httpx.Timeout(30.0, connect=10.0)
-            async with httpx.AsyncClient(auth=self.nc_auth, timeout=timeout) as client:
-                logger.debug(f"Making request to: {NC_URL}/ocs/v1.php/cloud/users")
-                resp = await client.get(
-                    NC_URL + "/ocs/v1.php/cloud/users", 
-                    headers=self.api_headers
-                )
-                logger.debug(f"Response status code: {resp.status_code}, Response text: {resp.text}")
+            logger.debug(f"Making request to: {NC_URL}/ocs/v1.php/cloud/users")
+            resp = await self.http.get(
+                NC_URL + "/ocs/v1.php/cloud/users", 
+                headers=self.api_headers
+            )
+            logger.debug(f"Response status code: {resp.status_code}, Response text: {resp.text}")
 
-                if resp.status_code == 200:
-                    data = resp.json()
-                    users = data["ocs"]["data"]["users"]
-                    logger.info(f"Successfully retrieved {len(users)} users from NextCloud")
-                    logger.info(f"Users: {users}")
-                    return users
-                else:
-                    logger.error(f"Error listing users from NextCloud: {resp.status_code} {resp.text}")
-                    return []
+            if resp.status_code == 200:
+                data = resp.json()
+                users = data["ocs"]["data"]["users"]
+                logger.info(f"Successfully retrieved {len(users)} users from NextCloud")
+                logger.info(f"Users: {users}")
+                return users
+            else:
+                logger.error(f"Error listing users from NextCloud: {resp.status_code} {resp.text}")
+                return []
         except httpx.TimeoutException as e:
             logger.error(f"Timeout occurred while listing users from NextCloud: {e}")
             return []
@@ -170,20 +334,19 @@ class NextCloudConnector:
     async def list_groups(self) -> list[str]:
         logger.info("Listing groups from NextCloud")
         try:
-            async with httpx.AsyncClient(auth=self.nc_auth) as client:
-                resp = await client.get(
-                    NC_URL + "/ocs/v1.php/cloud/groups",
-                    headers=self.api_headers
-                )
+            resp = await self.http.get(
+                NC_URL + "/ocs/v1.php/cloud/groups",
+                headers=self.api_headers
+            )
 
-                if resp.status_code == 200:
-                    data = resp.json()
-                    groups = data["ocs"]["data"]["groups"]
-                    logger.info(f"Successfully retrieved {len(groups)} groups from NextCloud")
-                    return groups
-                else:
-                    logger.error(f"Error listing groups from NextCloud: {resp.status_code} {resp.text}")
-                    return []
+            if resp.status_code == 200:
+                data = resp.json()
+                groups = data["ocs"]["data"]["groups"]
+                logger.info(f"Successfully retrieved {len(groups)} groups from NextCloud")
+                return groups
+            else:
+                logger.error(f"Error listing groups from NextCloud: {resp.status_code} {resp.text}")
+                return []
         except Exception as e:
             logger.error(f"Exception occurred while listing groups from NextCloud: {e}")
             return []
@@ -191,20 +354,19 @@ class NextCloudConnector:
     async def list_group_members(self, group: str) -> list[str]:
         logger.info(f"Listing members of group '{group}' from NextCloud")
         try:
-            async with httpx.AsyncClient(auth=self.nc_auth) as client:
-                resp = await client.get(
-                    NC_URL + f"/ocs/v1.php/cloud/groups/{group}",
-                    headers=self.api_headers
-                )
+            resp = await self.http.get(
+                NC_URL + f"/ocs/v1.php/cloud/groups/{group}",
+                headers=self.api_headers
+            )
 
-                if resp.status_code == 200:
-                    data = resp.json()
-                    users = data["ocs"]["data"]["users"]
-                    logger.info(f"Successfully retrieved {len(users)} members for group '{group}'")
-                    return users
-                else:
-                    logger.error(f"Error listing members for group '{group}': {resp.status_code} {resp.text}")
-                    return []
+            if resp.status_code == 200:
+                data = resp.json()
+                users = data["ocs"]["data"]["users"]
+                logger.info(f"Successfully retrieved {len(users)} members for group '{group}'")
+                return users
+            else:
+                logger.error(f"Error listing members for group '{group}': {resp.status_code} {resp.text}")
+                return []
         except Exception as e:
             logger.error(f"Exception occurred while listing members for group '{group}': {e}")
             return []
@@ -216,15 +378,57 @@ class NextCloudConnector:
             members = await self.list_group_members(g)
             groups_membership[g] = members
         return groups_membership
+
+    def reset_caches(self):
+        """
+        Forget group memberships, groupfolders, ACLs and shares resolved so far.
+
+        These are cached for the lifetime of the connector (one ingest run), so
+        resolving sharees for thousands of files costs a handful of OCS and
+        WebDAV calls per dossier instead of several per file.
+        """
+        self.usergroups = None
+        self._cache: dict[str, dict] = {
+            "usergroups": {},
+            "groupfolders": {},
+            "groupfolder_info": {},
+            "acl_tree": {},
+            "acl_path": {},
+            "shares_path": {},
+            "shares_folder": {},
+        }
+
+    async def _memoize(self, cache: str, key, fetch):
+        """
+        Return the cached result for key, fetching it once if needed.
+
+        Concurrent callers for the same key share one in-flight request.
+        Failed fetches are not cached, so the next caller retries.
+        """
+        entries = self._cache[cache]
+        task = entries.get(key)
+        if task is None:
+            task = entries[key] = asyncio.ensure_future(fetch())
+        try:
+            return await asyncio.shield(task)
+        except Exception:
+            if entries.get(key) is task:
+                del entries[key]
+            raise
+
+    async def _get_usergroups(self) -> dict[str, list[str]]:
+        if not self.usergroups:
+            self.usergroups = await self._memoize("usergroups", None, self.get_groups_membership)
+        return self.usergroups
     
     async def get_sharees(self, path: str | Path) -> set[str]:
         """Get list of user IDs who have access to the given path."""
         p = Path(path)
         
         if self._is_groupfolder_path(p):
-            return await self._get_groupfolder_sharees(p)
+            return set(await self._get_groupfolder_sharees(p))
         else:
-            return await self._get_regular_sharees(p)
+            return set(await self._get_regular_sharees(p))
 
     def _is_groupfolder_path(self, path: Path) -> bool:
         """Check if the path is within a groupfolder."""
@@ -236,50 +440,56 @@ class NextCloudConnector:
     async def _get_groupfolder_sharees(self, path: Path) -> set[str]:
         sharees = set()
         
-        if not self.usergroups:
-            self.usergroups = await self.get_groups_membership()
+        usergroups = await self._get_usergroups()
         
-        # First, get the groupfolder info - try index.php endpoint first
-        url = NC_URL + "/index.php/apps/groupfolders/folders"
-        
-        async with httpx.AsyncClient(auth=self.nc_auth) as client:
-            resp = await client.get(url, headers=self.api_headers)
-            logger.debug(resp.json())
+        # First, get the groupfolder info (fetched once per run)
+        folders = await self._get_groupfolders()
             
-            if resp.status_code != 200:
-                logger.error(f"Error fetching groupfolders: {resp.status_code} {resp.text}")
-                return sharees
+        # Find the relevant groupfolder
+        for folder_id, folder_info in folders.items():
+            folder_mount_point = folder_info.get("mount_point", "")
             
-            payload = resp.json()
-            folders = payload.get("ocs", {}).get("data", {})
-            
-            # Find the relevant groupfolder
-            for folder_id, folder_info in folders.items():
-                folder_mount_point = folder_info.get("mount_point", "")
+            # Check if our path is within this groupfolder
+            if self._path_matches_groupfolder(path, folder_mount_point):
+                logger.debug(f"Found matching groupfolder {folder_id}: {folder_mount_point}")
                 
-                # Check if our path is within this groupfolder
-                if self._path_matches_groupfolder(path, folder_mount_point):
-                    logger.debug(f"Found matching groupfolder {folder_id}: {folder_mount_point}")
-                    
-                    # Start with folder-level permissions
-                    folder_groups = folder_info.get("groups", {})
-                    for group_name, _ in folder_groups.items():
-                        if group_name in self.usergroups:
-                            sharees.update(self.usergroups[group_name])
-                            logger.debug(f"Added users from folder-level group {group_name}: {self.usergroups[group_name]}")
-                    
-                    # Now check for ACL permissions on the specific path
-                    acl_sharees = await self._get_groupfolder_acl_sharees(folder_id, path, folder_mount_point)
-                    if acl_sharees is not None:
-                        logger.debug(f"ACL permissions found, using ACL sharees instead")
-                        sharees = acl_sharees
-                    else:
-                        logger.debug(f"No ACL permissions available, using folder-level permissions")
-                    
-                    break
+                # Start with folder-level permissions
+                folder_groups = folder_info.get("groups", {})
+                for group_name, _ in folder_groups.items():
+                    if group_name in usergroups:
+                        sharees.update(usergroups[group_name])
+                        logger.debug(f"Added users from folder-level group {group_name}: {usergroups[group_name]}")
+                
+                # Now check for ACL permissions on the specific path
+                acl_sharees = await self._get_groupfolder_acl_sharees(folder_id, path, folder_mount_point)
+                if acl_sharees is not None:
+                    logger.debug(f"ACL permissions found, using ACL sharees instead")
+                    sharees = set(acl_sharees)
+                else:
+                    logger.debug(f"No ACL permissions available, using folder-level permissions")
+                
+                break
     
         return sharees
 
+    async def _get_groupfolders(self) -> dict[str, dict]:
+        async def fetch():
+            url = NC_URL + "/index.php/apps/groupfolders/folders"
+            resp = await self.http.get(url, headers=self.api_headers)
+
+            if resp.status_code != 200:
+                raise RuntimeError(f"Error fetching groupfolders: {resp.status_code} {resp.text}")
+
+            payload = resp.json()
+            logger.debug(payload)
+            return payload.get("ocs", {}).get("data", {}) or {}
+
+        try:
+            return await self._memoize("groupfolders", None, fetch)
+        except Exception as e:
+            logger.error(str(e))
+            return {}
+
     def _path_matches_groupfolder(self, path: Path, mount_point: str) -> bool:
         """Check if a path belongs to a specific groupfolder."""
         path_str = str(path).lower()
@@ -307,34 +517,86 @@ class NextCloudConnector:
             perm_set.add("sync")
         return perm_set
 
-    async def _get_groupfolder_acl_sharees(self, folder_id: str, path: Path, mount_point: str) -> set[str]:
-        """Get sharees based on ACL permissions for a specific path in a groupfolder."""
-        sharees = set()
-        
+    async def _get_groupfolder_acl_sharees(self, folder_id: str, path: Path, mount_point: str) -> set[str] | None:
+        """
+        Get sharees based on ACL permissions for a specific path in a groupfolder.
+
+        Returns None when ACLs are disabled or no rule applies to the path, in
+        which case the folder-level groups determine access.
+        """
         # Calculate the relative path within the groupfolder
         relative_path = self._get_relative_path_in_groupfolder(path, mount_point)
         
         if not relative_path:
-            return sharees
+            return None
         
         # First check if ACL is enabled
-        folder_url = f"{NC_URL}/index.php/apps/groupfolders/folders/{folder_id}"
+        if not await self._is_acl_enabled(folder_id):
+            logger.debug(f"ACL not enabled for groupfolder {folder_id}")
+            return None
+
+        # ACL rules of the whole subtree (normally the dossier) are fetched
+        # with one PROPFIND; paths outside it fall back to a per-path lookup.
+        path_str = str(path)
+        mount_idx = path_str.lower().find(mount_point.lower())
+        mount_path = path_str[:mount_idx + len(mount_point)] if mount_idx >= 0 else path_str
+        subtree_root = mount_path + "/" + relative_path.split("/", 1)[0]
+
+        rules = None
+        try:
+            tree = await self._memoize("acl_tree", subtree_root, lambda: self._propfind_acl(subtree_root, "infinity"))
+            rules = tree.get(path_str.rstrip("/"))
+        except Exception as e:
+            logger.debug(f"ACL tree lookup failed for {subtree_root}: {e}")
+        if rules is None:
+            node = await self._memoize("acl_path", path_str, lambda: self._propfind_acl(path_str, "0"))
+            rules = next(iter(node.values()), ([], []))
+
+        direct, inherited = rules
+        if not direct and not inherited:
+            return None
+
+        usergroups = await self._get_usergroups()
+        sharees = set()
+        for source, acl_rules in (("ACL", direct), ("inherited ACL", inherited)):
+            for mapping_type, mapping_id, perms in acl_rules:
+                if 'read' not in self._get_permissions(perms):
+                    continue
+                if mapping_type == "group":
+                    for user in usergroups.get(mapping_id, []):
+                        logger.debug(f"Adding user {user} from group {mapping_id} based on {source}")
+                        sharees.add(user)
+                elif mapping_type == "user":
+                    logger.debug(f"Adding user {mapping_id} based on {source}")
+                    sharees.add(mapping_id)
+                else:
+                    raise ValueError(f"Unsupported ACL mapping type: {mapping_type}")
         
-        async with httpx.AsyncClient(auth=self.nc_auth) as client:
-            folder_resp = await client.get(folder_url, headers=self.api_headers)
+        return sharees
+
+    async def _is_acl_enabled(self, folder_id: str) -> bool:
+        folder_info = (await self._get_groupfolders()).get(folder_id, {})
+        if "acl" in folder_info:
+            return bool(folder_info["acl"])
 
+        async def fetch():
+            folder_url = f"{NC_URL}/index.php/apps/groupfolders/folders/{folder_id}"
+            folder_resp = await self.http.get(folder_url, headers=self.api_headers)
             if folder_resp.status_code != 200:
                 logger.debug(f"Could not fetch folder info for {folder_id}: {folder_resp.status_code}")
-                return sharees
-            
-            folder_data = folder_resp.json()
-            folder_info = folder_data.get("ocs", {}).get("data", {})
-            acl_enabled = folder_info.get("acl", False)
-            
-            if not acl_enabled:
-                logger.debug(f"ACL not enabled for groupfolder {folder_id}")
-                return sharees
-            
+                return {}
+            return folder_resp.json().get("ocs", {}).get("data", {}) or {}
+
+        info = await self._memoize("groupfolder_info", folder_id, fetch)
+        return bool(info.get("acl", False))
+
+    async def _propfind_acl(self, path: str, depth: str) -> dict[str, tuple[list, list]]:
+        """
+        Fetch the direct and inherited ACL rules of path (and its subtree for depth "infinity").
+
+        Returns:
+            dict: node path -> (direct rules, inherited rules), each rule a (mapping_type, mapping_id, permissions) tuple
+        """
         xml_body = """<?xml version="1.0"?>
         <d:propfind xmlns:d="DAV:" xmlns:nc="http://nextcloud.org/ns">
         <d:prop>
@@ -347,60 +609,43 @@ class NextCloudConnector:
         </d:propfind>
         """
 
-        xml_url = self.base_url + f"/remote.php/dav/groupfolders/{path}"
-        async with httpx.AsyncClient(auth=self.nc_auth) as client:
-            resp = await client.request(
-                "PROPFIND", 
-                xml_url,
-                headers=self.xml_header,
-                data=xml_body
-            )
-
-        xml_response = resp.content
+        dav_root = "/remote.php/dav/groupfolders"
+        xml_url = self.base_url + f"{dav_root}/{path.lstrip('/')}"
+        resp = await self.http.request(
+            "PROPFIND", 
+            xml_url,
+            headers={**self.xml_header, "Depth": depth},
+            content=xml_body
+        )
+        resp.raise_for_status()
 
         # Parse XML response
         ns = {"d": "DAV:", "nc": "http://nextcloud.org/ns"}
-        root = ET.fromstring(xml_response)
+        root = ET.fromstring(resp.content)
+        href_prefix = urlparse(self.base_url).path + dav_root
 
-        # Direct ACLs
-        for acl in root.findall(".//nc:acl-list/nc:acl", ns):
-            mapping_type = acl.findtext("nc:acl-mapping-type", namespaces=ns)
-            if mapping_type == "group":
-                group = acl.findtext("nc:acl-mapping-id", namespaces=ns)
+        def parse_rules(response: ET.Element, list_tag: str) -> list[tuple[str, str, int]]:
+            rules = []
+            for acl in response.findall(f".//nc:{list_tag}/nc:acl", ns):
                 perms = acl.findtext("nc:acl-permissions", namespaces=ns)
-                if 'read' in self._get_permissions(int(perms) if perms and perms.isdigit() else 0):
-                    for user in self.usergroups.get(group, []):
-                        logger.debug(f"Adding user {user} from group {group} based on ACL")
-                        sharees.add(user)
-            elif mapping_type == "user":
-                user = acl.findtext("nc:acl-mapping-id", namespaces=ns)
-                perms = acl.findtext("nc:acl-permissions", namespaces=ns)
-                if 'read' in self._get_permissions(int(perms) if perms and perms.isdigit() else 0):
-                    logger.debug(f"Adding user {user} based on ACL")
-                    sharees.add(user)
-            else:
-                raise ValueError(f"Unsupported ACL mapping type: {mapping_type}")
+                rules.append((
+                    acl.findtext("nc:acl-mapping-type", namespaces=ns),
+                    acl.findtext("nc:acl-mapping-id", namespaces=ns),
+                    int(perms) if perms and perms.isdigit() else 0,
+                ))
+            return rules
 
-        # Inherited ACLs
-        for acl in root.findall(".//nc:inherited-acl-list/nc:acl", ns):
-            mapping_type = acl.findtext("nc:acl-mapping-type", namespaces=ns)
-            if mapping_type == "group":
-                group = acl.findtext("nc:acl-mapping-id", namespaces=ns)
-                perms = acl.findtext("nc:acl-permissions", namespaces=ns)
-                if 'read' in self._get_permissions(int(perms) if perms and perms.isdigit() else 0):
-                    for user in self.usergroups.get(group, []):
-                        logger.debug(f"Adding user {user} from group {group} based on inherited ACL")
-                        sharees.add(user)
-            elif mapping_type == "user":
-                user = acl.findtext("nc:acl-mapping-id", namespaces=ns)
-                perms = acl.findtext("nc:acl-permissions", namespaces=ns)
-                if 'read' in self._get_permissions(int(perms) if perms and perms.isdigit() else 0):
-                    logger.debug(f"Adding user {user} based on inherited ACL")
-                    sharees.add(user)
-            else:
-                raise ValueError(f"Unsupported ACL mapping type: {mapping_type}")
-        
-        return sharees
+        nodes = {}
+        for response in root.findall("d:response", ns):
+            href = unquote(response.findtext("d:href", default="", namespaces=ns))
+            if href.startswith(href_prefix):
+                href = href[len(href_prefix):]
+            nodes["/" + href.strip("/")] = (
+                parse_rules(response, "acl-list"),
+                parse_rules(response, "inherited-acl-list"),
+            )
+        logger.debug(f"Fetched ACLs of {len(nodes)} nodes under {path} (Depth: {depth})")
+        return nodes
 
     def _get_relative_path_in_groupfolder(self, path: Path, mount_point: str) -> str:
         """Extract the relative path within a groupfolder."""
@@ -460,8 +705,7 @@ class NextCloudConnector:
         p = path.relative_to(*path.parts[:2])
         path_str = str(p)
 
-        if not self.usergroups:
-            self.usergroups = await self.get_groups_membership()
+        usergroups = await self._get_usergroups()
 
         # Build list of candidate paths: the path itself + all its parents
         candidates: list[str] = []
@@ -475,32 +719,59 @@ class NextCloudConnector:
         unique_candidates = set(candidates)
 
         sharees = set()
-        url = NC_URL + "/ocs/v2.php/apps/files_sharing/api/v1/shares"
         for cand in unique_candidates:
-            async with httpx.AsyncClient(auth=self.nc_auth) as client:
-                resp = await client.get(
-                    url,
-                    headers=self.api_headers,
-                    params={"path": cand, "reshares": "true", "subfiles": "false"},
-                )
-
-            if resp.status_code != 200:
-                logger.error(f"Error fetching shares for path {cand}: {resp.status_code} {resp.text}")
-                continue
-
-            payload = resp.json()
-            data = payload.get("ocs", {}).get("data", [])
-
-            for share in data:
+            for share in await self._get_shares(cand):
                 share_with = share.get("share_with")
-                if share_with in self.usergroups:
-                    logger.debug(f"Share with group {share_with}, adding members: {self.usergroups[share_with]}")
-                    sharees.update(self.usergroups[share_with])
+                if share_with in usergroups:
+                    logger.debug(f"Share with group {share_with}, adding members: {usergroups[share_with]}")
+                    sharees.update(usergroups[share_with])
                 else:
                     sharees.add(share_with)
 
         return sharees
 
+    async def _get_shares(self, path: str) -> list[dict]:
+        """
+        Get the shares set directly on path (relative to the user root).
+
+        Shares are listed per parent folder with subfiles=true, so all
+        siblings are resolved by one request and ancestors are shared by every
+        file below them.
+        """
+        parent = str(Path(path).parent)
+        if parent not in ("", "."):
+            try:
+                by_path = await self._memoize("shares_folder", parent, lambda: self._fetch_folder_shares(parent))
+                return by_path.get(path.strip("/"), [])
+            except Exception as e:
+                logger.debug(f"Listing shares below {parent} failed, querying {path} directly: {e}")
+
+        try:
+            return await self._memoize("shares_path", path, lambda: self._fetch_shares(path, subfiles=False))
+        except Exception as e:
+            logger.error(str(e))
+            return []
+
+    async def _fetch_folder_shares(self, folder: str) -> dict[str, list[dict]]:
+        by_path: dict[str, list[dict]] = {}
+        for share in await self._fetch_shares(folder, subfiles=True):
+            by_path.setdefault(str(share.get("path", "")).strip("/"), []).append(share)
+        return by_path
+
+    async def _fetch_shares(self, path: str, subfiles: bool) -> list[dict]:
+        url = NC_URL + "/ocs/v2.php/apps/files_sharing/api/v1/shares"
+        resp = await self.http.get(
+            url,
+            headers=self.api_headers,
+            params={"path": path, "reshares": "true", "subfiles": "true" if subfiles else "false"},
+        )
+
+        if resp.status_code != 200:
+            raise RuntimeError(f"Error fetching shares for path {path}: {resp.status_code} {resp.text}")
+
+        payload = resp.json()
+        return payload.get("ocs", {}).get("data", []) or []
+
     # Activity API methods for incremental updates
     async def get_activities_since(self, since_activity_id: int, limit: int = 1000, retries: int = 3) -> dict:
         """
@@ -514,6 +785,42 @@ class NextCloudConnector:
         Returns:
             dict: Activity API response with activities and metadata
         """
+        data, _ = await self._get_activity_page(since_activity_id, limit, retries)
+        return data
+
+    async def iter_activity_pages(self, since_activity_id: int, page_size: int = 500, retries: int = 3):
+        """
+        Page through all activities newer than a given activity ID.
+
+        Follows the X-Activity-Last-Given cursor of the Activity API until no
+        more activities are returned, so bursts larger than one page are
+        consumed in a single run.
+
+        Args:
+            since_activity_id: The ID of the last processed activity
+            page_size: Maximum number of activities per page (default: 500)
+            retries: Number of retry attempts per page (default: 3)
+
+        Yields:
+            tuple[list[dict], int]: Activities of the page and the cursor to resume after it
+        """
+        cursor = since_activity_id
+        while True:
+            data, last_given = await self._get_activity_page(cursor, page_size, retries)
+            activities = data.get("ocs", {}).get("data", []) or []
+            if not activities:
+                return
+            if last_given is None:
+                last_given = max(a.get("activity_id", 0) for a in activities)
+
+            yield activities, last_given
+
+            if len(activities) < page_size or last_given <= cursor:
+                return
+            cursor = last_given
+
+    async def _get_activity_page(self, since_activity_id: int, limit: int, retries: int) -> tuple[dict, int | None]:
+        """Fetch one Activity API page, returning the response and its X-Activity-Last-Given cursor."""
         url = f"{NC_URL}/ocs/v2.php/apps/activity/api/v2/activity"
         params = {
             "since": since_activity_id,
@@ -522,31 +829,29 @@ class NextCloudConnector:
             # Removed "object_type": "files" filter as it excludes grouped activities
         }
         
-        auth = (NC_USER, NC_PASSWORD)
-        
         for attempt in range(retries + 1):
             try:
-                async with httpx.AsyncClient(auth=auth, timeout=30.0) as client:
-                    resp = await client.get(url, headers=self.api_headers, params=params)
+                resp = await self.http.get(url, headers=self.api_headers, params=params)
+                
+                if resp.status_code == 200:
+                    data = resp.json()
+                    activities = data.get("ocs", {}).get("data", [])
+                    logger.info(f"Retrieved {len(activities)} activities since ID {since_activity_id}")
+                    last_given = resp.headers.get("X-Activity-Last-Given")
+                    return data, int(last_given) if last_given and last_given.isdigit() else None
+                elif resp.status_code == 204:
+                    logger.info("No new activities found")
+                    return {"ocs": {"data": []}}, None
+                elif resp.status_code == 304:
+                    logger.info("No new activities (304 Not Modified)")
+                    return {"ocs": {"data": []}}, None
+                else:
+                    logger.warning(f"Activity API returned status {resp.status_code}: {resp.text}")
                     
-                    if resp.status_code == 200:
-                        data = resp.json()
-                        activities = data.get("ocs", {}).get("data", [])
-                        logger.info(f"Retrieved {len(activities)} activities since ID {since_activity_id}")
-                        return data
-                    elif resp.status_code == 204:
-                        logger.info("No new activities found")
-                        return {"ocs": {"data": []}}
-                    elif resp.status_code == 304:
-                        logger.info("No new activities (304 Not Modified)")
-                        return {"ocs": {"data": []}}
-                    else:
-                        logger.warning(f"Activity API returned status {resp.status_code}: {resp.text}")
+                    # Don't retry on client errors (4xx)
+                    if 400 <= resp.status_code < 500:
+                        raise Exception(f"Client error from Activity API: {resp.status_code} {resp.text}")
                         
-                        # Don't retry on client errors (4xx)
-                        if 400 <= resp.status_code < 500:
-                            raise Exception(f"Client error from Activity API: {resp.status_code} {resp.text}")
-                            
             except Exception as e:
                 logger.warning(f"Activity API attempt {attempt + 1}/{retries + 1} failed: {e}")
                 if attempt == retries:
@@ -554,7 +859,6 @@ class NextCloudConnector:
                     raise Exception(f"Failed to get activities after {retries + 1} attempts: {e}")
                     
                 # Wait before retrying (exponential backoff)
-                import asyncio
                 await asyncio.sleep(2 ** attempt)
         
         raise Exception("Unexpected error in activity retrieval")
@@ -577,36 +881,33 @@ class NextCloudConnector:
             # Removed "object_type": "files" filter as it excludes grouped activities
         }
         
-        auth = (NC_USER, NC_PASSWORD)
-        
         for attempt in range(retries + 1):
             try:
-                async with httpx.AsyncClient(auth=auth, timeout=30.0) as client:
-                    resp = await client.get(url, headers=self.api_headers, params=params)
-                    
-                    if resp.status_code == 200:
-                        data = resp.json()
-                        activities = data.get("ocs", {}).get("data", [])
-                        if activities:
-                            latest_id = activities[0].get("activity_id", 0)
-                            logger.info(f"Latest activity ID: {latest_id}")
-                            return latest_id
-                        else:
-                            logger.info("No activities found")
-                            return 0
-                    elif resp.status_code == 204:
+                resp = await self.http.get(url, headers=self.api_headers, params=params)
+                
+                if resp.status_code == 200:
+                    data = resp.json()
+                    activities = data.get("ocs", {}).get("data", [])
+                    if activities:
+                        latest_id = activities[0].get("activity_id", 0)
+                        logger.info(f"Latest activity ID: {latest_id}")
+                        return latest_id
+                    else:
                         logger.info("No activities found")
                         return 0
-                    elif resp.status_code == 304:
-                        logger.info("No activities found (304 Not Modified)")
-                        return 0
-                    else:
-                        logger.warning(f"Activity API returned status {resp.status_code}: {resp.text}")
+                elif resp.status_code == 204:
+                    logger.info("No activities found")
+                    return 0
+                elif resp.status_code == 304:
+                    logger.info("No activities found (304 Not Modified)")
+                    return 0
+                else:
+                    logger.warning(f"Activity API returned status {resp.status_code}: {resp.text}")
+                    
+                    # Don't retry on client errors (4xx)
+                    if 400 <= resp.status_code < 500:
+                        raise Exception(f"Client error from Activity API: {resp.status_code} {resp.text}")
                         
-                        # Don't retry on client errors (4xx)
-                        if 400 <= resp.status_code < 500:
-                            raise Exception(f"Client error from Activity API: {resp.status_code} {resp.text}")
-                            
             except Exception as e:
                 logger.warning(f"Latest activity ID attempt {attempt + 1}/{retries + 1} failed: {e}")
                 if attempt == retries:
@@ -614,7 +915,6 @@ class NextCloudConnector:
                     return 0  # Return 0 as fallback instead of raising
                     
                 # Wait before retrying (exponential backoff)
-                import asyncio
                 await asyncio.sleep(2 ** attempt)
         
         return 0  # Fallback
@@ -794,28 +1094,39 @@ class NextCloudConnector:
         # Otherwise, assume it's a directory
         return False
     
-    async def get_last_modified_user_async(self, fileID: str) -> str | None:
-        """
-        Get the username of the last user who modified a Nextcloud file.
+    async def get_last_modifiers(self, since_activity_id: int = 0, page_size: int = 500) -> dict[str, str]:
         """
-        headers = {"OCS-APIRequest": "true"}
+        Scan the activity stream once and map file IDs to their last modifying user.
 
-        async with httpx.AsyncClient(auth=self.nc_auth, headers=headers, timeout=15.0) as client:
-            activity_url = f"{NC_URL}/ocs/v2.php/apps/activity/api/v2/activity/filter"
-            params = {"format": "json", "object_type": "files", "object_id": fileID}
+        Replaces one activity filter request per file with a sequential pass
+        over the paged Activity API.
 
-            resp = await client.get(activity_url, params=params)
-            resp.raise_for_status()
-
-            data = resp.json()
-            activities = data.get("ocs", {}).get("data", [])
+        Args:
+            since_activity_id: Only consider activities after this ID (default: 0)
+            page_size: Maximum number of activities per page (default: 500)
 
-            # Step 3: Find the most recent modification activity
-            for event in sorted(activities, key=lambda x: x.get("timestamp", 0), reverse=True):
-                if event.get("type") in ("file_changed", "file_created"):
-                    return event.get("user")
+        Returns:
+            dict: file ID -> username of the newest file_created/file_changed activity
+        """
+        modifiers: dict[str, str] = {}
+        async for activities, _ in self.iter_activity_pages(since_activity_id, page_size=page_size):
+            self.collect_last_modifiers(activities, modifiers)
+        logger.info(f"Resolved last modifying user for {len(modifiers)} files from the activity stream")
+        return modifiers
 
-        return None
+    @staticmethod
+    def collect_last_modifiers(activities: list[dict], modifiers: dict[str, str]) -> dict[str, str]:
+        """Record the user of each file_created/file_changed activity in modifiers, newest last."""
+        for event in sorted(activities, key=lambda a: a.get("activity_id", 0)):
+            if event.get("type") not in ("file_changed", "file_created") or not event.get("user"):
+                continue
+            # Grouped activities list every affected file in "objects"
+            objects = event.get("objects")
+            file_ids = list(objects) if isinstance(objects, dict) and objects else [event.get("object_id")]
+            for file_id in file_ids:
+                if file_id:
+                    modifiers[str(file_id)] = event["user"]
+        return modifiers
 
 
     async def get_folder_file_id_simple(self, folder_path: str) -> str | None:
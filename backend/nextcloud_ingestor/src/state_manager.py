@@ -1,9 +1,10 @@
 import datetime
-from typing import Optional
+from typing import Iterable, Optional
+from sqlalchemy import and_, or_, func, insert
 from sqlalchemy.orm import Session
 from config import Config
-from database import create_database_engine, create_session_factory, create_tables, ActivityState
-from utils import logger
+from database import create_database_engine, create_session_factory, create_tables, ActivityState, IngestRun, IngestRunModifier, WorkItem, DeadLetter
+from ingest_utils import logger
 
 
 class StateManager:
@@ -82,6 +83,287 @@ class StateManager:
             logger.error(f"Failed to update activity state: {e}")
             raise
     
+    # Full ingest runs, dossier checkpoints and the sharded work queue
+    def create_ingest_run(
+        self,
+        items: list[tuple[str, str, str]],
+        mode: str = 'sharded',
+        index_suffix: Optional[str] = None,
+        last_modifiers: Optional[dict[str, str]] = None,
+        activity_id: Optional[int] = None,
+    ) -> int:
+        """
+        Create a run with one pending work item per (user, parent_path, dossier_name) and return its ID.
+
+        last_modifiers (file ID -> last modifying user) is stored with the run,
+        one row per file, so resumed runs and sharded workers do not scan the
+        activity stream again.
+        activity_id is the latest activity ID when the run started.
+        """
+        try:
+            with self.SessionFactory() as session:
+                run = IngestRun(
+                    mode=mode,
+                    status='running',
+                    index_suffix=index_suffix,
+                    activity_id=activity_id,
+                )
+                session.add(run)
+                session.flush()
+                if last_modifiers:
+                    session.execute(insert(IngestRunModifier), [
+                        {"run_id": run.id, "file_id": file_id, "user": user}
+                        for file_id, user in last_modifiers.items()
+                    ])
+                session.add_all(
+                    WorkItem(run_id=run.id, user=user, parent_path=parent_path, dossier_name=dossier_name)
+                    for user, parent_path, dossier_name in items
+                )
+                session.commit()
+                logger.info(f"Created ingest run {run.id} with {len(items)} work items")
+                return run.id
+        except Exception as e:
+            logger.error(f"Failed to create ingest run: {e}")
+            raise
+
+    def claim_work_item(self, worker_id: str, stale_after: datetime.timedelta, max_attempts: int) -> Optional[dict]:
+        """
+        Claim the next pending work item, or one whose worker stopped heartbeating.
+
+        Uses SELECT ... FOR UPDATE SKIP LOCKED so concurrent workers never
+        claim the same item. Returns None when nothing is claimable.
+        """
+        now = datetime.datetime.now(datetime.timezone.utc)
+        stale = and_(WorkItem.status == 'claimed', WorkItem.heartbeat_at < now - stale_after)
+        try:
+            with self.SessionFactory() as session:
+                # Abandoned items that used up their attempts will not be retried
+                session.query(WorkItem).filter(stale, WorkItem.attempts >= max_attempts).update(
+                    {"status": 'failed', "last_error": "worker stopped heartbeating"},
+                    synchronize_session=False,
+                )
+                item = (
+                    session.query(WorkItem)
+                    .join(IngestRun, IngestRun.id == WorkItem.run_id)
+                    .filter(IngestRun.status == 'running', IngestRun.mode == 'sharded')
+                    .filter(or_(WorkItem.status == 'pending', stale))
+                    .filter(WorkItem.attempts < max_attempts)
+                    .order_by(WorkItem.id)
+                    .with_for_update(of=WorkItem, skip_locked=True)
+                    .limit(1)
+                    .first()
+                )
+                if item is None:
+                    session.commit()
+                    return None
+                item.status = 'claimed'
+                item.worker_id = worker_id
+                item.attempts += 1
+                item.heartbeat_at = now
+                claimed = {
+                    "id": item.id,
+                    "run_id": item.run_id,
+                    "user": item.user,
+                    "parent_path": item.parent_path,
+                    "dossier_name": item.dossier_name,
+                    "attempts": item.attempts,
+                }
+                session.commit()
+                return claimed
+        except Exception as e:
+            logger.error(f"Failed to claim work item: {e}")
+            raise
+
+    def heartbeat_work_item(self, item_id: int, worker_id: str) -> bool:
+        """Extend a claim; returns False if the item was reclaimed by another worker."""
+        with self.SessionFactory() as session:
+            updated = session.query(WorkItem).filter(
+                WorkItem.id == item_id, WorkItem.worker_id == worker_id, WorkItem.status == 'claimed'
+            ).update({"heartbeat_at": datetime.datetime.now(datetime.timezone.utc)}, synchronize_session=False)
+            session.commit()
+            return updated > 0
+
+    def complete_work_item(self, item_id: int):
+        with self.SessionFactory() as session:
+            session.query(WorkItem).filter(WorkItem.id == item_id).update(
+                {"status": 'done', "last_error": None}, synchronize_session=False
+            )
+            session.commit()
+
+    def fail_work_item(self, item_id: int, error: str, max_attempts: int):
+        """Release a failed item for retry, or mark it failed once it used up its attempts."""
+        with self.SessionFactory() as session:
+            item = session.get(WorkItem, item_id)
+            if item is None:
+                return
+            item.status = 'failed' if item.attempts >= max_attempts else 'pending'
+            item.last_error = error[:2000]
+            item.worker_id = None
+            session.commit()
+
+    def get_run_progress(self, run_id: Optional[int] = None) -> dict[str, int]:
+        """Count work items per status, for one run or all running sharded runs."""
+        with self.SessionFactory() as session:
+            query = session.query(WorkItem.status, func.count(WorkItem.id))
+            if run_id is not None:
+                query = query.filter(WorkItem.run_id == run_id)
+            else:
+                query = query.join(IngestRun, IngestRun.id == WorkItem.run_id).filter(
+                    IngestRun.status == 'running', IngestRun.mode == 'sharded'
+                )
+            counts = {"pending": 0, "claimed": 0, "done": 0, "failed": 0}
+            counts.update(dict(query.group_by(WorkItem.status).all()))
+            return counts
+
+    def finish_ingest_runs(self) -> dict[int, str]:
+        """
+        Close running runs without pending or claimed items and return {run ID: status}.
+
+        A run is 'completed' only if none of its dossiers failed and no file
+        was dead-lettered; otherwise it is 'completed_with_errors' and can be
+        resumed to retry them.
+        """
+        with self.SessionFactory() as session:
+            open_items = session.query(WorkItem.id).filter(
+                WorkItem.run_id == IngestRun.id, WorkItem.status.in_(('pending', 'claimed'))
+            ).exists()
+            failed_items = session.query(WorkItem.id).filter(
+                WorkItem.run_id == IngestRun.id, WorkItem.status == 'failed'
+            ).exists()
+            dead_letters = session.query(DeadLetter.id).filter(DeadLetter.run_id == IngestRun.id).exists()
+            runs = session.query(IngestRun, failed_items | dead_letters).filter(
+                IngestRun.status == 'running', ~open_items
+            ).all()
+            finished = {}
+            for run, has_errors in runs:
+                run.status = 'completed_with_errors' if has_errors else 'completed'
+                run.finished_at = datetime.datetime.now(datetime.timezone.utc)
+                finished[run.id] = run.status
+            session.commit()
+            return finished
+
+    def get_resumable_run(self, mode: str = 'full') -> Optional[dict]:
+        """
+        Return the most recent run of the given mode if it can be resumed.
+
+        That is a run that is still running, or one that completed with errors
+        and has failed dossiers or dead letters to retry. The run is returned
+        as its id, index_suffix, status and start activity_id.
+        """
+        with self.SessionFactory() as session:
+            run = (
+                session.query(IngestRun)
+                .filter(IngestRun.mode == mode)
+                .order_by(IngestRun.id.desc())
+                .first()
+            )
+            if run is None or run.status not in ('running', 'completed_with_errors'):
+                return None
+            return {"id": run.id, "index_suffix": run.index_suffix, "status": run.status, "activity_id": run.activity_id}
+
+    def reopen_ingest_run(self, run_id: int) -> int:
+        """
+        Set a run that completed with errors running again, to retry its failures.
+
+        Failed dossiers and dossiers with dead-lettered files become pending
+        with fresh attempts. The run's dead letters are removed; files that
+        fail again are recorded anew. Returns the number of requeued dossiers.
+        """
+        with self.SessionFactory() as session:
+            run = session.get(IngestRun, run_id)
+            if run is None:
+                return 0
+            dead_paths = [path for (path,) in session.query(DeadLetter.path).filter(DeadLetter.run_id == run_id)]
+            requeued = 0
+            for item in session.query(WorkItem).filter(WorkItem.run_id == run_id, WorkItem.status.in_(('done', 'failed'))):
+                prefix = f"{item.parent_path.rstrip('/')}/{item.dossier_name}/"
+                if item.status == 'failed' or any(path.startswith(prefix) for path in dead_paths):
+                    item.status = 'pending'
+                    item.attempts = 0
+                    item.last_error = None
+                    requeued += 1
+            session.query(DeadLetter).filter(DeadLetter.run_id == run_id).delete(synchronize_session=False)
+            run.status = 'running'
+            run.finished_at = None
+            session.commit()
+            return requeued
+
+    def get_run_last_modifiers(self, run_id: int, file_ids: Iterable[str]) -> dict[str, str]:
+        """Return the last modifying users stored with a run for the given file IDs."""
+        ids = list(dict.fromkeys(str(file_id) for file_id in file_ids if file_id))
+        modifiers: dict[str, str] = {}
+        with self.SessionFactory() as session:
+            # Bounded IN lists, within SQLite's host parameter limit
+            for start in range(0, len(ids), 500):
+                modifiers.update(
+                    session.query(IngestRunModifier.file_id, IngestRunModifier.user)
+                    .filter(IngestRunModifier.run_id == run_id, IngestRunModifier.file_id.in_(ids[start:start + 500]))
+                    .all()
+                )
+        return modifiers
+
+    def get_open_work_items(self, run_id: int) -> list[dict]:
+        """
+        Return the dossiers of a run that are not done yet, marking them claimed.
+
+        Claims left behind by a crashed process are taken over as well.
+        """
+        now = datetime.datetime.now(datetime.timezone.utc)
+        with self.SessionFactory() as session:
+            items = (
+                session.query(WorkItem)
+                .filter(WorkItem.run_id == run_id, WorkItem.status.in_(('pending', 'claimed')))
+                .order_by(WorkItem.id)
+                .all()
+            )
+            open_items = []
+            for item in items:
+                item.status = 'claimed'
+                item.attempts += 1
+                item.heartbeat_at = now
+                open_items.append({
+                    "id": item.id,
+                    "run_id": item.run_id,
+                    "user": item.user,
+                    "parent_path": item.parent_path,
+                    "dossier_name": item.dossier_name,
+                    "attempts": item.attempts,
+                })
+            session.commit()
+            return open_items
+
+    def add_run_progress(self, run_id: int, indexed: int, failed: int):
+        """Add the outcome of one flushed document batch to the run's counters."""
+        with self.SessionFactory() as session:
+            session.query(IngestRun).filter(IngestRun.id == run_id).update(
+                {
+                    "documents_indexed": IngestRun.documents_indexed + indexed,
+                    "documents_failed": IngestRun.documents_failed + failed,
+                },
+                synchronize_session=False,
+            )
+            session.commit()
+
+    def add_dead_letters(self, run_id: Optional[int], entries: list[dict]):
+        """Record files that failed to ingest; entries have user, path, nextcloud_id and error."""
+        if not entries:
+            return
+        try:
+            with self.SessionFactory() as session:
+                session.add_all(
+                    DeadLetter(
+                        run_id=run_id,
+                        user=entry.get("user"),
+                        path=entry["path"],
+                        nextcloud_id=entry.get("nextcloud_id"),
+                        error=str(entry["error"])[:2000],
+                    )
+                    for entry in entries
+                )
+                session.commit()
+        except Exception as e:
+            logger.error(f"Failed to record {len(entries)} dead letters: {e}")
+
     def close(self):
         """Close the database engine (cleanup resources)."""
         if hasattr(self, 'engine') and self.engine:
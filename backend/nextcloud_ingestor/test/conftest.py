@@ -0,0 +1,85 @@
+"""Shared fixtures for the ingestor tests."""
+
+import io
+import pytest
+from unittest.mock import AsyncMock, MagicMock
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from nextcloud_ingestor.src.ingestor import Ingestor
+from nextcloud_ingestor.src.state_manager import StateManager
+
+
+@pytest.fixture
+def state_manager(tmp_path):
+    """StateManager on a SQLite database file of its own, with regular connection pooling."""
+    sm = StateManager.__new__(StateManager)
+    sm.engine = create_engine(f"sqlite:///{tmp_path / 'state.db'}")
+    sm.SessionFactory = sessionmaker(bind=sm.engine)
+    sm.initialize_schema()
+    yield sm
+    sm.engine.dispose()
+
+
+@pytest.fixture
+def make_nc():
+    """Build a Nextcloud client mock with one user, the given dossiers and text files in each."""
+
+    def make(dossiers: list[str], files_per_dossier: int = 3) -> MagicMock:
+        nc = MagicMock()
+        nc.list_users = AsyncMock(return_value=["user1"])
+        nc.get_sharees = AsyncMock(side_effect=lambda path: set())
+        nc.get_last_modifiers = AsyncMock(return_value={})
+        nc.get_latest_activity_id = AsyncMock(return_value=0)
+        nc.aclose = AsyncMock()
+        nc.download = MagicMock(side_effect=lambda path: (io.BytesIO(b"text"), "sha"))
+
+        def walk_tree(path, depth="infinity"):
+            if depth == "1":
+                return [{"path": path, "is_dir": True}] + [
+                    {"path": f"{path}/{name}", "is_dir": True} for name in dossiers
+                ]
+            name = path.rsplit("/", 1)[-1]
+            return [{"path": path, "is_dir": True, "fileid": name, "etag": None}] + [
+                {"path": f"{path}/file{i}.txt", "is_dir": False, "fileid": f"{name}-{i}", "size": "4",
+                 "created": "", "modified": "", "type": "text/plain", "etag": f"e{i}"}
+                for i in range(files_per_dossier)
+            ]
+
+        nc.walk_tree.side_effect = walk_tree
+        return nc
+
+    return make
+
+
+@pytest.fixture
+def make_es():
+    """Build an ESClient mock without indexed documents that accepts every bulk request."""
+
+    def make() -> MagicMock:
+        es = MagicMock()
+        es.get_fingerprints.return_value = {}
+        es.do_index_documents.side_effect = lambda docs: (len(docs), [])
+        return es
+
+    return make
+
+
+@pytest.fixture
+def make_ingestor():
+    """Build an Ingestor whose extractor returns "text"; unspecified collaborators are mocks."""
+
+    def make(config, nc=None, es=None, state_manager=None, embedder=None) -> Ingestor:
+        if nc is None:
+            nc = MagicMock()
+            nc.aclose = AsyncMock()
+        if state_manager is None:
+            state_manager = MagicMock()
+        state_manager.close = MagicMock()
+        extractor = MagicMock()
+        extractor.extract.return_value = "text"
+        return Ingestor(
+            config, nc=nc, es=es or MagicMock(), extractor=extractor, state_manager=state_manager,
+            embedder=embedder or MagicMock(),
+        )
+
+    return make
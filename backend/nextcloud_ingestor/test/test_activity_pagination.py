@@ -0,0 +1,140 @@
+"""
+Tests for cursor-based Activity API paging.
+
+This module tests that NextCloudConnector.iter_activity_pages follows the
+X-Activity-Last-Given cursor across pages, that last modifying users are
+resolved from one activity scan, and that run_incremental_ingest
+checkpoints the activity state after every processed batch.
+"""
+
+import pytest
+from unittest.mock import AsyncMock, MagicMock
+from nextcloud_ingestor.src.config import Config
+from nextcloud_ingestor.src.ingestor import Ingestor
+from nextcloud_ingestor.src.nextcloud import NextCloudConnector
+
+
+def _activities(*ids: int) -> list[dict]:
+    return [
+        {"activity_id": i, "type": "file_created", "object_type": "files",
+         "object_name": f"/dossiers/D1/file{i}.txt"}
+        for i in ids
+    ]
+
+
+def _page(activities: list[dict], last_given: int | None = None):
+    resp = MagicMock()
+    resp.status_code = 200
+    resp.json.return_value = {"ocs": {"data": activities}}
+    resp.headers = {"X-Activity-Last-Given": str(last_given)} if last_given else {}
+    return resp
+
+
+class TestActivityPagination:
+    """Test cases for paging through activities."""
+
+    @pytest.mark.asyncio
+    async def test_pages_follow_last_given_cursor(self):
+        nc = NextCloudConnector()
+        nc._http = MagicMock(is_closed=False)
+        nc._http.get = AsyncMock(side_effect=[
+            _page(_activities(11, 12), last_given=12),
+            _page(_activities(13, 14), last_given=14),
+            _page(_activities(15)),
+        ])
+
+        pages = [page async for page in nc.iter_activity_pages(10, page_size=2)]
+
+        assert [[a["activity_id"] for a in acts] for acts, _ in pages] == [[11, 12], [13, 14], [15]]
+        assert [cursor for _, cursor in pages] == [12, 14, 15]
+        sent = [call.kwargs["params"]["since"] for call in nc._http.get.await_args_list]
+        assert sent == [10, 12, 14]
+
+    @pytest.mark.asyncio
+    async def test_last_modifiers_from_one_activity_scan(self):
+        nc = NextCloudConnector()
+        nc._http = MagicMock(is_closed=False)
+        nc._http.get = AsyncMock(side_effect=[
+            _page([
+                {"activity_id": 1, "type": "file_created", "user": "alice", "object_id": 7},
+                {"activity_id": 2, "type": "file_changed", "user": "bob",
+                 "object_id": 8, "objects": {"8": "/a.txt", "9": "/b.txt"}},
+            ], last_given=2),
+            _page([
+                {"activity_id": 3, "type": "file_changed", "user": "carol", "object_id": 7},
+                {"activity_id": 4, "type": "shared_with_by", "user": "dave", "object_id": 9},
+            ], last_given=4),
+            _page([]),
+        ])
+
+        modifiers = await nc.get_last_modifiers(page_size=2)
+
+        assert modifiers == {"7": "carol", "8": "bob", "9": "bob"}
+        assert nc._http.get.await_count == 3
+
+
+class TestIncrementalCheckpoints:
+    """Test that incremental ingest checkpoints after each batch."""
+
+    @pytest.fixture
+    def config(self):
+        return Config(
+            nextcloud_url="https://test.nextcloud.com",
+            nextcloud_admin_username="admin",
+            nextcloud_admin_password="password",
+            dossier_parent_path="dossiers",
+            activity_page_size=2,
+        )
+
+    def _ingestor(self, config, pages) -> Ingestor:
+        async def iter_activity_pages(since, page_size):
+            assert page_size == config.activity_page_size
+            for page in pages:
+                if isinstance(page, Exception):
+                    raise page
+                yield page
+
+        nc = MagicMock()
+        nc.iter_activity_pages = iter_activity_pages
+        nc.filter_file_activities = AsyncMock(side_effect=lambda acts: acts)
+        nc.extract_file_paths_from_activities = AsyncMock(side_effect=lambda acts: {
+            "created": {a["object_name"] for a in acts}, "updated": set(), "deleted": set(),
+        })
+        nc.aclose = AsyncMock()
+        state = MagicMock()
+        state.get_last_activity_state.return_value = (10, None)
+
+        ingestor = Ingestor(config, nc=nc, es=MagicMock(), extractor=MagicMock(), state_manager=state)
+        ingestor._process_new_dossiers = AsyncMock()
+        ingestor._process_changed_files = AsyncMock()
+        return ingestor
+
+    @pytest.mark.asyncio
+    async def test_each_batch_is_checkpointed(self, config):
+        ingestor = self._ingestor(config, [
+            (_activities(9, 11), 11),
+            (_activities(12, 13), 13),
+            (_activities(14), 14),
+        ])
+
+        await ingestor.run_incremental_ingest(fallback_to_full=False)
+
+        checkpoints = [call.args[0] for call in ingestor.state_manager.update_activity_state.call_args_list]
+        assert checkpoints == [11, 13, 14]
+        processed = [call.args[0] for call in ingestor._process_changed_files.await_args_list]
+        # Activity 9 was already processed by a previous run
+        assert processed[0] == {"/dossiers/D1/file11.txt"}
+        assert len(processed) == 3
+
+    @pytest.mark.asyncio
+    async def test_failure_keeps_committed_batches(self, config):
+        ingestor = self._ingestor(config, [
+            (_activities(11, 12), 12),
+            RuntimeError("activity API unavailable"),
+        ])
+
+        with pytest.raises(RuntimeError):
+            await ingestor.run_incremental_ingest(fallback_to_full=False)
+
+        ingestor.state_manager.update_activity_state.assert_called_once_with(12)
+        ingestor.state_manager.close.assert_called_once()
@@ -0,0 +1,68 @@
+"""
+Tests for blue/green reindexing.
+
+This module tests that ESClient.begin_reindex creates versioned indices
+tuned for bulk loading and directs writes to them, and that finish_reindex
+restores the search settings and swaps both aliases in one request.
+"""
+
+import pytest
+from unittest.mock import MagicMock
+from nextcloud_ingestor.src import elastic
+from nextcloud_ingestor.src.elastic import ESClient
+
+
+@pytest.fixture
+def client():
+    es = ESClient(dry_run=True)
+    es.dry_run = False
+    es.es = MagicMock()
+    es.es.options.return_value = es.es
+    es.es.cluster.health.return_value = {"status": "green", "timed_out": False}
+    return es
+
+
+class TestAliasSwap:
+    """Test cases for ESClient.begin_reindex and finish_reindex."""
+
+    def test_begin_reindex_creates_bulk_load_indices(self, client):
+        client.es.indices.exists.return_value = False
+
+        suffix = client.begin_reindex("20240101000000")
+
+        assert suffix == "20240101000000"
+        assert client.index_docs == f"{elastic.ES_INDEX_DOCUMENTS}-20240101000000"
+        assert client.index_dossiers == f"{elastic.ES_INDEX_DOSSIERS}-20240101000000"
+        created = {call.kwargs["index"]: call.kwargs["body"] for call in client.es.indices.create.call_args_list}
+        assert set(created) == {client.index_docs, client.index_dossiers}
+        for body in created.values():
+            assert body["settings"]["index"]["refresh_interval"] == "-1"
+            assert body["settings"]["index"]["number_of_replicas"] == 0
+        assert client.get_fingerprints(["1"]) is not None
+        assert client.es.mget.call_args.kwargs["index"] == client.index_docs
+
+    def test_finish_reindex_swaps_aliases_atomically(self, client):
+        client.es.indices.exists.return_value = False
+        client.begin_reindex("new")
+        docs_index, dossiers_index = client.index_docs, client.index_dossiers
+        # documents is behind an alias already, dossiers is still a concrete index
+        client.es.indices.exists_alias.side_effect = lambda name: name == elastic.ES_INDEX_DOCUMENTS
+        client.es.indices.get_alias.return_value = {f"{elastic.ES_INDEX_DOCUMENTS}-old": {}}
+        client.es.indices.exists.return_value = True
+
+        client.finish_reindex()
+
+        settings = [call.kwargs for call in client.es.indices.put_settings.call_args_list]
+        assert [s["index"] for s in settings] == [docs_index, dossiers_index]
+        assert all(s["settings"]["index"]["refresh_interval"] == elastic.ES_REFRESH_INTERVAL for s in settings)
+        assert client.es.indices.forcemerge.call_count == 2
+        client.es.indices.update_aliases.assert_called_once_with(actions=[
+            {"remove": {"index": f"{elastic.ES_INDEX_DOCUMENTS}-old", "alias": elastic.ES_INDEX_DOCUMENTS}},
+            {"add": {"index": docs_index, "alias": elastic.ES_INDEX_DOCUMENTS}},
+            {"remove_index": {"index": elastic.ES_INDEX_DOSSIERS}},
+            {"add": {"index": dossiers_index, "alias": elastic.ES_INDEX_DOSSIERS}},
+        ])
+        client.es.indices.delete.assert_called_once_with(
+            index=f"{elastic.ES_INDEX_DOCUMENTS}-old", ignore_unavailable=True
+        )
+        assert (client.index_docs, client.index_dossiers) == (elastic.ES_INDEX_DOCUMENTS, elastic.ES_INDEX_DOSSIERS)
@@ -0,0 +1,180 @@
+"""
+Tests for the paragraph chunk index.
+
+This module tests that indexed documents are split into paragraph chunks
+carrying the document's dossier and access list, that chunk texts are
+embedded in batches through the embedder's bulk_embed, that documents
+skipped as unchanged are chunked from their stored paragraphs, that the shared
+LLMClient is picked up as the default embedder, and that ESClient
+replaces, deletes and re-permissions chunks together with their documents.
+"""
+
+import dataclasses
+import importlib
+import pytest
+from pathlib import Path
+from unittest.mock import AsyncMock, MagicMock, patch
+from nextcloud_ingestor.src import elastic
+from nextcloud_ingestor.src.elastic import ESClient
+from nextcloud_ingestor.src.ingestor import Ingestor
+from nextcloud_ingestor.src.ingest_utils import hash
+
+
+@pytest.fixture
+def chunk_config():
+    from nextcloud_ingestor.src.config import Config
+    return Config(
+        nextcloud_url="https://test.nextcloud.com",
+        nextcloud_admin_username="admin",
+        nextcloud_admin_password="password",
+        dossier_parent_path="dossiers",
+        chunk_index=True,
+        chunk_size=20,
+        embed_batch_size=2,
+    )
+
+
+def _doc(nextcloud_id: str, *paragraphs: str) -> dict:
+    return {
+        "nextcloud_id": nextcloud_id,
+        "title": "notes.txt",
+        "filepath": "/user1/dossiers/A/notes.txt",
+        "dossier_id": "user1-A",
+        "accessible_to_users": ["user1", "user2"],
+        "paragraphs": [{"id": i, "text": text} for i, text in enumerate(paragraphs)],
+    }
+
+
+class TestChunkBuilding:
+    """Test cases for Ingestor._build_chunks and _index_chunks."""
+
+    def test_paragraphs_are_packed_into_chunks(self, chunk_config, state_manager, make_nc, make_es, make_ingestor):
+        ingestor = make_ingestor(chunk_config, make_nc([]), make_es(), state_manager)
+
+        chunks = ingestor._build_chunks(_doc("7", "short one", "short two", "a paragraph that is far too long"))
+
+        assert [c["chunk_text"] for c in chunks] == [
+            "short one\n\nshort two", "a paragraph that is", "far too long",
+        ]
+        assert [c["chunk_id"] for c in chunks] == [f"{hash('7')}-{i}" for i in range(3)]
+        assert all(c["dossier_id"] == "user1-A" for c in chunks)
+        assert all(c["accessible_to_users"] == ["user1", "user2"] for c in chunks)
+
+    @pytest.mark.asyncio
+    async def test_full_ingest_embeds_chunks_in_batches(self, chunk_config, state_manager, make_nc, make_es, make_ingestor):
+        config = dataclasses.replace(chunk_config, chunk_size=1500)
+        es = make_es()
+        es.do_index_chunks.side_effect = lambda ids, chunks: (len(chunks), [])
+        embedder = MagicMock()
+        embedder.bulk_embed = AsyncMock(side_effect=lambda texts: [[float(len(t))] for t in texts])
+
+        ingestor = make_ingestor(config, make_nc(["A"], files_per_dossier=3), es, state_manager, embedder)
+        await ingestor.run_full_ingest()
+
+        assert [len(call.args[0]) for call in embedder.bulk_embed.await_args_list] == [2, 1]
+        (ids, chunks), _ = es.do_index_chunks.call_args
+        assert sorted(ids) == ["A-0", "A-1", "A-2"]
+        assert all(c["embedding"] == [float(len(c["chunk_text"]))] for c in chunks)
+        assert ingestor.progress()["chunks"] == 3
+
+    @pytest.mark.asyncio
+    async def test_embedding_failure_keeps_documents(self, chunk_config, state_manager, make_nc, make_es, make_ingestor):
+        es = make_es()
+        embedder = MagicMock()
+        embedder.bulk_embed = AsyncMock(side_effect=RuntimeError("rate limited"))
+
+        ingestor = make_ingestor(chunk_config, make_nc(["A"], files_per_dossier=2), es, state_manager, embedder)
+        await ingestor.run_full_ingest()
+
+        es.do_index_chunks.assert_not_called()
+        assert ingestor._index_stats["indexed"] == 2
+
+    @pytest.mark.asyncio
+    async def test_unchanged_documents_without_chunks_are_chunked(self, chunk_config, state_manager, make_nc, make_es, make_ingestor):
+        nc = make_nc(["A"], files_per_dossier=2)
+        es = make_es()
+        es.get_fingerprints.return_value = {
+            f"A-{i}": {"etag": f"e{i}", "accessible_to_users": ["user1"]} for i in range(2)
+        }
+        es.get_unchunked_documents.return_value = [_doc("A-1", "stored paragraph")]
+        es.do_index_chunks.side_effect = lambda ids, chunks: (len(chunks), [])
+        embedder = MagicMock()
+        embedder.bulk_embed = AsyncMock(side_effect=lambda texts: [[1.0] for _ in texts])
+
+        ingestor = make_ingestor(chunk_config, nc, es, state_manager, embedder)
+        await ingestor.run_full_ingest()
+
+        nc.download.assert_not_called()
+        assert sorted(es.get_unchunked_documents.call_args.args[0]) == ["A-0", "A-1"]
+        (ids, chunks), _ = es.do_index_chunks.call_args
+        assert ids == ["A-1"]
+        assert [c["chunk_text"] for c in chunks] == ["stored paragraph"]
+
+
+class TestDefaultEmbedder:
+    """Test that the ingestor imports the shared LLMClient as its embedder."""
+
+    def test_shared_llm_client_is_importable(self, chunk_config, state_manager, monkeypatch, make_nc, make_es):
+        monkeypatch.syspath_prepend(str(Path(__file__).parents[2] / "shared" / "src"))
+        # The ingestor's own modules must not shadow the shared utils package
+        assert importlib.import_module("utils.logging.logger").logger
+        for module in ("langchain_openai", "langchain_mistralai", "transformers"):
+            pytest.importorskip(module)
+        from llm.llm_client import LLMClient
+
+        with patch.object(LLMClient, "__init__", return_value=None):
+            ingestor = Ingestor(
+                chunk_config, nc=make_nc([]), es=make_es(), extractor=MagicMock(), state_manager=state_manager,
+            )
+
+        assert isinstance(ingestor.embedder, LLMClient)
+
+
+class TestChunkStorage:
+    """Test cases for the chunk index in ESClient."""
+
+    @pytest.fixture
+    def client(self):
+        es = ESClient(dry_run=True, chunks=True)
+        es.dry_run = False
+        es.es = MagicMock()
+        return es
+
+    def test_index_chunks_replaces_chunks_of_documents(self, client):
+        with patch.object(elastic.helpers, "streaming_bulk", side_effect=lambda es, actions, **kw: [
+            (True, {"index": {"_id": a["_id"]}}) for a in actions
+        ]) as bulk:
+            indexed, failed = client.do_index_chunks(["7"], [{"chunk_id": "c-0", "nextcloud_id": "7"}])
+
+        assert (indexed, failed) == (1, [])
+        query = client.es.delete_by_query.call_args.kwargs
+        assert query["index"] == elastic.ES_INDEX_CHUNKS
+        assert query["body"] == {"query": {"terms": {"nextcloud_id": ["7"]}}}
+        assert bulk.called
+
+    def test_unchunked_documents_are_read_from_the_documents_index(self, client):
+        client.es.search.return_value = {"aggregations": {"chunked": {"buckets": [{"key": "7"}]}}}
+        client.es.mget.return_value = {"docs": [
+            {"found": True, "_source": _doc("8", "text")},
+            {"found": True, "_source": _doc("9")},
+        ]}
+
+        docs = client.get_unchunked_documents(["7", "8", "9"])
+
+        assert [d["nextcloud_id"] for d in docs] == ["8"]
+        assert client.es.search.call_args.kwargs["index"] == elastic.ES_INDEX_CHUNKS
+        assert client.es.mget.call_args.kwargs["ids"] == [hash("8"), hash("9")]
+
+    def test_acl_updates_and_deletes_reach_chunks(self, client):
+        client.es.delete_by_query.return_value = {"deleted": 1}
+
+        with patch.object(elastic.helpers, "bulk"):
+            client.update_document_fields([{"nextcloud_id": "7", "accessible_to_users": ["user1"]}])
+        client.delete_documents_by_path({"/user1/dossiers/A/notes.txt"}, refresh=False)
+
+        body = client.es.update_by_query.call_args.kwargs["body"]
+        assert client.es.update_by_query.call_args.kwargs["index"] == elastic.ES_INDEX_CHUNKS
+        assert body["script"]["params"] == {"acl": {"7": ["user1"]}}
+        assert [c.kwargs["index"] for c in client.es.delete_by_query.call_args_list] == [
+            elastic.ES_INDEX_DOCUMENTS, elastic.ES_INDEX_CHUNKS,
+        ]
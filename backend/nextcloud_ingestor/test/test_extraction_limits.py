@@ -0,0 +1,86 @@
+"""
+Tests for bounded content extraction.
+
+This module tests that ContentExtractor streams content to Tika with the
+per-extension timeout, skips files above the per-extension size limit,
+falls back to isolated PyMuPDF extraction for PDFs and records metrics
+per file type.
+"""
+
+import io
+import time
+import pytest
+import requests
+from unittest.mock import MagicMock, patch
+from nextcloud_ingestor.src import content
+from nextcloud_ingestor.src.content import ContentExtractor
+
+
+# Fallback process targets; module-level so the fork server can import them
+def _hanging_pdf_worker(content: bytes, conn):
+    time.sleep(60)
+
+
+def _answering_pdf_worker(content: bytes, conn):
+    conn.send((True, "pdf text"))
+    conn.close()
+
+
+class TestExtractionLimits:
+    """Test cases for ContentExtractor limits and fallbacks."""
+
+    @pytest.fixture
+    def extractor(self):
+        extractor = ContentExtractor("http://tika:9998/")
+        extractor._session = MagicMock()
+        return extractor
+
+    def test_streams_file_to_tika_with_extension_timeout(self, extractor):
+        extractor._session.put.return_value = MagicMock(text="  slide text \n")
+        stream = io.BytesIO(b"pptx bytes")
+
+        assert extractor.extract("deck.pptx", stream) == "slide text"
+
+        args, kwargs = extractor._session.put.call_args
+        assert args == ("http://tika:9998/tika",)
+        assert kwargs["data"].stream is stream
+        assert len(kwargs["data"]) == len(b"pptx bytes")
+        assert kwargs["timeout"] == (content.TIKA_CONNECT_TIMEOUT, content.EXTRACT_LIMITS[".pptx"][0])
+        assert extractor.metrics()[".pptx"]["files"] == 1
+
+    def test_oversized_files_are_skipped(self, extractor):
+        with patch.dict(content.EXTRACT_LIMITS, {".docx": (60, 4)}):
+            assert extractor.extract("big.docx", b"12345") == ""
+
+        extractor._session.put.assert_not_called()
+        assert extractor.metrics()[".docx"]["too_large"] == 1
+
+    def test_pdf_falls_back_to_pymupdf_on_tika_timeout(self, extractor):
+        extractor._session.put.side_effect = requests.Timeout()
+        extractor._extract_pdf_isolated = MagicMock(return_value="pdf text")
+
+        assert extractor.extract("report.pdf", b"%PDF-1.7") == "pdf text"
+
+        extractor._extract_pdf_isolated.assert_called_once_with(
+            "report.pdf", b"%PDF-1.7", content.EXTRACT_LIMITS[".pdf"][0]
+        )
+        metrics = extractor.metrics()[".pdf"]
+        assert metrics["timeouts"] == 1
+        assert metrics["fallback"] == 1
+
+    def test_plain_text_does_not_call_tika(self, extractor):
+        assert extractor.extract("notes.md", "héllo".encode()) == "héllo"
+        extractor._session.put.assert_not_called()
+
+    def test_hung_pdf_fallback_is_killed(self, extractor, monkeypatch):
+        monkeypatch.setattr(content, "_pdf_worker", _hanging_pdf_worker)
+
+        started = time.monotonic()
+        assert extractor._extract_pdf_isolated("hung.pdf", b"%PDF-1.7", 0.5) == ""
+        assert time.monotonic() - started < 10
+        assert extractor.metrics()[".pdf"]["timeouts"] == 1
+        assert not extractor._pdf_processes
+
+        # The fallback slot is free again for the next PDF
+        monkeypatch.setattr(content, "_pdf_worker", _answering_pdf_worker)
+        assert extractor._extract_pdf_isolated("ok.pdf", b"%PDF-1.7", 10) == "pdf text"
@@ -5,6 +5,7 @@ This module tests the complete workflow from file content extraction
 through to Elasticsearch indexing to ensure full_text is properly stored.
 """
 
+import io
 import pytest
 import tempfile
 import os
@@ -69,7 +70,9 @@ And this is the third paragraph that should also be extracted properly."""
             
             # Setup mocks
             mock_nc = AsyncMock()
-            mock_nc.read_file.return_value = b"This is test content for document building.\n\nWith multiple paragraphs."
+            mock_nc.download.return_value = (
+                io.BytesIO(b"This is test content for document building.\n\nWith multiple paragraphs."), "sha"
+            )
             mock_nc.get_metadata.return_value = {
                 "fileid": "12345",
                 "size": "1024",
@@ -0,0 +1,116 @@
+"""
+Tests for batched incremental Elasticsearch updates.
+
+This module tests that deleted and changed files are resolved with one
+terms query instead of a search per file, and that dossier statistics are
+aggregated per dossier and applied with a single update_by_query and
+refresh per activity batch.
+"""
+
+import pytest
+from unittest.mock import AsyncMock, MagicMock
+from nextcloud_ingestor.src.config import Config
+from nextcloud_ingestor.src.elastic import ESClient
+from nextcloud_ingestor.src.ingestor import Ingestor
+
+
+@pytest.fixture
+def es_client():
+    client = ESClient(dry_run=True)
+    client.dry_run = False
+    client.es = MagicMock()
+    return client
+
+
+class TestESBatchUpdates:
+    """Test cases for the batched ESClient methods."""
+
+    def test_delete_uses_single_terms_query(self, es_client):
+        es_client.es.delete_by_query.return_value = {"deleted": 3}
+
+        deleted = es_client.delete_documents_by_path({"a.txt", "b.txt", "c.txt"}, refresh=False)
+
+        assert deleted == 3
+        es_client.es.delete_by_query.assert_called_once()
+        kwargs = es_client.es.delete_by_query.call_args.kwargs
+        assert sorted(kwargs["body"]["query"]["terms"]["filepath.keyword"]) == ["a.txt", "b.txt", "c.txt"]
+        assert kwargs["refresh"] is False
+        es_client.es.indices.refresh.assert_not_called()
+
+    def test_dossier_stats_applied_in_one_request(self, es_client):
+        es_client.apply_dossier_stats({"d1": (-2, -300), "d2": (1, 50), "d3": (0, 0)})
+
+        es_client.es.update_by_query.assert_called_once()
+        body = es_client.es.update_by_query.call_args.kwargs["body"]
+        assert sorted(body["query"]["terms"]["dossier_id.keyword"]) == ["d1", "d2"]
+        assert body["script"]["params"]["deltas"] == {"d1": [-2, -300], "d2": [1, 50]}
+        es_client.es.indices.refresh.assert_called_once()
+
+    def test_empty_deltas_still_refresh(self, es_client):
+        # A delete-only batch defers its refresh to apply_dossier_stats
+        es_client.apply_dossier_stats({"d1": (0, 0)})
+
+        es_client.es.update_by_query.assert_not_called()
+        es_client.es.indices.refresh.assert_called_once()
+
+
+class TestIncrementalStatDeltas:
+    """Test that the ingestor aggregates dossier stat deltas per batch."""
+
+    @pytest.mark.asyncio
+    async def test_deltas_are_aggregated_per_dossier(self):
+        config = Config(
+            nextcloud_url="https://test.nextcloud.com",
+            nextcloud_admin_username="admin",
+            nextcloud_admin_password="password",
+            dossier_parent_path="dossiers",
+        )
+        deleted = {f"dossiers/D1/old{i}.txt" for i in range(500)} | {"dossiers/D2/x.txt"}
+        nc = MagicMock()
+        nc.filter_file_activities = AsyncMock(side_effect=lambda acts: acts)
+        nc.extract_file_paths_from_activities = AsyncMock(return_value={
+            "created": set(), "updated": set(), "deleted": deleted,
+        })
+        es = MagicMock()
+        es.get_documents_info.return_value = {
+            path: {"dossier_id": "d2" if "D2" in path else "d1", "size": 10} for path in deleted
+        }
+
+        ingestor = Ingestor(config, nc=nc, es=es, extractor=MagicMock(), state_manager=MagicMock())
+        ingestor._process_new_dossiers = AsyncMock()
+        await ingestor._process_activity_batch([{"activity_id": 1}], 0)
+
+        es.get_documents_info.assert_called_once_with(deleted)
+        es.delete_documents_by_path.assert_called_once_with(deleted, refresh=False)
+        es.apply_dossier_stats.assert_called_once_with({"d1": (-500, -5000), "d2": (-1, -10)})
+        assert ingestor._dossier_deltas == {}
+
+    @pytest.mark.asyncio
+    async def test_changed_files_are_looked_up_in_one_call(self):
+        config = Config(
+            nextcloud_url="https://test.nextcloud.com",
+            nextcloud_admin_username="admin",
+            nextcloud_admin_password="password",
+            dossier_parent_path="dossiers",
+        )
+        nc = MagicMock()
+        nc.nc_user = "admin"
+        nc.is_dir.return_value = True
+        es = MagicMock()
+        es.get_documents_info.return_value = {"dossiers/D1/old.txt": {"dossier_id": "d1", "size": 40}}
+
+        ingestor = Ingestor(config, nc=nc, es=es, extractor=MagicMock(), state_manager=MagicMock())
+        ingestor._file_exists = MagicMock(return_value=True)
+        sizes = {"/admin/dossiers/D1/old.txt": 100, "/admin/dossiers/D1/new.txt": 30}
+        ingestor._build_document_incremental = AsyncMock(
+            side_effect=lambda user, dossier_id, path: {"filepath": path, "size": sizes[path]}
+        )
+
+        await ingestor._process_changed_files({"dossiers/D1/old.txt", "dossiers/D1/new.txt"})
+
+        es.get_documents_info.assert_called_once()
+        assert sorted(es.get_documents_info.call_args.args[0]) == ["dossiers/D1/new.txt", "dossiers/D1/old.txt"]
+        dossier_id = ingestor._dossier_id("admin", "D1")
+        # old.txt grew by 60 bytes, new.txt adds one file of 30 bytes
+        assert ingestor._dossier_deltas == {dossier_id: (1, 90)}
+        assert len(es.do_index_documents.call_args.args[0]) == 2
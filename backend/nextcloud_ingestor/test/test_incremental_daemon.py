@@ -0,0 +1,130 @@
+"""
+Tests for the resident incremental ingest daemon.
+
+This module tests that incremental passes are single-flight, that the poll
+interval tightens on activity and backs off while idle or failing, that
+the daemon keeps its connections open between passes, and that blocking
+Elasticsearch, WebDAV and state database calls run off the event loop.
+"""
+
+import asyncio
+import dataclasses
+import pytest
+import threading
+from unittest.mock import AsyncMock, MagicMock
+from nextcloud_ingestor.src.config import Config
+
+
+@pytest.fixture
+def config():
+    return Config(
+        nextcloud_url="https://test.nextcloud.com",
+        nextcloud_admin_username="admin",
+        nextcloud_admin_password="password",
+        dossier_parent_path="dossiers",
+        daemon_min_interval_seconds=1,
+        daemon_max_interval_seconds=8,
+        daemon_backoff_factor=2,
+    )
+
+
+class TestIncrementalDaemon:
+    """Test cases for Ingestor.run_incremental_once and run_daemon."""
+
+    def test_poll_interval_adapts_to_activity(self, config, make_ingestor):
+        ingestor = make_ingestor(config)
+
+        intervals = [1]
+        for processed in (0, 0, None, 0, 0, 5, 0):
+            intervals.append(ingestor._next_poll_interval(intervals[-1], processed))
+
+        assert intervals == [1, 2, 4, 8, 8, 8, 1, 2]
+
+    @pytest.mark.asyncio
+    async def test_concurrent_triggers_do_not_overlap(self, config, make_ingestor):
+        ingestor = make_ingestor(config)
+        release = asyncio.Event()
+
+        async def run_incremental_ingest(**kwargs):
+            assert kwargs == {"dry_run": False, "fallback_to_full": False, "close_connections": False}
+            await release.wait()
+            return 3
+
+        ingestor.run_incremental_ingest = AsyncMock(side_effect=run_incremental_ingest)
+
+        first = asyncio.create_task(ingestor.run_incremental_once())
+        await asyncio.sleep(0)
+        assert await ingestor.run_incremental_once() is None
+        release.set()
+
+        assert await first == 3
+        ingestor.run_incremental_ingest.assert_awaited_once()
+
+    @pytest.mark.asyncio
+    async def test_daemon_keeps_connections_warm_and_wakes_early(self, config, make_ingestor):
+        config = dataclasses.replace(config, daemon_min_interval_seconds=60, daemon_max_interval_seconds=120)
+        ingestor = make_ingestor(config)
+        passes = asyncio.Queue()
+
+        async def run_incremental_ingest(**kwargs):
+            await passes.put(kwargs)
+            return 0
+
+        ingestor.run_incremental_ingest = run_incremental_ingest
+        daemon = asyncio.create_task(ingestor.run_daemon())
+
+        await asyncio.wait_for(passes.get(), 1)
+        ingestor.wake()  # far before the 120s idle interval
+        await asyncio.wait_for(passes.get(), 1)
+
+        ingestor.nc.aclose.assert_not_awaited()
+        ingestor.state_manager.close.assert_not_called()
+
+        daemon.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await daemon
+        ingestor.nc.aclose.assert_awaited_once()
+        ingestor.state_manager.close.assert_called_once()
+
+    @pytest.mark.asyncio
+    async def test_blocking_calls_run_off_the_event_loop(self, config, make_ingestor):
+        ingestor = make_ingestor(config)
+        loop_thread = threading.get_ident()
+        threads = {}
+
+        def record(name, result=None):
+            def call(*args, **kwargs):
+                threads[name] = threading.get_ident()
+                return result
+            return call
+
+        ingestor.state_manager.initialize_schema.side_effect = record("initialize_schema")
+        ingestor.state_manager.get_last_activity_state.side_effect = record("get_last_activity_state", (0, None))
+        ingestor.state_manager.update_activity_state.side_effect = record("update_activity_state")
+        ingestor.nc.collect_last_modifiers = MagicMock()
+        ingestor.nc.filter_file_activities = AsyncMock(side_effect=lambda acts: acts)
+        ingestor.nc.extract_file_paths_from_activities = AsyncMock(return_value={
+            "created": {"dossiers/D1/new.txt"}, "updated": set(), "deleted": {"dossiers/D1/old.txt"},
+        })
+        ingestor.nc.is_dir.side_effect = record("is_dir", True)
+        ingestor.nc.get_metadata.side_effect = record("get_metadata", {"etag": "e1"})
+        ingestor.es.get_documents_info.side_effect = record("get_documents_info", {})
+        ingestor.es.delete_documents_by_path.side_effect = record("delete_documents_by_path")
+        ingestor.es.do_index_documents.side_effect = record("do_index_documents")
+        ingestor.es.apply_dossier_stats.side_effect = record("apply_dossier_stats")
+        ingestor._process_new_dossiers = AsyncMock()
+        ingestor._build_document_incremental = AsyncMock(return_value={"dossier_id": "d1", "size": 1})
+
+        async def activity_pages(since_id, page_size):
+            yield [{"activity_id": 7}], 7
+
+        ingestor.nc.iter_activity_pages = activity_pages
+
+        assert await ingestor.run_incremental_once() == 1
+
+        assert set(threads) == {
+            "initialize_schema", "get_last_activity_state", "update_activity_state", "is_dir",
+            "get_metadata", "get_documents_info", "delete_documents_by_path", "do_index_documents",
+            "apply_dossier_stats",
+        }
+        assert loop_thread not in threads.values()
@@ -0,0 +1,209 @@
+"""
+Tests for the concurrent full-ingest pipeline.
+
+This module tests that run_full_ingest builds documents concurrently, that
+each stage respects its configured concurrency limit, and that blocking
+WebDAV/Tika calls run off the event loop.
+"""
+
+import io
+import threading
+import time
+import pytest
+from unittest.mock import AsyncMock, MagicMock
+from nextcloud_ingestor.src.config import Config
+from nextcloud_ingestor.src.ingestor import Ingestor
+
+
+class _ConcurrencyProbe:
+    """Blocking callable that records how many calls overlap."""
+
+    def __init__(self, result, delay: float = 0.05):
+        self.result = result
+        self.delay = delay
+        self.active = 0
+        self.peak = 0
+        self.threads: set[str] = set()
+        self._lock = threading.Lock()
+
+    def __call__(self, *args):
+        with self._lock:
+            self.active += 1
+            self.peak = max(self.peak, self.active)
+            self.threads.add(threading.current_thread().name)
+        time.sleep(self.delay)
+        with self._lock:
+            self.active -= 1
+        return self.result
+
+
+class TestIngestPipeline:
+    """Test cases for the staged full-ingest pipeline."""
+
+    @pytest.fixture
+    def config(self):
+        return Config(
+            nextcloud_url="https://test.nextcloud.com",
+            nextcloud_admin_username="admin",
+            nextcloud_admin_password="password",
+            dossier_parent_path="dossiers",
+            fetch_concurrency=3,
+            extract_concurrency=2,
+            index_batch_size=5,
+        )
+
+    def _nc(self, n_files: int) -> MagicMock:
+        nc = MagicMock()
+        nc.list_users = AsyncMock(return_value=["user1"])
+        nc.get_sharees = AsyncMock(side_effect=lambda path: {"user2"})
+        nc.get_last_modifiers = AsyncMock(return_value={"100": "user2"})
+        nc.get_latest_activity_id = AsyncMock(return_value=0)
+        nc.aclose = AsyncMock()
+
+        def walk_tree(path, depth="infinity"):
+            if depth == "1":
+                return [
+                    {"path": path, "is_dir": True},
+                    {"path": f"{path}/D1", "is_dir": True},
+                ]
+            return self._tree(path, n_files)
+
+        nc.walk_tree.side_effect = walk_tree
+        return nc
+
+    def _tree(self, root: str, n_files: int) -> list[dict]:
+        nodes = [{"path": root, "is_dir": True, "fileid": "1", "size": "0",
+                  "created": "", "modified": "", "type": "", "etag": None}]
+        for i in range(n_files):
+            nodes.append({
+                "path": f"{root}/file{i}.txt", "is_dir": False, "fileid": str(100 + i),
+                "size": "10", "created": "2024-01-01T00:00:00Z", "modified": "",
+                "type": "text/plain", "etag": f"e{i}",
+            })
+        return nodes
+
+    @pytest.mark.asyncio
+    async def test_stages_run_concurrently_within_limits(self, config, state_manager):
+        nc = self._nc(12)
+        nc.download = _ConcurrencyProbe((io.BytesIO(b"hello\n\nworld"), "sha"))
+
+        extractor = MagicMock()
+        extractor.extract = _ConcurrencyProbe("hello\n\nworld")
+        es = MagicMock()
+        es.get_fingerprints.return_value = {}
+        es.do_index_documents.side_effect = lambda docs: (len(docs), [])
+
+        ingestor = Ingestor(config, nc=nc, es=es, extractor=extractor, state_manager=state_manager)
+        await ingestor.run_full_ingest()
+
+        assert 1 < nc.download.peak <= config.fetch_concurrency
+        assert 1 < extractor.extract.peak <= config.extract_concurrency
+        assert threading.main_thread().name not in nc.download.threads
+        assert threading.main_thread().name not in extractor.extract.threads
+
+        es.index_new_dossier.assert_called_once()
+        indexed = [doc for call in es.do_index_documents.call_args_list for doc in call.args[0]]
+        assert sorted(d["nextcloud_id"] for d in indexed) == [str(100 + i) for i in range(12)]
+        assert all(d["paragraphs"] == [{"id": 0, "text": "hello"}, {"id": 1, "text": "world"}] for d in indexed)
+        nc.get_metadata.assert_not_called()
+        nc.get_last_modifiers.assert_awaited_once()
+        modifiers = {d["nextcloud_id"]: d["lastmodified_user_id"] for d in indexed}
+        assert modifiers["100"] == "user2"
+        assert modifiers["101"] == "user1"
+
+    @pytest.mark.asyncio
+    async def test_last_modifier_scan_starts_at_activity_cursor(self, config, state_manager):
+        state_manager.close = MagicMock()
+        state_manager.initialize_schema()
+        state_manager.update_activity_state(42)
+        nc = self._nc(1)
+        nc.download = MagicMock(side_effect=lambda path: (io.BytesIO(b"text"), "sha"))
+        es = MagicMock()
+        es.get_fingerprints.return_value = {}
+        es.do_index_documents.side_effect = lambda docs: (len(docs), [])
+        es.begin_reindex.return_value = "20240101000000"
+
+        await Ingestor(config, nc=nc, es=es, extractor=MagicMock(), state_manager=state_manager).run_full_ingest()
+        # A reindex rebuilds every document, so it needs the whole stream
+        await Ingestor(config, nc=nc, es=es, extractor=MagicMock(), state_manager=state_manager).run_full_ingest(
+            reindex=True
+        )
+
+        assert [call.args[0] for call in nc.get_last_modifiers.await_args_list] == [42, 0]
+        # Stored with the run, for resuming without another scan
+        assert state_manager.get_run_last_modifiers(1, ["100", "101"]) == {"100": "user2"}
+
+    @pytest.mark.asyncio
+    async def test_documents_are_flushed_in_batches(self, config, state_manager):
+        nc = self._nc(12)
+        nc.download = MagicMock(side_effect=lambda path: (io.BytesIO(b"text"), "sha"))
+        extractor = MagicMock()
+        extractor.extract.return_value = "text"
+        es = MagicMock()
+        es.get_fingerprints.return_value = {}
+        batches = []
+
+        def do_index_documents(docs):
+            batches.append(len(docs))
+            if len(batches) == 1:
+                raise RuntimeError("bulk request rejected")
+            return len(docs), []
+
+        es.do_index_documents.side_effect = do_index_documents
+
+        ingestor = Ingestor(config, nc=nc, es=es, extractor=extractor, state_manager=state_manager)
+        await ingestor.run_full_ingest()
+
+        # A failing batch is reported but does not abort the run
+        assert batches == [5, 5, 2]
+        assert ingestor._index_stats == {"indexed": 7, "failed": 5, "skipped": 0}
+        es.index_new_dossier.assert_called_once()
+
+    @pytest.mark.asyncio
+    async def test_unchanged_files_are_skipped(self, config, state_manager):
+        nc = self._nc(4)
+        nc.download = MagicMock(side_effect=lambda path: (io.BytesIO(b"text"), "sha"))
+        extractor = MagicMock()
+        extractor.extract.return_value = "text"
+        es = MagicMock()
+        es.do_index_documents.side_effect = lambda docs: (len(docs), [])
+        es.get_fingerprints.return_value = {
+            # unchanged content and access list
+            "100": {"etag": "e0", "accessible_to_users": ["user1", "user2"]},
+            # unchanged content, access list changed since the last run
+            "101": {"etag": "e1", "accessible_to_users": ["user1"]},
+            # content changed
+            "102": {"etag": "old", "accessible_to_users": ["user1", "user2"]},
+        }
+
+        ingestor = Ingestor(config, nc=nc, es=es, extractor=extractor, state_manager=state_manager)
+        await ingestor.run_full_ingest()
+
+        indexed = [doc for call in es.do_index_documents.call_args_list for doc in call.args[0]]
+        assert sorted(d["nextcloud_id"] for d in indexed) == ["102", "103"]
+        assert all(d["etag"] and d["content_sha256"] for d in indexed)
+        assert nc.download.call_count == 2
+        assert extractor.extract.call_count == 2
+        es.update_document_fields.assert_called_once()
+        (updates,) = es.update_document_fields.call_args.args
+        assert [u["nextcloud_id"] for u in updates] == ["101"]
+        assert set(updates[0]["accessible_to_users"]) == {"user1", "user2"}
+        assert ingestor._index_stats["skipped"] == 2
+
+    @pytest.mark.asyncio
+    async def test_failed_run_releases_resources(self, config, state_manager):
+        nc = self._nc(2)
+        nc.list_users = AsyncMock(side_effect=ConnectionError("OCS unavailable"))
+        extractor = MagicMock()
+
+        ingestor = Ingestor(config, nc=nc, es=MagicMock(), extractor=extractor, state_manager=state_manager)
+        await ingestor._in_stage("list", lambda: None)
+        executor = ingestor._executor
+
+        with pytest.raises(ConnectionError):
+            await ingestor.run_full_ingest()
+
+        nc.aclose.assert_awaited_once()
+        extractor.close.assert_called_once()
+        assert executor._shutdown
+        assert ingestor._executor is None
@@ -154,9 +154,6 @@ class TestIngestorActivityFiltering:
             mock_es.recreate_indices.return_value = None
             mock_es.do_index_documents.return_value = None
             mock_es.delete_documents_by_path.return_value = None
-            mock_es.get_document_info.return_value = None
-            mock_es.document_exists.return_value = False
-            mock_es.update_dossier_stats.return_value = None
             mock_es_class.return_value = mock_es
             
             mock_extractor = MagicMock()
@@ -222,9 +219,6 @@ class TestIngestorActivityFiltering:
             mock_es.recreate_indices.return_value = None
             mock_es.do_index_documents.return_value = None
             mock_es.delete_documents_by_path.return_value = None
-            mock_es.get_document_info.return_value = None
-            mock_es.document_exists.return_value = False
-            mock_es.update_dossier_stats.return_value = None
             mock_es_class.return_value = mock_es
             
             mock_extractor = MagicMock()
@@ -0,0 +1,70 @@
+"""
+Tests for ingest job tracking.
+
+This module tests that JobRegistry allows one running job per type, records
+how jobs end, supports cancellation and keeps a bounded job history.
+"""
+
+import asyncio
+import pytest
+from unittest.mock import MagicMock
+from nextcloud_ingestor.src.jobs import JobConflictError, JobRegistry
+
+
+def _progress_ingestor() -> MagicMock:
+    ingestor = MagicMock()
+    ingestor.progress.return_value = {"indexed": 0}
+    return ingestor
+
+
+class TestJobRegistry:
+    """Test cases for JobRegistry."""
+
+    @pytest.mark.asyncio
+    async def test_one_running_job_per_type(self):
+        jobs = JobRegistry()
+        release = asyncio.Event()
+
+        full = jobs.start("full", _progress_ingestor(), release.wait)
+        with pytest.raises(JobConflictError):
+            jobs.start("full", _progress_ingestor(), release.wait)
+        incremental = jobs.start("incremental", _progress_ingestor(), release.wait)
+
+        release.set()
+        await asyncio.gather(full.task, incremental.task)
+
+        assert [full.status, incremental.status] == ["completed", "completed"]
+        assert jobs.running("full") is None
+        assert jobs.get(full.id).to_dict()["progress"] == {"indexed": 0}
+
+    @pytest.mark.asyncio
+    async def test_failed_and_cancelled_jobs(self):
+        jobs = JobRegistry()
+
+        async def fail():
+            raise RuntimeError("nextcloud unreachable")
+
+        failed = jobs.start("incremental", _progress_ingestor(), fail)
+        cancelled = jobs.start("full", _progress_ingestor(), asyncio.Event().wait)
+        await asyncio.sleep(0)
+
+        assert jobs.cancel(cancelled.id)
+        await asyncio.gather(failed.task, cancelled.task, return_exceptions=True)
+
+        assert (failed.status, failed.error) == ("failed", "nextcloud unreachable")
+        assert cancelled.status == "cancelled"
+        assert cancelled.finished_at is not None
+        assert not jobs.cancel(cancelled.id)
+
+    @pytest.mark.asyncio
+    async def test_finished_jobs_are_pruned(self):
+        jobs = JobRegistry(keep_finished=2)
+
+        async def noop():
+            pass
+
+        for _ in range(4):
+            await jobs.start("incremental", _progress_ingestor(), noop).task
+
+        jobs.start("incremental", _progress_ingestor(), noop)
+        assert len(jobs.list()) == 3
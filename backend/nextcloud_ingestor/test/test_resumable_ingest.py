@@ -0,0 +1,314 @@
+"""
+Tests for resumable full ingest.
+
+This module tests that run_full_ingest checkpoints every finished dossier
+and indexed batch in the state database, records failing files as dead
+letters instead of aborting, and that resume=True continues the last
+unfinished run with only the dossiers that are not done yet. Reindex runs
+swap the search aliases only once they complete, and progress() reports
+the counters of the run.
+"""
+
+import dataclasses
+import datetime
+import pytest
+from unittest.mock import AsyncMock
+from nextcloud_ingestor.src.config import Config
+from nextcloud_ingestor.src.database import DeadLetter, IngestRun
+from nextcloud_ingestor.src.ingest_utils import hash
+
+
+@pytest.fixture
+def config():
+    return Config(
+        nextcloud_url="https://test.nextcloud.com",
+        nextcloud_admin_username="admin",
+        nextcloud_admin_password="password",
+        dossier_parent_path="dossiers",
+        index_batch_size=2,
+        work_item_max_attempts=2,
+    )
+
+
+class TestResumableFullIngest:
+    """Test cases for checkpoints, dead letters and resuming."""
+
+    @pytest.mark.asyncio
+    async def test_failed_files_become_dead_letters(self, config, state_manager, make_nc, make_es, make_ingestor):
+        nc = make_nc(["A"])
+        download = nc.download.side_effect
+
+        def flaky_download(path):
+            if path.endswith("file1.txt"):
+                raise ConnectionError("webdav reset")
+            return download(path)
+
+        nc.download.side_effect = flaky_download
+        es = make_es()
+
+        ingestor = make_ingestor(config, nc, es, state_manager)
+        await ingestor.run_full_ingest()
+
+        es.index_new_dossier.assert_called_once()
+        with state_manager.SessionFactory() as session:
+            (dead,) = session.query(DeadLetter).all()
+            (run,) = session.query(IngestRun).all()
+        assert dead.path.endswith("/A/file1.txt")
+        assert dead.nextcloud_id == "A-1"
+        assert "webdav reset" in dead.error
+        assert dead.run_id == run.id
+        assert (run.mode, run.status, run.documents_indexed) == ("full", "completed_with_errors", 2)
+        assert ingestor._index_stats["failed"] == 1
+
+    @pytest.mark.asyncio
+    async def test_resume_retries_runs_completed_with_errors(self, config, state_manager, make_nc, make_es, make_ingestor):
+        config = dataclasses.replace(config, work_item_max_attempts=1)
+        nc = make_nc(["A", "B", "C"])
+        walk_tree = nc.walk_tree.side_effect
+        download = nc.download.side_effect
+        failures = {"B": 1, "C/file1.txt": 1}
+
+        def flaky_walk_tree(path, depth="infinity"):
+            name = path.rsplit("/", 1)[-1]
+            if depth != "1" and failures.get(name):
+                failures[name] -= 1
+                raise ConnectionError("PROPFIND failed")
+            return walk_tree(path, depth)
+
+        def flaky_download(path):
+            if path.endswith("C/file1.txt") and failures["C/file1.txt"]:
+                failures["C/file1.txt"] -= 1
+                raise ConnectionError("webdav reset")
+            return download(path)
+
+        nc.walk_tree.side_effect = flaky_walk_tree
+        nc.download.side_effect = flaky_download
+        es = make_es()
+
+        await make_ingestor(config, nc, es, state_manager).run_full_ingest()
+        run = state_manager.get_resumable_run()
+        assert run["status"] == "completed_with_errors"
+        assert state_manager.get_run_progress(run["id"]) == {"pending": 0, "claimed": 0, "done": 2, "failed": 1}
+
+        es.index_new_dossier.reset_mock()
+        await make_ingestor(config, nc, es, state_manager).run_full_ingest(resume=True)
+
+        # The failed dossier and the one with a dead-lettered file are ingested again
+        assert sorted(call.args[0]["dossier_name"] for call in es.index_new_dossier.call_args_list) == ["B", "C"]
+        assert state_manager.get_run_progress(run["id"]) == {"pending": 0, "claimed": 0, "done": 3, "failed": 0}
+        assert state_manager.get_resumable_run() is None
+        with state_manager.SessionFactory() as session:
+            assert session.get(IngestRun, run["id"]).status == "completed"
+            assert session.query(DeadLetter).count() == 0
+
+    @pytest.mark.asyncio
+    async def test_rejected_documents_become_dead_letters(self, config, state_manager, make_nc, make_es, make_ingestor):
+        es = make_es()
+        es.do_index_documents.side_effect = lambda docs: (
+            len(docs) - 1,
+            [{"index": {"_id": hash(docs[0]["nextcloud_id"]), "error": {"type": "mapper_parsing_exception"}}}],
+        )
+
+        ingestor = make_ingestor(config, make_nc(["A"], files_per_dossier=2), es, state_manager)
+        await ingestor.run_full_ingest()
+
+        with state_manager.SessionFactory() as session:
+            (dead,) = session.query(DeadLetter).all()
+            (run,) = session.query(IngestRun).all()
+        assert "mapper_parsing_exception" in dead.error
+        assert (run.documents_indexed, run.documents_failed) == (1, 1)
+
+    @pytest.mark.asyncio
+    async def test_resume_skips_finished_dossiers(self, config, state_manager, make_nc, make_es, make_ingestor):
+        run_id = state_manager.create_ingest_run(
+            [("user1", "/user1/dossiers", "A"), ("user1", "/user1/dossiers", "B")], mode="full",
+            last_modifiers={"A-0": "user3", "B-1": "user2", "X-9": "user4"},
+        )
+        # The previous run finished A and was interrupted while ingesting B
+        done, interrupted = state_manager.get_open_work_items(run_id)
+        state_manager.complete_work_item(done["id"])
+        nc = make_nc(["A", "B"])
+        es = make_es()
+        es.get_fingerprints.return_value = {"B-0": {"etag": "e0", "accessible_to_users": ["user1"]}}
+
+        ingestor = make_ingestor(config, nc, es, state_manager)
+        await ingestor.run_full_ingest(resume=True)
+
+        nc.list_users.assert_not_awaited()
+        (dossier,) = [call.args[0] for call in es.index_new_dossier.call_args_list]
+        assert dossier["dossier_name"] == "B"
+        # Files indexed before the interruption are skipped by etag
+        indexed = sorted(d["nextcloud_id"] for call in es.do_index_documents.call_args_list for d in call.args[0])
+        assert indexed == ["B-1", "B-2"]
+        # Last modifying users are read from the run for the files of B only
+        users = {
+            d["nextcloud_id"]: d["lastmodified_user_id"]
+            for call in es.do_index_documents.call_args_list for d in call.args[0]
+        }
+        assert users == {"B-1": "user2", "B-2": "user1"}
+        assert ingestor._last_modifiers == {"B-1": "user2"}
+        assert state_manager.get_run_progress(run_id) == {"pending": 0, "claimed": 0, "done": 2, "failed": 0}
+        assert state_manager.get_resumable_run() is None
+
+    @pytest.mark.asyncio
+    async def test_resume_does_not_skip_unchanged_on_later_runs(self, config, state_manager, make_nc, make_es, make_ingestor):
+        config = dataclasses.replace(config, skip_unchanged=False)
+        run_id = state_manager.create_ingest_run([("user1", "/user1/dossiers", "A")], mode="full")
+        state_manager.get_open_work_items(run_id)
+        es = make_es()
+        ingestor = make_ingestor(config, make_nc(["A"]), es, state_manager)
+
+        await ingestor.run_full_ingest(resume=True)
+        assert es.get_fingerprints.call_count == 1
+
+        await ingestor.run_full_ingest()
+        assert es.get_fingerprints.call_count == 1
+
+    @pytest.mark.asyncio
+    async def test_failed_dossier_is_retried_on_resume(self, config, state_manager, make_nc, make_es, make_ingestor):
+        nc = make_nc(["A", "B"])
+        walk_tree = nc.walk_tree.side_effect
+        failures = {"B": 1}
+
+        def flaky_walk_tree(path, depth="infinity"):
+            name = path.rsplit("/", 1)[-1]
+            if depth != "1" and failures.get(name):
+                failures[name] -= 1
+                raise ConnectionError("PROPFIND failed")
+            return walk_tree(path, depth)
+
+        nc.walk_tree.side_effect = flaky_walk_tree
+        es = make_es()
+
+        await make_ingestor(config, nc, es, state_manager).run_full_ingest()
+
+        run_id = state_manager.get_resumable_run()["id"]
+        assert state_manager.get_run_progress(run_id) == {"pending": 1, "claimed": 0, "done": 1, "failed": 0}
+
+        await make_ingestor(config, nc, es, state_manager).run_full_ingest(resume=True)
+
+        assert sorted(call.args[0]["dossier_name"] for call in es.index_new_dossier.call_args_list) == ["A", "B"]
+        assert state_manager.get_resumable_run() is None
+
+    def test_sharded_workers_do_not_claim_full_runs(self, state_manager):
+        state_manager.create_ingest_run([("user1", "/user1/dossiers", "A")], mode="full")
+
+        assert state_manager.claim_work_item("w1", datetime.timedelta(minutes=5), 3) is None
+
+
+class TestReindexRun:
+    """Test that full ingest swaps aliases only for completed runs and replays activities after the swap."""
+
+    @pytest.mark.asyncio
+    async def test_completed_run_swaps_aliases(self, config, state_manager, make_nc, make_es, make_ingestor):
+        es = make_es()
+        es.begin_reindex.return_value = "20240101000000"
+
+        await make_ingestor(config, make_nc(["A"]), es, state_manager).run_full_ingest(reindex=True)
+
+        es.begin_reindex.assert_called_once_with()
+        es.finish_reindex.assert_called_once_with()
+
+    @pytest.mark.asyncio
+    async def test_interrupted_reindex_resumes_into_same_indices(self, config, state_manager, make_nc, make_es, make_ingestor):
+        nc = make_nc(["A", "B"])
+        walk_tree = nc.walk_tree.side_effect
+        failures = {"B": config.work_item_max_attempts - 1}
+
+        def flaky_walk_tree(path, depth="infinity"):
+            name = path.rsplit("/", 1)[-1]
+            if depth != "1" and failures.get(name):
+                failures[name] -= 1
+                raise ConnectionError("PROPFIND failed")
+            return walk_tree(path, depth)
+
+        nc.walk_tree.side_effect = flaky_walk_tree
+        es = make_es()
+        es.begin_reindex.return_value = "20240101000000"
+
+        await make_ingestor(config, nc, es, state_manager).run_full_ingest(reindex=True)
+        es.finish_reindex.assert_not_called()
+
+        await make_ingestor(config, nc, es, state_manager).run_full_ingest(resume=True)
+
+        assert es.begin_reindex.call_args_list[-1].args == ("20240101000000",)
+        es.finish_reindex.assert_called_once_with()
+
+
+    @pytest.mark.asyncio
+    async def test_reindex_with_failures_needs_force_to_swap(self, config, state_manager, make_nc, make_es, make_ingestor):
+        nc = make_nc(["A"])
+        download = nc.download.side_effect
+
+        def flaky_download(path):
+            if path.endswith("file1.txt"):
+                raise ConnectionError("webdav reset")
+            return download(path)
+
+        nc.download.side_effect = flaky_download
+        es = make_es()
+        es.begin_reindex.return_value = "20240101000000"
+
+        await make_ingestor(config, nc, es, state_manager).run_full_ingest(reindex=True)
+        es.finish_reindex.assert_not_called()
+
+        await make_ingestor(config, nc, es, state_manager).run_full_ingest(resume=True, force=True)
+        es.finish_reindex.assert_called_once_with()
+
+    @pytest.mark.asyncio
+    async def test_activities_during_reindex_are_replayed_after_swap(self, config, state_manager, make_nc, make_es, make_ingestor):
+        nc = make_nc(["A"])
+        nc.get_latest_activity_id = AsyncMock(return_value=50)
+        replayed = []
+
+        async def iter_activity_pages(since, page_size):
+            replayed.append(since)
+            return
+            yield
+
+        nc.iter_activity_pages = iter_activity_pages
+        # An incremental pass during the rebuild moved the cursor past the snapshot
+        state_manager.update_activity_state(70)
+        es = make_es()
+        es.begin_reindex.return_value = "20240101000000"
+
+        await make_ingestor(config, nc, es, state_manager).run_full_ingest(reindex=True)
+
+        es.finish_reindex.assert_called_once_with()
+        assert replayed == [50]
+        assert state_manager.get_last_activity_state()[0] == 50
+
+    @pytest.mark.asyncio
+    async def test_full_ingest_moves_activity_cursor_forward_to_snapshot(self, config, state_manager, make_nc, make_es, make_ingestor):
+        nc = make_nc(["A"])
+        nc.get_latest_activity_id = AsyncMock(return_value=50)
+
+        state_manager.update_activity_state(10)
+        await make_ingestor(config, nc, make_es(), state_manager).run_full_ingest()
+        assert state_manager.get_last_activity_state()[0] == 50
+
+        # Incremental ingest already applied activities past the snapshot to the live indices
+        state_manager.update_activity_state(70)
+        await make_ingestor(config, nc, make_es(), state_manager).run_full_ingest()
+        assert state_manager.get_last_activity_state()[0] == 70
+
+
+class TestIngestProgress:
+    """Test the progress counters of a full ingest."""
+
+    @pytest.mark.asyncio
+    async def test_full_ingest_progress(self, config, state_manager, make_nc, make_es, make_ingestor):
+        es = make_es()
+        es.get_fingerprints.return_value = {"A-0": {"etag": "e0", "accessible_to_users": ["user1"]}}
+        ingestor = make_ingestor(config, make_nc(["A", "B"]), es, state_manager)
+
+        await ingestor.run_full_ingest()
+
+        progress = ingestor.progress()
+        assert (progress["dossiers_total"], progress["dossiers_done"]) == (2, 2)
+        assert progress["discovered"] == 6
+        assert (progress["fetched"], progress["extracted"], progress["indexed"]) == (5, 5, 5)
+        assert progress["skipped"] == 1
+        assert progress["bytes"] == 5 * 4
+        assert progress["rates"]["indexed"] > 0
+        assert progress["eta_seconds"] == 0
@@ -0,0 +1,111 @@
+"""
+Tests for the sharded full ingest work queue.
+
+This module tests that StateManager hands out each dossier work item to one
+worker, retries failed and abandoned items up to the attempt limit, and that
+Ingestor workers drain the queue so one failing dossier does not restart
+the run. SQLite stands in for PostgreSQL; it ignores FOR UPDATE SKIP LOCKED.
+"""
+
+import datetime
+import pytest
+from unittest.mock import AsyncMock, MagicMock
+from nextcloud_ingestor.src.config import Config
+from nextcloud_ingestor.src.ingestor import Ingestor
+from nextcloud_ingestor.src.database import WorkItem
+
+
+STALE = datetime.timedelta(minutes=5)
+
+
+class TestWorkQueue:
+    """Test cases for the StateManager work queue."""
+
+    def test_items_are_claimed_once(self, state_manager):
+        run_id = state_manager.create_ingest_run([("u1", "/u1/dossiers", "A"), ("u2", "/u2/dossiers", "B")])
+
+        first = state_manager.claim_work_item("w1", STALE, 3)
+        second = state_manager.claim_work_item("w2", STALE, 3)
+
+        assert {first["dossier_name"], second["dossier_name"]} == {"A", "B"}
+        assert first["run_id"] == second["run_id"] == run_id
+        assert state_manager.claim_work_item("w3", STALE, 3) is None
+        assert state_manager.get_run_progress(run_id)["claimed"] == 2
+
+    def test_failed_items_are_retried_until_max_attempts(self, state_manager):
+        run_id = state_manager.create_ingest_run([("u1", "/u1/dossiers", "A")])
+
+        for attempt in (1, 2):
+            item = state_manager.claim_work_item("w1", STALE, 2)
+            assert item["attempts"] == attempt
+            state_manager.fail_work_item(item["id"], "boom", 2)
+
+        assert state_manager.claim_work_item("w1", STALE, 2) is None
+        assert state_manager.get_run_progress(run_id) == {"pending": 0, "claimed": 0, "done": 0, "failed": 1}
+        assert state_manager.finish_ingest_runs() == {run_id: "completed_with_errors"}
+
+    def test_abandoned_claims_are_reclaimed(self, state_manager):
+        state_manager.create_ingest_run([("u1", "/u1/dossiers", "A")])
+        item = state_manager.claim_work_item("w1", STALE, 3)
+        with state_manager.SessionFactory() as session:
+            session.get(WorkItem, item["id"]).heartbeat_at = (
+                datetime.datetime.now(datetime.timezone.utc) - datetime.timedelta(hours=1)
+            )
+            session.commit()
+
+        reclaimed = state_manager.claim_work_item("w2", STALE, 3)
+
+        assert reclaimed["id"] == item["id"]
+        assert reclaimed["attempts"] == 2
+        assert not state_manager.heartbeat_work_item(item["id"], "w1")
+        assert state_manager.heartbeat_work_item(item["id"], "w2")
+
+
+class TestIngestWorker:
+    """Test that workers drain the queue and retry failing dossiers."""
+
+    @pytest.mark.asyncio
+    async def test_worker_drains_queue_with_retry(self, state_manager):
+        config = Config(
+            nextcloud_url="https://test.nextcloud.com",
+            nextcloud_admin_username="admin",
+            nextcloud_admin_password="password",
+            dossier_parent_path="dossiers",
+            # SQLite cannot skip locked rows, so claims are only exclusive within one loop
+            worker_concurrency=1,
+            work_item_max_attempts=2,
+            worker_poll_seconds=0,
+        )
+        run_id = state_manager.create_ingest_run(
+            [("u1", "/u1/dossiers", "A"), ("u1", "/u1/dossiers", "B"), ("u2", "/u2/dossiers", "C")],
+            last_modifiers={"42": "u2"},
+        )
+        state_manager.close = MagicMock()
+        nc = MagicMock()
+        nc.get_last_modifiers = AsyncMock(return_value={})
+        nc.aclose = AsyncMock()
+        es = MagicMock()
+
+        ingestor = Ingestor(config, nc=nc, es=es, extractor=MagicMock(), state_manager=state_manager)
+        failures = {"B": 1}
+        modifier_runs = set()
+
+        async def ingest_dossier(user, parent, name, skip_unchanged=False, modifiers_run_id=None):
+            modifier_runs.add(modifiers_run_id)
+            if failures.get(name):
+                failures[name] -= 1
+                raise RuntimeError("webdav unavailable")
+            return {"dossier_id": f"{user}-{name}"}
+
+        ingestor._ingest_dossier = ingest_dossier
+
+        await ingestor.run_worker("w1")
+
+        indexed = sorted(call.args[0]["dossier_id"] for call in es.index_new_dossier.call_args_list)
+        assert indexed == ["u1-A", "u1-B", "u2-C"]
+        assert state_manager.get_run_progress(run_id) == {"pending": 0, "claimed": 0, "done": 3, "failed": 0}
+        assert state_manager.finish_ingest_runs() == {}  # already completed by the worker
+        # Last modifying users come from the run's stored scan, not from a scan per worker
+        nc.get_last_modifiers.assert_not_awaited()
+        assert modifier_runs == {run_id}
+        assert state_manager.get_run_last_modifiers(run_id, ["42", "43"]) == {"42": "u2"}
@@ -0,0 +1,105 @@
+"""
+Tests for the memoized sharee/ACL resolver.
+
+This module tests that NextCloudConnector.get_sharees resolves group
+memberships, groupfolders, ACL rules and shares once per run instead of
+once per file, while returning the same sharees.
+"""
+
+import asyncio
+import pytest
+from unittest.mock import AsyncMock
+from nextcloud_ingestor.src.nextcloud import NextCloudConnector
+
+
+USERGROUPS = {"team": ["alice", "bob"], "admins": ["admin"]}
+
+
+class TestShareeResolver:
+    """Test cases for cached sharee resolution."""
+
+    @pytest.fixture
+    def connector(self):
+        nc = NextCloudConnector()
+        nc.get_groups_membership = AsyncMock(return_value=USERGROUPS)
+        return nc
+
+    @pytest.mark.asyncio
+    async def test_regular_shares_are_listed_once_per_folder(self, connector):
+        shares = {
+            ("Projects", False): [{"share_with": "carol", "path": "/Projects"}],
+            ("Projects/A", True): [{"share_with": "team", "path": "/Projects/A/f1.txt"}],
+            ("Projects", True): [],
+        }
+        connector._fetch_shares = AsyncMock(side_effect=lambda path, subfiles: shares.get((path, subfiles), []))
+
+        results = await asyncio.gather(*(
+            connector.get_sharees(f"/admin/Projects/A/f{i}.txt") for i in range(1, 21)
+        ))
+
+        assert results[0] == {"carol", "alice", "bob"}
+        assert all(r == {"carol"} for r in results[1:])
+        # One listing for Projects/A, one for Projects, one direct lookup for the top folder
+        assert connector._fetch_shares.await_count == 3
+        connector.get_groups_membership.assert_awaited_once()
+
+    @pytest.mark.asyncio
+    async def test_groupfolder_acl_fetched_once_per_dossier(self, connector):
+        connector._get_groupfolders = AsyncMock(return_value={
+            "1": {"mount_point": "Dossiers", "groups": {"team": 31}, "acl": True},
+        })
+        tree = {
+            "/admin/Dossiers/D1": ([], []),
+            "/admin/Dossiers/D1/open.txt": ([], []),
+            "/admin/Dossiers/D1/secret.txt": ([("user", "alice", 1)], []),
+            "/admin/Dossiers/D1/sub/inherited.txt": ([], [("group", "admins", 31)]),
+        }
+        connector._propfind_acl = AsyncMock(return_value=tree)
+
+        dossier, open_file, secret, inherited = await asyncio.gather(
+            connector.get_sharees("/admin/Dossiers/D1"),
+            connector.get_sharees("/admin/Dossiers/D1/open.txt"),
+            connector.get_sharees("/admin/Dossiers/D1/secret.txt"),
+            connector.get_sharees("/admin/Dossiers/D1/sub/inherited.txt"),
+        )
+
+        # No ACL rules: folder-level groups apply
+        assert dossier == {"alice", "bob"}
+        assert open_file == {"alice", "bob"}
+        assert secret == {"alice"}
+        assert inherited == {"admin"}
+        connector._propfind_acl.assert_awaited_once_with("/admin/Dossiers/D1", "infinity")
+
+        # Returned sets are copies, callers may add the owner
+        open_file.add("owner")
+        assert "owner" not in await connector.get_sharees("/admin/Dossiers/D1/open.txt")
+
+    @pytest.mark.asyncio
+    async def test_reset_caches_forces_refetch(self, connector):
+        connector._fetch_shares = AsyncMock(return_value=[])
+
+        await connector.get_sharees("/admin/Projects/A/f.txt")
+        calls = connector._fetch_shares.await_count
+        await connector.get_sharees("/admin/Projects/A/f.txt")
+        assert connector._fetch_shares.await_count == calls
+
+        connector.reset_caches()
+        await connector.get_sharees("/admin/Projects/A/f.txt")
+        assert connector._fetch_shares.await_count == 2 * calls
+        assert connector.get_groups_membership.await_count == 2
+
+
+class TestSharedHttpClient:
+    """Test cases for the pooled HTTP client lifecycle."""
+
+    @pytest.mark.asyncio
+    async def test_client_is_reused_and_closed(self):
+        async with NextCloudConnector() as nc:
+            client = nc.http
+            assert nc.http is client
+            assert client.auth is not None
+        assert client.is_closed
+
+        # A closed connector transparently opens a new pool on next use
+        assert nc.http is not client
+        await nc.aclose()
@@ -0,0 +1,63 @@
+"""
+Tests for streaming file downloads.
+
+This module tests that NextCloudConnector.download hashes chunks while
+spooling them, keeps small files in memory and rolls large ones over to
+disk, and that uploading a spooled file to Tika does not force it to disk.
+"""
+
+import hashlib
+import tempfile
+import pytest
+import requests
+from unittest.mock import MagicMock, patch
+from nextcloud_ingestor.src import nextcloud
+from nextcloud_ingestor.src.content import _SizedReader
+from nextcloud_ingestor.src.nextcloud import NextCloudConnector
+
+
+class TestStreamingDownload:
+    """Test cases for NextCloudConnector.download."""
+
+    @pytest.fixture
+    def connector(self):
+        nc = NextCloudConnector()
+        nc.webdavclient = MagicMock()
+        return nc
+
+    def _serve(self, connector, chunks: list[bytes]):
+        resp = MagicMock()
+        resp.iter_content.return_value = iter(chunks)
+        connector.webdavclient.session.get.return_value.__enter__.return_value = resp
+        return resp
+
+    @pytest.mark.parametrize("size, rolled", [(1024, False), (64 * 1024, True)])
+    def test_download_hashes_and_spools(self, connector, size, rolled):
+        data = bytes(range(256)) * (size // 256)
+        self._serve(connector, [data[i:i + 4096] for i in range(0, len(data), 4096)])
+
+        with patch.object(nextcloud, "NC_SPOOL_MAX_MEMORY", 16 * 1024):
+            spool, sha256 = connector.download("/admin/dossiers/D1/big.pdf")
+
+        with spool:
+            assert sha256 == hashlib.sha256(data).hexdigest()
+            assert spool._rolled is rolled
+            assert spool.read() == data
+        assert connector.webdavclient.session.get.call_args.kwargs["stream"] is True
+
+    def test_failed_download_raises(self, connector):
+        resp = self._serve(connector, [])
+        resp.raise_for_status.side_effect = requests.HTTPError("404")
+
+        with pytest.raises(requests.HTTPError):
+            connector.download("/admin/dossiers/D1/missing.pdf")
+
+    def test_upload_body_keeps_small_spool_in_memory(self):
+        spool = tempfile.SpooledTemporaryFile(max_size=1024)
+        spool.write(b"small file")
+        spool.seek(0)
+
+        prepared = requests.Request("PUT", "http://tika:9998/tika", data=_SizedReader(spool)).prepare()
+
+        assert prepared.headers["Content-Length"] == str(len(b"small file"))
+        assert spool._rolled is False
@@ -9,7 +9,7 @@ import pytest
 import tempfile
 import os
 from nextcloud_ingestor.src.content import ContentExtractor, NotSupportedError
-from nextcloud_ingestor.src.utils import logger
+from nextcloud_ingestor.src.ingest_utils import logger
 
 
 class TestTikaExtraction:
@@ -0,0 +1,163 @@
+"""
+Tests for the single-PROPFIND tree walker.
+
+This module tests that NextCloudConnector.walk_tree turns a multistatus
+response into metadata nodes, falls back to per-folder walking when
+Depth: infinity is refused, and that the ingestor derives dossier stats
+from those nodes without extra metadata calls.
+"""
+
+import pytest
+import requests
+from unittest.mock import MagicMock
+from nextcloud_ingestor.src.nextcloud import NextCloudConnector
+
+
+def _response(href: str, props: str) -> str:
+    return f"""
+    <d:response>
+        <d:href>{href}</d:href>
+        <d:propstat>
+            <d:prop>{props}</d:prop>
+            <d:status>HTTP/1.1 200 OK</d:status>
+        </d:propstat>
+        <d:propstat>
+            <d:prop><d:creationdate/></d:prop>
+            <d:status>HTTP/1.1 404 Not Found</d:status>
+        </d:propstat>
+    </d:response>"""
+
+
+def _multistatus(*responses: str) -> bytes:
+    return (
+        '<?xml version="1.0"?>'
+        '<d:multistatus xmlns:d="DAV:" xmlns:oc="http://owncloud.org/ns" xmlns:nc="http://nextcloud.org/ns">'
+        + "".join(responses)
+        + "</d:multistatus>"
+    ).encode("utf-8")
+
+
+FOLDER = "<d:resourcetype><d:collection/></d:resourcetype>"
+
+
+def _folder(href: str, fileid: str, size: str = "0") -> str:
+    return _response(href, f"{FOLDER}<oc:fileid>{fileid}</oc:fileid><oc:size>{size}</oc:size>")
+
+
+def _file(href: str, fileid: str, size: str, created: int = 0) -> str:
+    return _response(
+        href,
+        "<d:resourcetype/>"
+        f"<d:getcontentlength>{size}</d:getcontentlength>"
+        "<d:getcontenttype>application/pdf</d:getcontenttype>"
+        '<d:getetag>"etag-' + fileid + '"</d:getetag>'
+        "<d:getlastmodified>Mon, 01 Jan 2024 12:00:00 GMT</d:getlastmodified>"
+        f"<oc:fileid>{fileid}</oc:fileid>"
+        f"<nc:creation_time>{created}</nc:creation_time>",
+    )
+
+
+class TestWalkTree:
+    """Test cases for NextCloudConnector.walk_tree."""
+
+    @pytest.fixture
+    def connector(self):
+        nc = NextCloudConnector()
+        nc.webdavclient = MagicMock()
+        nc.webdavclient.get_url.side_effect = lambda p: nc.files_root.rstrip("/") + p
+        return nc
+
+    def _mock_resp(self, content: bytes, status: int = 207):
+        resp = MagicMock()
+        resp.content = content
+        resp.status_code = status
+        if status >= 400:
+            resp.raise_for_status.side_effect = requests.HTTPError(response=resp)
+        return resp
+
+    def test_single_propfind_returns_all_nodes(self, connector):
+        root = connector.files_root_path + "admin/Dossiers/D1"
+        connector.webdavclient.session.request.return_value = self._mock_resp(_multistatus(
+            _folder(root + "/", "10", "300"),
+            _file(root + "/a%20b.pdf", "11", "100", created=1704067200),
+            _folder(root + "/sub/", "12", "200"),
+            _file(root + "/sub/c.pdf", "13", "200"),
+        ))
+
+        nodes = connector.walk_tree("/admin/Dossiers/D1")
+
+        assert connector.webdavclient.session.request.call_count == 1
+        headers = connector.webdavclient.session.request.call_args.kwargs["headers"]
+        assert headers["Depth"] == "infinity"
+        assert [n["path"] for n in nodes] == [
+            "/admin/Dossiers/D1",
+            "/admin/Dossiers/D1/a b.pdf",
+            "/admin/Dossiers/D1/sub",
+            "/admin/Dossiers/D1/sub/c.pdf",
+        ]
+        assert [n["is_dir"] for n in nodes] == [True, False, True, False]
+        assert nodes[0]["fileid"] == "10"
+        assert nodes[1] == {
+            "path": "/admin/Dossiers/D1/a b.pdf",
+            "is_dir": False,
+            "size": "100",
+            "modified": "Mon, 01 Jan 2024 12:00:00 GMT",
+            "created": "2024-01-01T00:00:00Z",
+            "type": "application/pdf",
+            "fileid": "11",
+            "etag": "etag-11",
+        }
+        # No creation time tracked: leave it empty so callers fall back to modified
+        assert nodes[3]["created"] == ""
+
+    def test_falls_back_to_depth_one_when_infinity_refused(self, connector):
+        root = connector.files_root_path + "admin/Dossiers/D1"
+        responses = {
+            "infinity": self._mock_resp(b"", status=403),
+            "/admin/Dossiers/D1": self._mock_resp(_multistatus(
+                _folder(root + "/", "10"),
+                _file(root + "/a.pdf", "11", "100"),
+                _folder(root + "/sub/", "12"),
+            )),
+            "/admin/Dossiers/D1/sub": self._mock_resp(_multistatus(
+                _folder(root + "/sub/", "12"),
+                _file(root + "/sub/c.pdf", "13", "200"),
+            )),
+        }
+
+        def request(method, url, headers, **kwargs):
+            if headers["Depth"] == "infinity":
+                return responses["infinity"]
+            return responses[url[len(connector.files_root.rstrip("/")):]]
+
+        connector.webdavclient.session.request.side_effect = request
+
+        nodes = connector.walk_tree("/admin/Dossiers/D1")
+
+        assert [n["path"] for n in nodes] == [
+            "/admin/Dossiers/D1",
+            "/admin/Dossiers/D1/a.pdf",
+            "/admin/Dossiers/D1/sub",
+            "/admin/Dossiers/D1/sub/c.pdf",
+        ]
+        assert connector.webdavclient.session.request.call_count == 3
+
+
+class TestTreeStats:
+    """Test that dossier stats come from walked nodes only."""
+
+    def test_collect_tree_stats_uses_nodes(self):
+        from nextcloud_ingestor.src.ingestor import Ingestor
+
+        ingestor = Ingestor.__new__(Ingestor)
+        ingestor.nc = MagicMock()
+        files = [
+            {"size": "100", "created": "2024-01-02T00:00:00Z", "modified": ""},
+            {"size": "200", "created": "", "modified": "Mon, 01 Jan 2024 12:00:00 GMT"},
+        ]
+
+        count, total, first_created = ingestor._collect_tree_stats(files)
+
+        assert (count, total) == (2, 300)
+        assert first_created == "2024-01-01T12:00:00Z"
+        ingestor.nc.get_metadata.assert_not_called()
@@ -0,0 +1,88 @@
+import array
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+
+EMBEDDING_CACHE_PATH = os.getenv(
+    "EMBEDDING_CACHE_PATH", os.path.join(os.path.expanduser("~"), ".cache", "bsw", "embeddings.sqlite")
+)
+EMBEDDING_CACHE_ENABLED = os.getenv("EMBEDDING_CACHE_ENABLED", "true").lower() == "true"
+
+# SQLite limits the number of host parameters per statement
+_LOOKUP_BATCH = 500
+
+
+def text_hash(text: str) -> str:
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+class EmbeddingCache:
+    """
+    Persistent embedding cache keyed by (model, dims, sha256 of the text).
+
+    Backed by a local SQLite file so every ingest path and process on the
+    host shares it. Vectors are stored as float32, the precision
+    Elasticsearch keeps for dense_vector fields anyway.
+    """
+
+    def __init__(self, path: str = EMBEDDING_CACHE_PATH):
+        self.path = path
+        self._lock = threading.Lock()
+        if path != ":memory:":
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._conn = sqlite3.connect(path, timeout=30, check_same_thread=False)
+        with self._lock, self._conn:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS embeddings (
+                    model TEXT NOT NULL,
+                    dims INTEGER NOT NULL,
+                    text_sha256 TEXT NOT NULL,
+                    vector BLOB NOT NULL,
+                    created_at REAL NOT NULL,
+                    PRIMARY KEY (model, dims, text_sha256)
+                )
+                """
+            )
+
+    def get_many(self, model: str, dims: int, hashes: list[str]) -> dict[str, list[float]]:
+        """Return the cached vectors of the given text hashes, by hash; misses are left out."""
+        found: dict[str, list[float]] = {}
+        unique = list(dict.fromkeys(hashes))
+        with self._lock:
+            for start in range(0, len(unique), _LOOKUP_BATCH):
+                batch = unique[start:start + _LOOKUP_BATCH]
+                rows = self._conn.execute(
+                    f"SELECT text_sha256, vector FROM embeddings WHERE model = ? AND dims = ? "
+                    f"AND text_sha256 IN ({','.join('?' * len(batch))})",
+                    (model, dims, *batch),
+                ).fetchall()
+                for digest, blob in rows:
+                    found[digest] = array.array("f", blob).tolist()
+        return found
+
+    def put_many(self, model: str, dims: int, vectors: dict[str, list[float]]):
+        """Store vectors by text hash, replacing existing entries."""
+        now = time.time()
+        with self._lock, self._conn:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO embeddings (model, dims, text_sha256, vector, created_at) VALUES (?, ?, ?, ?, ?)",
+                [
+                    (model, dims, digest, array.array("f", vector).tobytes(), now)
+                    for digest, vector in vectors.items()
+                ],
+            )
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+    @staticmethod
+    def from_env() -> "EmbeddingCache | None":
+        """The cache configured by EMBEDDING_CACHE_PATH, or None if EMBEDDING_CACHE_ENABLED is false."""
+        if not EMBEDDING_CACHE_ENABLED:
+            return None
+        return EmbeddingCache(EMBEDDING_CACHE_PATH)
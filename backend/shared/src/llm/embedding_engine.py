@@ -0,0 +1,166 @@
+import asyncio
+import math
+import os
+import random
+import time
+from typing import Awaitable, Callable
+from utils.logging.logger import logger
+
+EMBED_BATCH_SIZE = int(os.getenv("EMBED_BATCH_SIZE", "64"))
+EMBED_MAX_BATCH_TOKENS = int(os.getenv("EMBED_MAX_BATCH_TOKENS", "8000"))
+EMBED_CONCURRENCY = int(os.getenv("EMBED_CONCURRENCY", "4"))
+# 0 disables the limit
+EMBED_TOKENS_PER_MINUTE = int(os.getenv("EMBED_TOKENS_PER_MINUTE", "0"))
+EMBED_REQUESTS_PER_MINUTE = int(os.getenv("EMBED_REQUESTS_PER_MINUTE", "0"))
+EMBED_MAX_RETRIES = int(os.getenv("EMBED_MAX_RETRIES", "6"))
+EMBED_RETRY_BASE_SECONDS = float(os.getenv("EMBED_RETRY_BASE_SECONDS", "1"))
+EMBED_RETRY_MAX_SECONDS = float(os.getenv("EMBED_RETRY_MAX_SECONDS", "60"))
+# Token counts are estimated from text length; close enough for rate limiting
+EMBED_CHARS_PER_TOKEN = float(os.getenv("EMBED_CHARS_PER_TOKEN", "4"))
+
+
+def estimate_tokens(text: str) -> int:
+    return max(1, math.ceil(len(text) / EMBED_CHARS_PER_TOKEN))
+
+
+def is_throttled(error: Exception) -> bool:
+    """Whether error is a 429/throttling response, from the openai, mistral or httpx clients."""
+    status = getattr(error, "status_code", None)
+    if status is None:
+        status = getattr(getattr(error, "response", None), "status_code", None)
+    if status == 429:
+        return True
+    message = str(error).lower()
+    return "429" in message or "rate limit" in message or "too many requests" in message
+
+
+class TokenBucket:
+    """
+    Async token bucket refilled at rate units per second, holding at most capacity.
+
+    A rate of 0 disables the limit. Requests larger than the capacity are
+    let through once the bucket is full, so they cannot block forever.
+    """
+
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate
+        self.capacity = capacity
+        self._level = capacity
+        self._updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    async def acquire(self, amount: float = 1):
+        if self.rate <= 0:
+            return
+        amount = min(amount, self.capacity)
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                self._level = min(self.capacity, self._level + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._level >= amount:
+                    self._level -= amount
+                    return
+                await asyncio.sleep((amount - self._level) / self.rate)
+
+
+class EmbeddingEngine:
+    """
+    Embeds large text lists in bounded batches with parallel requests.
+
+    Texts are packed into batches of at most batch_size texts and
+    max_batch_tokens estimated tokens. Up to concurrency batches are in
+    flight at once, paced by token and request buckets sized from the
+    provider's per-minute limits. Throttled batches are retried with
+    jittered exponential backoff; other errors fail the call.
+    """
+
+    def __init__(
+        self,
+        embed: Callable[[list[str]], Awaitable[list[list[float]]]],
+        batch_size: int = EMBED_BATCH_SIZE,
+        max_batch_tokens: int = EMBED_MAX_BATCH_TOKENS,
+        concurrency: int = EMBED_CONCURRENCY,
+        tokens_per_minute: int = EMBED_TOKENS_PER_MINUTE,
+        requests_per_minute: int = EMBED_REQUESTS_PER_MINUTE,
+        max_retries: int = EMBED_MAX_RETRIES,
+    ):
+        self.embed = embed
+        self.batch_size = batch_size
+        self.max_batch_tokens = max_batch_tokens
+        self.max_retries = max_retries
+        self._semaphore = asyncio.Semaphore(concurrency)
+        self._tokens = TokenBucket(tokens_per_minute / 60, tokens_per_minute)
+        self._requests = TokenBucket(requests_per_minute / 60, max(1, concurrency))
+        # Totals over the engine's lifetime
+        self.stats = {"requests": 0, "texts": 0, "tokens": 0, "retries": 0}
+
+    def batches(self, texts: list[str]) -> list[tuple[int, int, int]]:
+        """Split texts into (start, end, estimated tokens) batches within the size and token limits."""
+        batches = []
+        start, tokens = 0, 0
+        for i, text in enumerate(texts):
+            text_tokens = estimate_tokens(text)
+            if i > start and (i - start >= self.batch_size or tokens + text_tokens > self.max_batch_tokens):
+                batches.append((start, i, tokens))
+                start, tokens = i, 0
+            tokens += text_tokens
+        if start < len(texts):
+            batches.append((start, len(texts), tokens))
+        return batches
+
+    async def embed_all(
+        self, texts: list[str], on_progress: Callable[[int, int], None] | None = None
+    ) -> list[list[float]]:
+        """
+        Embed texts, preserving order.
+
+        Args:
+            texts: Texts to embed
+            on_progress: Called with (texts embedded, total texts) after each batch
+
+        Returns:
+            list: One vector per text
+        """
+        vectors: list[list[float] | None] = [None] * len(texts)
+        done = 0
+
+        async def run(start: int, end: int, tokens: int):
+            nonlocal done
+            async with self._semaphore:
+                vectors[start:end] = await self._embed_batch(texts[start:end], tokens)
+            done += end - start
+            if on_progress is not None:
+                on_progress(done, len(texts))
+
+        batches = self.batches(texts)
+        try:
+            async with asyncio.TaskGroup() as group:
+                for start, end, tokens in batches:
+                    group.create_task(run(start, end, tokens))
+        except ExceptionGroup as e:
+            # Surface the failing batch's error; the other batches were cancelled
+            raise e.exceptions[0]
+        if len(batches) > 1:
+            logger.info(f"Embedded {len(texts)} texts in {len(batches)} batches")
+        return vectors
+
+    async def _embed_batch(self, texts: list[str], tokens: int) -> list[list[float]]:
+        for attempt in range(self.max_retries + 1):
+            await self._requests.acquire()
+            await self._tokens.acquire(tokens)
+            self.stats["requests"] += 1
+            try:
+                vectors = await self.embed(texts)
+            except Exception as e:
+                if not is_throttled(e) or attempt == self.max_retries:
+                    raise
+                self.stats["retries"] += 1
+                delay = min(EMBED_RETRY_MAX_SECONDS, EMBED_RETRY_BASE_SECONDS * 2 ** attempt)
+                delay = random.uniform(delay / 2, delay)
+                logger.warning(f"Embedding batch of {len(texts)} texts throttled, retrying in {delay:.1f}s: {e}")
+                await asyncio.sleep(delay)
+                continue
+            self.stats["texts"] += len(texts)
+            self.stats["tokens"] += tokens
+            return vectors
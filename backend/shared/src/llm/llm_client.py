@@ -1,7 +1,12 @@
+import asyncio
 import os
+import sqlite3
 from transformers import AutoTokenizer
 from langchain_mistralai import ChatMistralAI, MistralAIEmbeddings
 from langchain_openai import AzureChatOpenAI, AzureOpenAIEmbeddings, ChatOpenAI
+from llm.embedding_cache import EmbeddingCache, text_hash
+from llm.embedding_engine import EmbeddingEngine
+from utils.logging.logger import logger
 
 
 class LLMClient:
@@ -15,7 +20,13 @@ class LLMClient:
             self.default_embeddings = os.getenv("DEFAULT_LLM", "gpt")
 
         self.llm = self._initialize_llm()
+        self.embeddings_model = None
         self.embeddings = self._initialize_embeddings()
+        self.embedding_engine = EmbeddingEngine(self.embeddings.aembed_documents)
+        # Opened on the first bulk_embed, so services that never embed
+        # documents do not need a writable cache path
+        self.embedding_cache = None
+        self._embedding_cache_opened = False
 
     def _initialize_llm(self):
         if self.default_llm == "gpt":
@@ -96,6 +107,7 @@ class LLMClient:
             if not embeddings_endpoint:
                 raise ValueError("EMBEDDINGS_ENDPOINT environment variable is not set")
             
+            self.embeddings_model = f"azure/{embeddings_model_name}"
             return AzureOpenAIEmbeddings(
                 model=embeddings_model_name,
                 api_key=embeddings_api_key,
@@ -108,8 +120,10 @@ class LLMClient:
             if not mistral_api_key:
                 raise ValueError("MISTRAL_API_KEY environment variable is not set")
 
+            mistral_embeddings_model = os.getenv("MISTRAL_EMBEDDINGS_MODEL", "mistral-embed")
+            self.embeddings_model = f"mistral/{mistral_embeddings_model}"
             embeddings_model = MistralAIEmbeddings(
-                model=os.getenv("MISTRAL_EMBEDDINGS_MODEL", "mistral-embed"),
+                model=mistral_embeddings_model,
                 api_key=mistral_api_key,
             )
             return embeddings_model
@@ -131,5 +145,45 @@ class LLMClient:
     async def get_embedding(self, query) -> list[float]:
         return await self.embeddings.aembed_query(query)
 
-    async def bulk_embed(self, docs) -> list[list[float]]:
-        return await self.embeddings.aembed_documents(docs)
+    async def bulk_embed(self, docs, on_progress=None) -> list[list[float]]:
+        """
+        Embed docs, taking vectors of previously embedded texts from the embedding cache.
+
+        Only texts missing from the cache are sent to the provider, each
+        distinct text once, in rate-limited batches (see EmbeddingEngine).
+        on_progress is called with (texts embedded, texts to embed).
+        """
+        if self._open_embedding_cache() is None:
+            return await self.embedding_engine.embed_all(docs, on_progress)
+
+        hashes = [text_hash(doc) for doc in docs]
+        try:
+            vectors = await asyncio.to_thread(
+                self.embedding_cache.get_many, self.embeddings_model, self.VECTOR_DIMS, hashes
+            )
+        except sqlite3.Error as e:
+            logger.warning(f"Embedding cache lookup failed, embedding all {len(docs)} texts: {e}")
+            vectors = {}
+
+        misses = {digest: doc for digest, doc in zip(hashes, docs) if digest not in vectors}
+        if misses:
+            embedded = dict(zip(misses, await self.embedding_engine.embed_all(list(misses.values()), on_progress)))
+            vectors.update(embedded)
+            try:
+                await asyncio.to_thread(
+                    self.embedding_cache.put_many, self.embeddings_model, self.VECTOR_DIMS, embedded
+                )
+            except sqlite3.Error as e:
+                logger.warning(f"Failed to store {len(embedded)} embeddings in the cache: {e}")
+        logger.debug(f"Embedded {len(docs)} texts: {len(docs) - len(misses)} cached, {len(misses)} new")
+        return [vectors[digest] for digest in hashes]
+
+    def _open_embedding_cache(self) -> EmbeddingCache | None:
+        """Open the embedding cache once; if it cannot be opened, embed without it."""
+        if not self._embedding_cache_opened:
+            self._embedding_cache_opened = True
+            try:
+                self.embedding_cache = EmbeddingCache.from_env()
+            except (OSError, sqlite3.Error) as e:
+                logger.warning(f"Embedding cache unavailable, embedding without it: {e}")
+        return self.embedding_cache
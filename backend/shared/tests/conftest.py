@@ -0,0 +1,9 @@
+"""Shared fixtures for the shared package tests."""
+
+import sys
+from pathlib import Path
+
+# The shared modules import each other as top-level packages (llm, utils),
+# as they do on the services' PYTHONPATH; appended so a service's own
+# modules keep precedence, as in the images
+sys.path.append(str(Path(__file__).resolve().parents[1] / "src"))
@@ -0,0 +1,108 @@
+"""
+Tests for the persistent embedding cache.
+
+This module tests that EmbeddingCache stores vectors per model, dimensions
+and text hash, that LLMClient.bulk_embed only sends the distinct texts
+missing from the cache to the provider, and that it embeds without the
+cache when the cache file cannot be created.
+"""
+
+import pytest
+from llm import embedding_cache
+from unittest.mock import AsyncMock
+from llm.embedding_cache import EmbeddingCache, text_hash
+from llm.embedding_engine import EmbeddingEngine
+
+
+@pytest.fixture
+def cache(tmp_path):
+    cache = EmbeddingCache(str(tmp_path / "embeddings.sqlite"))
+    yield cache
+    cache.close()
+
+
+class TestEmbeddingCache:
+    """Test cases for EmbeddingCache.get_many and put_many."""
+
+    def test_hits_are_returned_and_misses_left_out(self, cache):
+        cache.put_many("model", 2, {text_hash("a"): [0.5, 1.0], text_hash("b"): [0.25, 2.0]})
+
+        found = cache.get_many("model", 2, [text_hash("a"), text_hash("c"), text_hash("a")])
+
+        assert found == {text_hash("a"): [0.5, 1.0]}
+
+    def test_entries_are_keyed_by_model_and_dims(self, cache):
+        cache.put_many("model", 2, {text_hash("a"): [0.5, 1.0]})
+
+        assert cache.get_many("other", 2, [text_hash("a")]) == {}
+        assert cache.get_many("model", 3, [text_hash("a")]) == {}
+
+    def test_lookups_are_batched_past_the_parameter_limit(self, cache):
+        vectors = {text_hash(str(i)): [float(i)] for i in range(1200)}
+        cache.put_many("model", 1, vectors)
+
+        assert cache.get_many("model", 1, list(vectors)) == vectors
+
+    def test_vectors_are_shared_between_connections(self, cache):
+        cache.put_many("model", 1, {text_hash("a"): [1.5]})
+        other = EmbeddingCache(cache.path)
+        try:
+            assert other.get_many("model", 1, [text_hash("a")]) == {text_hash("a"): [1.5]}
+        finally:
+            other.close()
+
+
+class TestBulkEmbedCache:
+    """Test that LLMClient.bulk_embed embeds only uncached, distinct texts."""
+
+    @pytest.fixture
+    def client(self, cache):
+        for module in ("langchain_openai", "langchain_mistralai", "transformers"):
+            pytest.importorskip(module)
+        from llm.llm_client import LLMClient
+
+        client = LLMClient.__new__(LLMClient)
+        client.embeddings_model = "model"
+        client.embedding_cache = cache
+        client._embedding_cache_opened = True
+        client.embed = AsyncMock(side_effect=lambda texts: [[float(len(t))] for t in texts])
+        client.embedding_engine = EmbeddingEngine(client.embed, batch_size=10)
+        return client
+
+    @pytest.mark.asyncio
+    async def test_duplicate_texts_are_embedded_once(self, client):
+        vectors = await client.bulk_embed(["aa", "b", "aa"])
+
+        assert vectors == [[2.0], [1.0], [2.0]]
+        client.embed.assert_awaited_once_with(["aa", "b"])
+
+    @pytest.mark.asyncio
+    async def test_cached_texts_are_not_embedded_again(self, client):
+        await client.bulk_embed(["aa", "b"])
+        client.embed.reset_mock()
+
+        vectors = await client.bulk_embed(["b", "ccc", "aa"])
+
+        assert vectors == [[1.0], [3.0], [2.0]]
+        client.embed.assert_awaited_once_with(["ccc"])
+
+    @pytest.mark.asyncio
+    async def test_fully_cached_call_skips_the_provider(self, client):
+        await client.bulk_embed(["aa"])
+        client.embed.reset_mock()
+
+        assert await client.bulk_embed(["aa", "aa"]) == [[2.0], [2.0]]
+        client.embed.assert_not_awaited()
+
+    @pytest.mark.asyncio
+    async def test_unwritable_cache_path_embeds_without_cache(self, client, tmp_path, monkeypatch):
+        (tmp_path / "file").write_text("")
+        monkeypatch.setattr(embedding_cache, "EMBEDDING_CACHE_PATH", str(tmp_path / "file" / "cache" / "e.sqlite"))
+        client.embedding_cache = None
+        client._embedding_cache_opened = False
+
+        assert await client.bulk_embed(["aa", "aa"]) == [[2.0], [2.0]]
+        assert await client.bulk_embed(["aa"]) == [[2.0]]
+
+        assert client.embedding_cache is None
+        assert client.embed.await_count == 2
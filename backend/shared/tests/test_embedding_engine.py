@@ -0,0 +1,149 @@
+"""
+Tests for the batched embedding engine.
+
+This module tests that EmbeddingEngine packs texts into batches bounded by
+count and estimated tokens, keeps the order of the vectors across parallel
+batches, caps the number of requests in flight, and retries throttled
+(429) batches with backoff while failing fast on other errors.
+"""
+
+import asyncio
+import pytest
+from llm import embedding_engine
+from llm.embedding_engine import EmbeddingEngine, is_throttled
+
+
+class ThrottledError(Exception):
+    status_code = 429
+
+
+async def _embed(texts):
+    return [[float(len(t))] for t in texts]
+
+
+@pytest.fixture(autouse=True)
+def fast_retries(monkeypatch):
+    monkeypatch.setattr(embedding_engine, "EMBED_RETRY_BASE_SECONDS", 0.001)
+    monkeypatch.setattr(embedding_engine, "EMBED_RETRY_MAX_SECONDS", 0.001)
+
+
+class TestBatching:
+    """Test cases for EmbeddingEngine.batches and embed_all."""
+
+    def test_batches_are_bounded_by_count(self):
+        engine = EmbeddingEngine(_embed, batch_size=2, max_batch_tokens=100)
+
+        assert engine.batches(["a"] * 5) == [(0, 2, 2), (2, 4, 2), (4, 5, 1)]
+
+    def test_batches_are_bounded_by_estimated_tokens(self):
+        engine = EmbeddingEngine(_embed, batch_size=10, max_batch_tokens=4)
+
+        # 4 characters per token: 2 + 2 tokens fit, the third text starts a new batch
+        assert engine.batches(["x" * 8, "x" * 8, "x" * 8]) == [(0, 2, 4), (2, 3, 2)]
+
+    def test_oversized_text_gets_a_batch_of_its_own(self):
+        engine = EmbeddingEngine(_embed, batch_size=10, max_batch_tokens=4)
+
+        assert engine.batches(["x" * 40, "x"]) == [(0, 1, 10), (1, 2, 1)]
+
+    @pytest.mark.asyncio
+    async def test_vectors_keep_text_order_across_batches(self):
+        calls = []
+
+        async def embed(texts):
+            calls.append(texts)
+            # Later batches finish first
+            await asyncio.sleep(0.01 / len(calls))
+            return await _embed(texts)
+
+        engine = EmbeddingEngine(embed, batch_size=2, max_batch_tokens=100, concurrency=3)
+        progress = []
+
+        vectors = await engine.embed_all(
+            ["a", "bb", "ccc", "dddd", "eeeee"], lambda done, total: progress.append((done, total))
+        )
+
+        assert vectors == [[1.0], [2.0], [3.0], [4.0], [5.0]]
+        assert len(calls) == 3
+        assert progress[-1] == (5, 5)
+        assert engine.stats["requests"] == 3 and engine.stats["texts"] == 5
+
+    @pytest.mark.asyncio
+    async def test_requests_in_flight_are_capped(self):
+        in_flight = peak = 0
+
+        async def embed(texts):
+            nonlocal in_flight, peak
+            in_flight += 1
+            peak = max(peak, in_flight)
+            await asyncio.sleep(0.01)
+            in_flight -= 1
+            return await _embed(texts)
+
+        engine = EmbeddingEngine(embed, batch_size=1, concurrency=2)
+        await engine.embed_all(["a"] * 6)
+
+        assert peak == 2
+
+
+class TestRetries:
+    """Test cases for the throttling retry of EmbeddingEngine."""
+
+    @pytest.mark.asyncio
+    async def test_throttled_batch_is_retried(self):
+        attempts = 0
+
+        async def embed(texts):
+            nonlocal attempts
+            attempts += 1
+            if attempts < 3:
+                raise ThrottledError("Too Many Requests")
+            return await _embed(texts)
+
+        engine = EmbeddingEngine(embed, max_retries=3)
+
+        assert await engine.embed_all(["ab"]) == [[2.0]]
+        assert attempts == 3
+        assert engine.stats["retries"] == 2
+
+    @pytest.mark.asyncio
+    async def test_retries_are_bounded(self):
+        attempts = 0
+
+        async def embed(texts):
+            nonlocal attempts
+            attempts += 1
+            raise ThrottledError("Too Many Requests")
+
+        engine = EmbeddingEngine(embed, max_retries=2)
+
+        with pytest.raises(ThrottledError):
+            await engine.embed_all(["ab"])
+        assert attempts == 3
+
+    @pytest.mark.asyncio
+    async def test_other_errors_are_not_retried(self):
+        attempts = 0
+
+        async def embed(texts):
+            nonlocal attempts
+            attempts += 1
+            raise ValueError("bad input")
+
+        engine = EmbeddingEngine(embed, max_retries=3)
+
+        with pytest.raises(ValueError):
+            await engine.embed_all(["ab"])
+        assert attempts == 1
+
+    def test_throttling_is_recognised_across_clients(self):
+        class Response:
+            status_code = 429
+
+        class HTTPError(Exception):
+            response = Response()
+
+        assert is_throttled(ThrottledError())
+        assert is_throttled(HTTPError())
+        assert is_throttled(Exception("Rate limit reached for requests"))
+        assert not is_throttled(Exception("500 internal server error"))